@@ -0,0 +1,169 @@
+"""Token-authenticated JSON API for machine clients.
+
+Mail gateways and monitoring systems create tickets here instead of through
+the rate-limited HTML form. Every request needs ``Authorization: Bearer
+<token>`` with one of the comma-separated ``API_TOKENS``; with none
+configured the API is closed.
+
+* ``POST /api/tickets``: create one ticket from ``{"title", "description"}``
+* ``GET /api/tickets/<id>``: one ticket
+* ``GET /api/tickets?limit=&after=``: newest first, keyset cursors as on the
+  list pages
+* ``POST /api/tickets/bulk``: an NDJSON body (one ticket object per line),
+  read as a stream and inserted ``API_BULK_BATCH`` rows per transaction.
+
+Tickets get the same limits, duplicate grouping and background
+classification as form submissions (see :mod:`intake`). A bulk request
+reports bad lines by number and still creates the good ones; batches that
+committed before an error stay committed.
+"""
+import hmac
+import io
+import json
+import os
+
+from flask import Blueprint, jsonify, request, url_for
+
+import database
+import intake
+from models import db, Ticket
+from pagination import keyset_paginate
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+RATE_LIMIT = os.environ.get('API_RATE_LIMIT', '600 per minute')
+BULK_BATCH = int(os.environ.get('API_BULK_BATCH', 500))
+BULK_MAX_LINES = int(os.environ.get('API_BULK_MAX_LINES', 50_000))
+MAX_LIMIT = 100
+
+
+def _tokens():
+    return [t.strip() for t in os.environ.get('API_TOKENS', '').split(',') if t.strip()]
+
+
+def request_token():
+    """The bearer token sent with the request ('' if none)."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else ''
+
+
+def valid_token():
+    """The request's bearer token if it is one of ``API_TOKENS``, else ''."""
+    token = request_token()
+    if token and any(hmac.compare_digest(token, t) for t in _tokens()):
+        return token
+    return ''
+
+
+def rate_limit_key():
+    # Only a valid token gets its own bucket: keying on whatever was sent
+    # would give every made-up token a fresh limit (and fill the shared
+    # counter store). Anything else counts against the client address.
+    token = valid_token()
+    return 'api:token:' + token if token else 'api:addr:' + (request.remote_addr or '')
+
+
+def _error(message, status, **extra):
+    return jsonify(error=message, **extra), status
+
+
+@bp.before_request
+def authenticate():
+    if not valid_token():
+        return _error('A valid API token is required.', 401)
+
+
+def ticket_json(ticket):
+    return {
+        'id': ticket.id,
+        'title': ticket.title,
+        'description': ticket.description,
+        'category': ticket.category,
+        'priority': ticket.priority,
+        'confidence': ticket.confidence,
+        'status': ticket.status,
+        'pending_classification': ticket.pending_classification,
+        'duplicate_of': ticket.duplicate_of,
+        'created_at': ticket.created_at.isoformat(),
+        'updated_at': ticket.updated_at.isoformat(),
+    }
+
+
+def _fields(obj):
+    """Cleaned fields of one submitted ticket object."""
+    if not isinstance(obj, dict):
+        raise intake.InvalidTicket('Expected a JSON object')
+    title, description = obj.get('title', ''), obj.get('description', '')
+    if not isinstance(title, str) or not isinstance(description, str):
+        raise intake.InvalidTicket('title and description must be strings')
+    return intake.clean(title, description)
+
+
+@bp.post('/tickets')
+def create_ticket():
+    try:
+        title, description = _fields(request.get_json(silent=True))
+    except intake.InvalidTicket as exc:
+        return _error(str(exc), 400)
+    ticket, incident, known_fix = intake.create_ticket(title, description)
+    body = ticket_json(ticket)
+    body['known_fix'] = None if known_fix is None else {'id': known_fix.id, 'title': known_fix.title}
+    intake.commit([ticket])
+    resp = jsonify(body)
+    resp.status_code = 201
+    resp.headers['Location'] = url_for('api.get_ticket', ticket_id=body['id'])
+    return resp
+
+
+@bp.get('/tickets/<int:ticket_id>')
+@database.read_only
+def get_ticket(ticket_id):
+    ticket = db.session.get(Ticket, ticket_id)
+    if ticket is None:
+        return _error('Not found', 404)
+    return jsonify(ticket_json(ticket))
+
+
+@bp.get('/tickets')
+@database.read_only
+def list_tickets():
+    limit = max(1, min(request.args.get('limit', 50, type=int), MAX_LIMIT))
+    page = keyset_paginate(Ticket.query, Ticket.created_at, Ticket.id, limit,
+                           after=request.args.get('after'), before=request.args.get('before'))
+    return jsonify(items=[ticket_json(t) for t in page.items],
+                   next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
+
+
+@bp.post('/tickets/bulk')
+def bulk_create():
+    created, grouped, errors = [], 0, []
+
+    def flush(rows):
+        nonlocal grouped
+        if not rows:
+            return
+        tickets = intake.create_batch(rows)
+        # Read before the commit expires them.
+        created.extend(t.id for t in tickets)
+        grouped += sum(t.duplicate_of is not None for t in tickets)
+        intake.commit(tickets)
+        rows.clear()
+
+    rows = []
+    # The raw request stream would be read a few bytes at a time per line.
+    lines = io.BufferedReader(request.stream, buffer_size=64 * 1024)
+    for lineno, raw in enumerate(lines, 1):
+        if lineno > BULK_MAX_LINES:
+            errors.append({'line': lineno, 'error': f'Stopped: at most {BULK_MAX_LINES} lines per request'})
+            break
+        if not raw.strip():
+            continue
+        try:
+            rows.append(_fields(json.loads(raw)))
+        except ValueError as exc:  # JSONDecodeError and InvalidTicket
+            errors.append({'line': lineno, 'error': str(exc)})
+            continue
+        if len(rows) >= BULK_BATCH:
+            flush(rows)
+    flush(rows)
+    return jsonify(created=len(created), grouped=grouped, ids=created, errors=errors), 200
@@ -4,24 +4,46 @@ import secrets
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from urllib.parse import urlparse
-from flask import Flask, render_template, request, redirect, url_for, flash, session, make_response
+from flask import (Flask, Response, jsonify, render_template, request, redirect, url_for, flash, session,
+                   stream_with_context)
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
 from flask_wtf.csrf import CSRFProtect
 from flask_wtf.csrf import CSRFError
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from sqlalchemy import select
 import io
 import csv
+import zlib
 import logging
 
 load_dotenv()
 
-from models import db, Ticket, TicketCorrection, FixedIssue, utcnow
-from classifier import classify_text
+from models import db, Ticket, TicketCorrection, FixedIssue, ArchivedTicket, ClassificationCacheEntry, utcnow
+import api
+import archive
+import assets
+import bulk
+import classifier
+import database
+import dedup
+import http_cache
+import intake
+import jobs
+import live
+import local_model
+import metrics
+import migrations
+import profiling
+import rate_limits
+import reclassify
+import search
+import stats
+from pagination import CachedCount, keyset_paginate, page_url
 
 csrf = CSRFProtect()
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=get_remote_address, on_breach=metrics.rate_limited)
 
 
 def _safe_next(target):
@@ -44,6 +66,38 @@ def _csv_safe(v):
     return s
 
 
+# Days of history in the dashboard's daily ticket trend.
+STATS_TREND_DAYS = 14
+
+# Rows fetched per round-trip while streaming exports.
+EXPORT_CHUNK_ROWS = 1000
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+def _fixed_issue_filters(args):
+    """SQL criteria for the fixed-issue list/export query-string filters.
+
+    Returns ``{arg_name: criterion}`` for the filters actually applied;
+    ``until`` is inclusive of that whole day. Malformed dates are ignored.
+    """
+    filters = {}
+    for name in ('category', 'priority', 'fixed_by'):
+        if args.get(name):
+            filters[name] = getattr(FixedIssue, name) == args[name]
+    since, until = _parse_date(args.get('since')), _parse_date(args.get('until'))
+    if since:
+        filters['since'] = FixedIssue.fixed_at >= since
+    if until:
+        filters['until'] = FixedIssue.fixed_at < until + timedelta(days=1)
+    return filters
+
+
 def create_app():
     app = Flask(__name__)
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///tickets.db')
@@ -77,18 +131,30 @@ def create_app():
     if not is_production:
         app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 
-    # Expose a cache-busting version string to templates based on the CSS
-    # file's last-modified time, so updated styles bypass the browser cache.
-    @app.context_processor
-    def inject_asset_version():
-        try:
-            css_path = os.path.join(app.static_folder, 'style.css')
-            version = str(int(os.path.getmtime(css_path)))
-        except OSError:
-            version = '0'
-        return {'asset_version': version}
+    # Content-hashed, precompressed static files; templates use asset_url().
+    # Outside production edited files are re-hashed on their next render.
+    assets.init_app(app, reload=not is_production)
+
+    app.jinja_env.globals['page_url'] = page_url
+    # Fixed-issue totals are informational; recount at most once a minute.
+    list_totals = CachedCount(ttl=float(os.environ.get('LIST_TOTAL_TTL', 60)))
 
+    # WAL and connection pragmas for SQLite, plus a read-only pool for the
+    # read_only views.
+    database.configure(app)
     db.init_app(app)
+    with app.app_context():
+        database.install(db.engines)
+        # Prometheus /metrics; its request timer goes first so requests the
+        # rate limiter rejects are measured too.
+        metrics.init_app(app, db.engines.values(), jobs.queue_depth)
+        # Opt-in (SQL_PROFILE=1) per-request query log and N+1 warnings.
+        profiling.init_app(app, db.engines.values())
+        live.init_app(app, db.engines.get(database.READ_BIND) or db.engine)
+        # Rate-limit counters shared by all workers on this host.
+        storage_uri = os.environ.get('RATELIMIT_STORAGE_URI') or rate_limits.default_uri(db.engine.url)
+        app.config['RATELIMIT_STORAGE_URI'] = storage_uri or 'memory://'
+        app.config['RATELIMIT_STRATEGY'] = os.environ.get('RATELIMIT_STRATEGY', 'sliding-window-counter')
     csrf.init_app(app)
     limiter.init_app(app)
     # Configure basic logging for server-side events
@@ -101,9 +167,35 @@ def create_app():
         # derive a hash for use at runtime (do NOT write back to .env automatically)
         admin_hash = generate_password_hash(admin_plain)
     app.config['ADMIN_PASSWORD_HASH'] = admin_hash
+    # Background classification threads per process. Tests drive the queue
+    # explicitly, so none are started there by default.
+    app.config['CLASSIFY_WORKERS'] = int(os.environ.get(
+        'CLASSIFY_WORKERS', '0' if os.environ.get('FLASK_ENV') == 'testing' else '2'))
 
+    # The duplicate index describes one database; start empty for this app.
+    dedup.index.reset()
     with app.app_context():
         db.create_all()
+        migrations.upgrade(db.engine)
+        # Share model classifications across all workers via the database.
+        classifier.cache.store = classifier.SQLCacheStore(
+            db.engine, ClassificationCacheEntry.__table__,
+            max_rows=int(os.environ.get('CLASSIFY_CACHE_DB_MAX_ROWS', 100_000)),
+        )
+
+    # JSON API for machine clients: bearer-token auth instead of session
+    # cookies (so no CSRF), and a per-token rate limit instead of the form's.
+    app.register_blueprint(api.bp)
+    csrf.exempt(api.bp)
+    limiter.limit(api.RATE_LIMIT, key_func=api.rate_limit_key)(api.bp)
+
+    app.cli.add_command(migrations.upgrade_command)
+    app.cli.add_command(migrations.version_command)
+    app.cli.add_command(jobs.worker_command)
+    app.cli.add_command(reclassify.reclassify_command)
+    app.cli.add_command(local_model.train_command)
+    app.cli.add_command(stats.rebuild_command)
+    app.cli.add_command(archive.archive_command)
 
     @app.route('/')
     def index():
@@ -113,51 +205,46 @@ def create_app():
     @limiter.limit("10 per hour", methods=["POST"])
     def submit_ticket():
         if request.method == 'POST':
-            title = request.form.get('title', '').strip()[:255]
-            description = request.form.get('description', '').strip()[:5000]
-            if not description:
-                flash('Please provide a description of the issue', 'warning')
-                return redirect(url_for('submit_ticket'))
-            # Hard-cap input size to limit classifier cost / DoS.
-            if not (1 <= len(description) <= 5000):
-                flash('Description must be between 1 and 5000 characters', 'warning')
+            # The form cuts over-long descriptions to the limit; the API
+            # rejects them instead.
+            try:
+                title, description = intake.clean(
+                    request.form.get('title', ''),
+                    request.form.get('description', '').strip()[:intake.MAX_DESCRIPTION_CHARS])
+            except intake.InvalidTicket as exc:
+                flash(str(exc), 'warning')
                 return redirect(url_for('submit_ticket'))
 
-            # Call classifier (OpenAI) to predict category & priority
-            result = classify_text(description)
-            category = result.get('category', 'other')
-            priority = result.get('priority', 'Medium')
-            confidence = result.get('confidence', 0.0)
-
-            ticket = Ticket(
-                title=title or (description[:60] + '...'),
-                description=description,
-                category=category,
-                priority=priority,
-                confidence=confidence,
-                status='Open',
-                created_at=utcnow(),
-                updated_at=utcnow(),
-            )
-            db.session.add(ticket)
-            db.session.commit()
-            flash(f'Ticket submitted — category: {category} (confidence {confidence:.2f}), priority: {priority}', 'success')
+            # Near-duplicates of an open incident join it and reuse its
+            # classification; anything else is stored unclassified and left
+            # to the background queue, so the request never waits on the model.
+            ticket, incident, known_fix = intake.create_ticket(title, description)
+            intake.commit([ticket])
+            if incident is not None:
+                flash(f'Ticket #{ticket.id} submitted — it looks like ongoing incident #{incident.id} '
+                      'and has been grouped with it.', 'success')
+            else:
+                flash(f'Ticket #{ticket.id} submitted — it will be classified shortly.', 'success')
+            if known_fix is not None:
+                flash(f'A similar issue was fixed before: “{known_fix.title}”.', 'info')
             return redirect(url_for('list_tickets'))
 
         return render_template('submit.html')
 
+    # ETag/Last-Modified for the public pages kiosks keep reloading.
+    conditional = http_cache.conditional(app)
+
     @app.route('/tickets')
+    @database.read_only
+    @conditional
     def list_tickets():
-        # server-side pagination
-        try:
-            page = int(request.args.get('page', 1))
-        except Exception:
-            page = 1
         per_page = int(os.environ.get('TICKETS_PER_PAGE', 10))
-        q = Ticket.query.order_by(Ticket.created_at.desc())
-        pagination = q.paginate(page=page, per_page=per_page, error_out=False)
-        tickets = pagination.items
-        return render_template('tickets.html', tickets=tickets, pagination=pagination)
+        pagination = keyset_paginate(
+            Ticket.query, Ticket.created_at, Ticket.id, per_page,
+            after=request.args.get('after'), before=request.args.get('before'),
+            total=stats.live_total(),
+        )
+        return render_template('tickets.html', tickets=pagination.items, pagination=pagination)
 
     def admin_required(f):
         @wraps(f)
@@ -169,19 +256,54 @@ def create_app():
 
     @app.route('/admin')
     @admin_required
+    @database.read_only
     def admin_index():
-        try:
-            page = int(request.args.get('page', 1))
-        except Exception:
-            page = 1
         per_page = int(os.environ.get('ADMIN_TICKETS_PER_PAGE', 15))
-        q = Ticket.query.order_by(Ticket.created_at.desc())
-        pagination = q.paginate(page=page, per_page=per_page, error_out=False)
-        tickets = pagination.items
-        # compute recent (today) count server-side using a simple query
-        today = utcnow().date()
-        recent_count = Ticket.query.filter(db.func.date(Ticket.created_at) == today).count()
-        return render_template('admin.html', tickets=tickets, recent_count=recent_count, pagination=pagination)
+        pagination = keyset_paginate(
+            Ticket.query, Ticket.created_at, Ticket.id, per_page,
+            after=request.args.get('after'), before=request.args.get('before'),
+        )
+        # Dashboard figures come from the ticket_stats rollup, not table scans.
+        summary = stats.summary(days=STATS_TREND_DAYS)
+        pagination.total = summary['live']
+        return render_template('admin.html', tickets=pagination.items, pagination=pagination,
+                               recent_count=summary['today'], stats=summary,
+                               priority_levels=classifier.PRIORITY_LEVELS, live_since=live.latest_id())
+
+    @app.route('/admin/events')
+    @admin_required
+    def admin_events():
+        # Server-Sent Events with ticket deltas for open dashboards.
+        return live.response(app.extensions['live'], request)
+
+    @app.route('/admin/stats.json')
+    @admin_required
+    @database.read_only
+    def admin_stats():
+        days = request.args.get('days', STATS_TREND_DAYS, type=int)
+        return jsonify(stats.summary(days=max(1, min(days, 366))))
+
+    @app.route('/admin/search')
+    @admin_required
+    @database.read_only
+    def admin_search():
+        # Ranked full-text search. scope=tickets covers ticket text and
+        # correction notes; scope=fixed searches the archive and honours the
+        # fixed-issue list filters; scope=archive searches archived tickets.
+        q = request.args.get('q', '').strip()
+        scope = request.args.get('scope')
+        if scope not in ('fixed', 'archive'):
+            scope = 'tickets'
+        page = request.args.get('page', 1, type=int)
+        per_page = int(os.environ.get('SEARCH_PER_PAGE', 15))
+        if scope == 'fixed':
+            results = search.search_fixed_issues(q, _fixed_issue_filters(request.args).values(),
+                                                 page=page, per_page=per_page)
+        elif scope == 'archive':
+            results = search.search_archive(q, page=page, per_page=per_page)
+        else:
+            results = search.search_tickets(q, page=page, per_page=per_page)
+        return render_template('search.html', q=q, scope=scope, results=results)
 
     @app.route('/admin/ticket/<int:ticket_id>/edit', methods=['GET', 'POST'])
     @admin_required
@@ -206,6 +328,7 @@ def create_app():
                 db.session.add(correction)
                 ticket.category = new_category
                 ticket.priority = new_priority
+                ticket.label_source = 'admin'
                 ticket.updated_at = utcnow()
                 db.session.commit()
                 flash('Ticket updated and correction logged.', 'success')
@@ -234,6 +357,7 @@ def create_app():
             status='Fixed',
             fixed_by=fixed_by,
             notes=notes,
+            simhash=ticket.simhash,
         )
         db.session.add(fixed)
 
@@ -245,6 +369,7 @@ def create_app():
             pass
 
         db.session.commit()
+        dedup.index.add_fixed(fixed)
         flash('Ticket marked as fixed and archived for reference.', 'success')
         return redirect(url_for('admin_index'))
 
@@ -256,60 +381,134 @@ def create_app():
         return render_template('complete_ticket.html', ticket=ticket)
 
 
+    @app.route('/admin/tickets/bulk', methods=['POST'])
+    @admin_required
+    def bulk_tickets():
+        # Multi-select actions from the admin queue, each applied to all
+        # selected tickets in one transaction (see bulk.py).
+        ids = set(request.form.getlist('ticket_ids', type=int))
+        action = request.form.get('action')
+        back = _safe_next(request.form.get('next')) or url_for('admin_index')
+        if not ids:
+            flash('Select at least one ticket first.', 'warning')
+            return redirect(back)
+        if request.form.get('include_duplicates'):
+            ids = bulk.with_duplicates(ids)
+        if action == 'complete':
+            count = bulk.complete(ids, fixed_by=request.form.get('fixed_by') or 'admin',
+                                  notes=request.form.get('notes') or '')
+            flash(f'{count} ticket(s) marked as fixed and archived for reference.', 'success')
+        elif action == 'update':
+            priority = request.form.get('priority') or None
+            if priority is not None and priority not in classifier.PRIORITY_LEVELS:
+                flash('Unknown priority.', 'warning')
+                return redirect(back)
+            count = bulk.recategorize(ids, category=(request.form.get('category') or '').strip() or None,
+                                      priority=priority,
+                                      corrected_by=request.form.get('corrected_by') or 'admin',
+                                      notes=request.form.get('notes'))
+            if count:
+                flash(f'{count} ticket(s) updated and corrections logged.', 'success')
+            else:
+                flash('No changes were made to the selected tickets.', 'warning')
+        else:
+            flash('Choose a bulk action.', 'warning')
+        return redirect(back)
+
     @app.route('/admin/fixed-issues')
     @admin_required
+    @database.read_only
     def list_fixed_issues():
-        # support simple filtering via query params: category, priority, fixed_by
-        q = FixedIssue.query
-        category = request.args.get('category')
-        priority = request.args.get('priority')
-        fixed_by = request.args.get('fixed_by')
-        if category:
-            q = q.filter(FixedIssue.category == category)
-        if priority:
-            q = q.filter(FixedIssue.priority == priority)
-        if fixed_by:
-            q = q.filter(FixedIssue.fixed_by == fixed_by)
+        # A text query turns the listing into a ranked search within the
+        # same filters.
+        if request.args.get('q', '').strip():
+            args = {k: v for k, v in request.args.items() if k not in ('after', 'before', 'scope')}
+            return redirect(url_for('admin_search', scope='fixed', **args))
+        # support simple filtering via query params: category, priority,
+        # fixed_by and a fixed_at date range (since/until, YYYY-MM-DD)
+        filters = _fixed_issue_filters(request.args)
+        q = FixedIssue.query.filter(*filters.values())
 
-        try:
-            page = int(request.args.get('page', 1))
-        except Exception:
-            page = 1
         per_page = int(os.environ.get('FIXED_PER_PAGE', 15))
-        pagination = q.order_by(FixedIssue.fixed_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        pagination = keyset_paginate(
+            q, FixedIssue.fixed_at, FixedIssue.id, per_page,
+            after=request.args.get('after'), before=request.args.get('before'),
+            total=list_totals.get(('fixed_issues',) + tuple(sorted(
+                (k, request.args[k]) for k in filters)), q.count),
+        )
         fixed_issues = pagination.items
         return render_template('fixed_issues.html', fixed_issues=fixed_issues, pagination=pagination)
 
 
     @app.route('/admin/fixed-issues/export.csv')
     @admin_required
+    @database.read_only
     def export_fixed_issues_csv():
-        # Stream a CSV of fixed issues
-        fixed_issues = FixedIssue.query.order_by(FixedIssue.fixed_at.desc()).all()
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['id', 'ticket_id', 'title', 'category', 'priority', 'fixed_by', 'fixed_at', 'notes'])
-        for f in fixed_issues:
-            writer.writerow([_csv_safe(v) for v in [
-                f.id, f.ticket_id, f.title, f.category, f.priority,
-                f.fixed_by, f.fixed_at.isoformat(), (f.notes or ''),
-            ]])
-        resp = make_response(output.getvalue())
-        resp.headers['Content-Type'] = 'text/csv'
-        resp.headers['Content-Disposition'] = 'attachment; filename=fixed_issues.csv'
+        # Stream the CSV: rows are read from the database in chunks and
+        # encoded as they go, so memory stays flat and the first bytes leave
+        # immediately. Accepts the same filters as the list page; ?gzip=1
+        # compresses the stream on the fly.
+        filters = _fixed_issue_filters(request.args)
+        compress = request.args.get('gzip') in ('1', 'true', 'yes')
+        stmt = (
+            select(FixedIssue.id, FixedIssue.ticket_id, FixedIssue.title, FixedIssue.category,
+                   FixedIssue.priority, FixedIssue.fixed_by, FixedIssue.fixed_at, FixedIssue.notes)
+            .where(*filters.values())
+            .order_by(FixedIssue.fixed_at.desc(), FixedIssue.id.desc())
+        )
+
+        def generate():
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31: gzip container
+
+            def flush():
+                chunk = buf.getvalue().encode('utf-8')
+                buf.seek(0)
+                buf.truncate()
+                return gz.compress(chunk) if gz else chunk
+
+            writer.writerow(['id', 'ticket_id', 'title', 'category', 'priority', 'fixed_by', 'fixed_at', 'notes'])
+            yield flush()
+            result = db.session.execute(stmt, execution_options={'yield_per': EXPORT_CHUNK_ROWS})
+            for rows in result.partitions():
+                for f in rows:
+                    writer.writerow([_csv_safe(v) for v in [
+                        f.id, f.ticket_id, f.title, f.category, f.priority,
+                        f.fixed_by, f.fixed_at.isoformat(), (f.notes or ''),
+                    ]])
+                yield flush()
+            if gz:
+                yield gz.flush()
+
+        resp = Response(stream_with_context(generate()),
+                        mimetype='application/gzip' if compress else 'text/csv')
+        filename = 'fixed_issues.csv.gz' if compress else 'fixed_issues.csv'
+        resp.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        # Let reverse proxies pass chunks through instead of buffering them.
+        resp.headers['X-Accel-Buffering'] = 'no'
         return resp
 
     @app.route('/ticket/<int:ticket_id>')
+    @database.read_only
+    @conditional
     def ticket_detail(ticket_id):
-        ticket = Ticket.query.get_or_404(ticket_id)
+        # Tickets moved out by the retention job are shown from the archive.
+        ticket = db.session.get(Ticket, ticket_id) or db.get_or_404(ArchivedTicket, ticket_id)
+        archived = isinstance(ticket, ArchivedTicket)
         # The ticket queue (title/description/category/priority/confidence) is
         # public by design. Correction history exposes staff identity and
         # internal notes, so only fetch it for logged-in admins.
-        if session.get('admin_logged_in'):
-            corrections = TicketCorrection.query.filter_by(ticket_id=ticket.id).order_by(TicketCorrection.corrected_at.desc()).all()
-        else:
+        if not session.get('admin_logged_in'):
             corrections = []
-        return render_template('ticket_detail.html', ticket=ticket, corrections=corrections)
+        elif archived:
+            corrections = ticket.corrections
+        else:
+            corrections = TicketCorrection.query.filter_by(ticket_id=ticket.id).order_by(TicketCorrection.corrected_at.desc()).all()
+        duplicates = Ticket.query.filter_by(duplicate_of=ticket.id).count()
+        known_fix = dedup.index.find_fix(dedup.from_db(ticket.simhash)) if ticket.status == 'Open' else None
+        return render_template('ticket_detail.html', ticket=ticket, corrections=corrections,
+                               duplicates=duplicates, known_fix=known_fix, archived=archived)
 
     @app.route('/admin/login', methods=['GET', 'POST'])
     @limiter.limit("5 per minute; 30 per hour", methods=["POST"])
@@ -381,4 +580,8 @@ if __name__ == '__main__':
     # Bind to loopback by default; exposing on all interfaces must be an
     # explicit opt-in via the HOST env var.
     host = os.environ.get('HOST', '127.0.0.1')
+    # Classification threads only in the serving process, not the reloader's
+    # watcher (gunicorn starts them in gunicorn.conf.py).
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        jobs.start_workers(app, app.config['CLASSIFY_WORKERS'])
     app.run(host=host, port=int(os.environ.get('PORT', 5000)), debug=debug)
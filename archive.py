@@ -0,0 +1,126 @@
+"""Retention: move old fixed tickets out of the hot tables.
+
+Fixed tickets stay in ``tickets`` (and their corrections in
+``ticket_corrections``) forever, so every list query, index and FTS table
+keeps growing with tickets nobody looks at. The archive job moves tickets
+that were fixed (last changed) more than ``ARCHIVE_AFTER_DAYS`` days ago
+into ``ticket_archive``, with the description and correction history
+zlib-compressed, and deletes them from the hot tables::
+
+    flask --app app:create_app archive --days 90 --dry-run
+
+Archived tickets keep their id: ``/ticket/<id>`` still shows them, and
+admin search has an "archive" scope (see :func:`search.search_archive`).
+They also keep counting in the dashboard statistics.
+
+Completing a ticket already copies its description into ``fixed_issues``,
+the searchable record of how it was fixed. With ``ARCHIVE_DEDUP`` (the
+default) the archive does not store that text a second time: the
+``description_z`` column is left NULL and the text is read back from the
+fixed issue.
+
+Each chunk of tickets is moved in its own transaction, so the job can be
+interrupted and simply run again.
+"""
+import json
+import os
+import zlib
+from collections import defaultdict
+from datetime import timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, insert, select
+
+from models import db, Ticket, TicketCorrection, FixedIssue, ClassificationJob, ArchivedTicket, utcnow
+import search
+import stats
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+DEDUP = os.environ.get('ARCHIVE_DEDUP', '1').lower() not in ('0', 'false', 'no')
+# Archived text is written once and rarely read; favour size over speed.
+LEVEL = 9
+
+
+def compress(value):
+    return zlib.compress(value.encode('utf-8'), LEVEL)
+
+
+def _candidates(cutoff, after_id, limit):
+    return db.session.execute(
+        select(Ticket.id, Ticket.title, Ticket.description, Ticket.category, Ticket.priority,
+               Ticket.confidence, Ticket.status, Ticket.duplicate_of, Ticket.created_at, Ticket.updated_at)
+        .where(Ticket.id > after_id, Ticket.status == 'Fixed', Ticket.updated_at < cutoff)
+        .order_by(Ticket.id).limit(limit)
+    ).all()
+
+
+def _archive_chunk(tickets, dedup):
+    ids = [t.id for t in tickets]
+    history = defaultdict(list)
+    for c in db.session.execute(
+        select(TicketCorrection).where(TicketCorrection.ticket_id.in_(ids))
+        .order_by(TicketCorrection.corrected_at.desc(), TicketCorrection.id.desc())
+    ).scalars():
+        history[c.ticket_id].append({
+            'old_category': c.old_category, 'new_category': c.new_category,
+            'old_priority': c.old_priority, 'new_priority': c.new_priority,
+            'corrected_by': c.corrected_by, 'corrected_at': c.corrected_at.isoformat(), 'notes': c.notes,
+        })
+    # Newest fixed issue per ticket, as ArchivedTicket.description reads it.
+    fixed_text = {}
+    if dedup:
+        fixed_text = dict(db.session.execute(
+            select(FixedIssue.ticket_id, FixedIssue.description)
+            .where(FixedIssue.ticket_id.in_(ids)).order_by(FixedIssue.id)
+        ).all())
+
+    now = utcnow()
+    db.session.execute(insert(ArchivedTicket), [{
+        'id': t.id, 'title': t.title, 'category': t.category, 'priority': t.priority,
+        'confidence': t.confidence, 'status': t.status, 'duplicate_of': t.duplicate_of,
+        'created_at': t.created_at, 'updated_at': t.updated_at, 'archived_at': now,
+        'description_z': None if fixed_text.get(t.id) == t.description else compress(t.description),
+        'corrections_z': compress(json.dumps(history[t.id])) if history[t.id] else None,
+    } for t in tickets])
+    search.index_archived(db.session, [
+        (t.id, t.title, t.description, '\n'.join(c['notes'] for c in history[t.id] if c['notes']))
+        for t in tickets])
+    db.session.execute(delete(TicketCorrection).where(TicketCorrection.ticket_id.in_(ids)))
+    db.session.execute(delete(ClassificationJob).where(ClassificationJob.ticket_id.in_(ids)))
+    # Archived tickets still count in the ticket_stats rollup; it only
+    # notes that they left the ticket lists.
+    stats.record_archived(db.session, [stats.key(t.created_at, t.category, t.priority, t.status)
+                                       for t in tickets])
+    db.session.execute(delete(Ticket).where(Ticket.id.in_(ids)),
+                       execution_options={'synchronize_session': False})
+    db.session.commit()
+
+
+def archive_fixed(days=ARCHIVE_AFTER_DAYS, chunk_size=500, dedup=DEDUP, dry_run=False, echo=print):
+    """Move fixed tickets older than ``days`` to the archive. Returns how many."""
+    cutoff = utcnow() - timedelta(days=days)
+    after_id = moved = 0
+    while True:
+        tickets = _candidates(cutoff, after_id, chunk_size)
+        if not tickets:
+            return moved
+        after_id = tickets[-1].id
+        if dry_run:
+            db.session.rollback()
+        else:
+            _archive_chunk(tickets, dedup)
+        moved += len(tickets)
+        echo(f'{moved} tickets {"would be " if dry_run else ""}archived')
+
+
+@click.command('archive')
+@click.option('--days', default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Archive tickets fixed more than this many days ago.')
+@click.option('--chunk-size', default=500, show_default=True, help='Tickets moved per transaction.')
+@click.option('--dry-run', is_flag=True, help='Only count the tickets that would be archived.')
+@with_appcontext
+def archive_command(days, chunk_size, dry_run):
+    """Move old fixed tickets and their corrections to the compressed archive."""
+    moved = archive_fixed(days=days, chunk_size=chunk_size, dry_run=dry_run, echo=click.echo)
+    click.echo(f'Done: {moved} tickets {"would be " if dry_run else ""}archived.')
@@ -0,0 +1,132 @@
+"""Fingerprinted static assets with precompressed variants.
+
+At startup every file under ``static/`` is read once, content-hashed and
+compressed (gzip, plus brotli when the ``brotli`` package is installed).
+Templates link to ``asset_url('style.css')``, which is a dict lookup
+returning ``/assets/style.<hash>.css``. Because the URL changes whenever
+the content does, responses carry ``Cache-Control: immutable`` with a
+one-year max-age, and repeat visits make no static requests at all.
+``/assets/`` picks the smallest encoding the client accepts
+(``Accept-Encoding``).
+
+In development (``reload=True``) a file whose mtime changed is re-read on
+its next ``asset_url`` call, so style edits show up without a restart.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, abort, request, url_for
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+HASH_LENGTH = 10
+# Compressing tiny or already-compressed files only costs CPU.
+MIN_COMPRESS_BYTES = 256
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class Asset:
+    """One static file: its fingerprinted name and encoded bodies."""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        self.digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        stem, ext = os.path.splitext(name)
+        self.hashed_name = f'{stem}.{self.digest}{ext}'
+        self.mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        # encoding -> body, identity first; only variants that are smaller.
+        self.bodies = {'identity': data}
+        if len(data) >= MIN_COMPRESS_BYTES and self.mimetype.startswith(COMPRESSIBLE):
+            variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants['br'] = brotli.compress(data, quality=11)
+            for encoding, body in variants.items():
+                if len(body) < len(data):
+                    self.bodies[encoding] = body
+
+
+class AssetManifest:
+    """Logical name -> :class:`Asset` for everything under a directory."""
+
+    def __init__(self, folder, reload=False):
+        self.folder = folder
+        self.reload = reload
+        self.assets = {}
+        self.by_hashed_name = {}
+        self._digest = None
+        for root, _dirs, files in os.walk(folder):
+            for filename in files:
+                path = os.path.join(root, filename)
+                self._add(os.path.relpath(path, folder).replace(os.sep, '/'), path)
+
+    def _add(self, name, path):
+        old = self.assets.get(name)
+        if old is not None:
+            self.by_hashed_name.pop(old.hashed_name, None)
+        asset = self.assets[name] = Asset(path, name)
+        self.by_hashed_name[asset.hashed_name] = asset
+        self._digest = None
+        return asset
+
+    def _fresh(self, name):
+        asset = self.assets.get(name)
+        if asset is not None and self.reload:
+            try:
+                if os.path.getmtime(asset.path) != asset.mtime:
+                    asset = self._add(name, asset.path)
+            except OSError:
+                asset = None
+        return asset
+
+    @property
+    def digest(self):
+        """Digest over all fingerprints; changes when any asset does."""
+        if self.reload:
+            for name in list(self.assets):
+                self._fresh(name)
+        if self._digest is None:
+            joined = ','.join(f'{n}={a.digest}' for n, a in sorted(self.assets.items()))
+            self._digest = hashlib.sha256(joined.encode()).hexdigest()[:HASH_LENGTH]
+        return self._digest
+
+    def url(self, name):
+        """Fingerprinted URL for ``name`` (plain static URL if unknown)."""
+        asset = self._fresh(name)
+        if asset is None:
+            return url_for('static', filename=name)
+        return url_for('asset', filename=asset.hashed_name)
+
+    def response(self, filename):
+        """View for ``/assets/<filename>``, where ``filename`` is hashed."""
+        asset = self.by_hashed_name.get(filename)
+        if asset is None:
+            abort(404)
+        accepted = request.accept_encodings
+        encoding = min((e for e in asset.bodies if e == 'identity' or accepted[e]),
+                       key=lambda e: len(asset.bodies[e]))
+        resp = Response(asset.bodies[encoding], mimetype=asset.mimetype)
+        if encoding != 'identity':
+            resp.headers['Content-Encoding'] = encoding
+        resp.headers['Cache-Control'] = IMMUTABLE
+        resp.vary.add('Accept-Encoding')
+        resp.set_etag(f'{asset.digest}-{encoding}')
+        return resp.make_conditional(request)
+
+
+def init_app(app, reload=False):
+    """Build the manifest for ``app.static_folder`` and register
+    ``/assets/<hashed name>`` plus the ``asset_url`` template global."""
+    manifest = AssetManifest(app.static_folder, reload=reload)
+    app.extensions['assets'] = manifest
+    app.add_url_rule('/assets/<path:filename>', 'asset', manifest.response)
+    app.jinja_env.globals['asset_url'] = manifest.url
+    return manifest
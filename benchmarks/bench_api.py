@@ -0,0 +1,73 @@
+"""Ticket ingestion throughput: one-by-one JSON API calls versus NDJSON bulk.
+
+Drives the app in-process through Flask's test client against a scratch
+SQLite database. Bulk bodies mix unique tickets with an alert storm of
+near-identical ones (``--storm`` share), which are grouped under one
+incident and cost a single classification job.
+
+Usage:
+  python -m benchmarks.bench_api --tickets 5000 --storm 0.3
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+WORDS = [f'w{i}' for i in range(5_000)]
+STORM = ('Monitoring alert: disk usage above 95 percent on volume {} of the file server, '
+         'backups and user shares may stop accepting writes soon')
+
+
+def make_app(path):
+    os.environ.update(DATABASE_URL=f'sqlite:///{path}', FLASK_ENV='testing', CLASSIFY_WORKERS='0',
+                      API_TOKENS='bench', LOCAL_MODEL_PATH='')
+    os.environ.pop('OPENAI_API_KEY', None)
+    from app import create_app
+    return create_app()
+
+
+def tickets(n, storm, rnd):
+    for i in range(n):
+        if rnd.random() < storm:
+            yield {'title': 'Disk alert', 'description': STORM.format(rnd.choice('CDE'))}
+        else:
+            yield {'title': f'Ticket {i}', 'description': ' '.join(rnd.choices(WORDS, k=25))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=5000)
+    parser.add_argument('--storm', type=float, default=0.3, help='Share of near-identical alert tickets.')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    import jobs
+    from models import ClassificationJob
+    auth = {'Authorization': 'Bearer bench'}
+
+    print(f'{"mode":<10} {"tickets":>8} {"seconds":>8} {"tickets/s":>10} {"jobs":>6} {"drain s":>8}')
+    for mode in ('single', 'bulk'):
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        app = make_app(path)
+        client = app.test_client()
+        rows = list(tickets(args.tickets, args.storm, random.Random(args.seed)))
+        start = time.perf_counter()
+        if mode == 'single':
+            for row in rows:
+                client.post('/api/tickets', json=row, headers=auth)
+        else:
+            body = ''.join(json.dumps(row) + '\n' for row in rows)
+            result = client.post('/api/tickets/bulk', data=body, headers=auth).get_json()
+            assert result['created'] == len(rows), result['errors'][:3]
+        elapsed = time.perf_counter() - start
+        with app.app_context():
+            queued = ClassificationJob.query.count()
+            start = time.perf_counter()
+            jobs.run_pending()
+            drain = time.perf_counter() - start
+        print(f'{mode:<10} {len(rows):>8} {elapsed:>8.2f} {len(rows) / elapsed:>10.0f} {queued:>6} {drain:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Closing many tickets: one POST per ticket versus one bulk action.
+
+Drives the admin views in-process through Flask's test client against a
+scratch SQLite database, completing ``--tickets`` open tickets first with
+the single-ticket view, then (on a fresh database) with one bulk POST.
+
+Usage:
+  python -m benchmarks.bench_bulk --tickets 3000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def make_app(path):
+    os.environ.update(DATABASE_URL=f'sqlite:///{path}', FLASK_ENV='testing', CLASSIFY_WORKERS='0')
+    os.environ.pop('OPENAI_API_KEY', None)
+    from app import create_app
+    return create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=3000)
+    args = parser.parse_args()
+    from models import db, Ticket, FixedIssue
+
+    print(f'{"mode":<8} {"tickets":>8} {"seconds":>8} {"tickets/s":>10}')
+    for mode in ('single', 'bulk'):
+        app = make_app(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+        with app.app_context():
+            tickets = [Ticket(title=f'Ticket {i}', description=f'Outage report {i}', category='network',
+                              priority='High', confidence=0.9, status='Open') for i in range(args.tickets)]
+            db.session.add_all(tickets)
+            db.session.commit()
+            ids = [t.id for t in tickets]
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['admin_logged_in'] = True
+        start = time.perf_counter()
+        if mode == 'single':
+            for ticket_id in ids:
+                client.post(f'/admin/ticket/{ticket_id}/complete', data={'fixed_by': 'bench'})
+        else:
+            client.post('/admin/tickets/bulk', data={'ticket_ids': ids, 'action': 'complete',
+                                                     'fixed_by': 'bench'})
+        elapsed = time.perf_counter() - start
+        with app.app_context():
+            assert FixedIssue.query.count() == len(ids)
+        print(f'{mode:<8} {len(ids):>8} {elapsed:>8.2f} {len(ids) / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
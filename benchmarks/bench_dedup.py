@@ -0,0 +1,67 @@
+"""Near-duplicate lookup latency: the SimHash block index versus a linear scan.
+
+Fills ``dedup.SimHashIndex`` with synthetic ticket fingerprints, then times
+fingerprinting a description and finding its near-duplicates, next to a
+brute-force popcount over every stored fingerprint.
+
+Usage:
+  python -m benchmarks.bench_dedup --fingerprints 200000
+"""
+import argparse
+import random
+import time
+
+import dedup
+
+WORDS = [f'w{i}' for i in range(5_000)]
+
+
+def description(rnd):
+    return ' '.join(rnd.choices(WORDS, k=30))
+
+
+def timed(fn, repeat=200):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fingerprints', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+
+    texts = [description(rnd) for _ in range(1_000)]
+    t0 = time.perf_counter()
+    prints = [dedup.simhash(t) for t in texts]
+    per_text = (time.perf_counter() - t0) / len(texts) * 1000
+    print(f'simhash: {per_text:.3f}ms per description')
+
+    index = dedup.SimHashIndex()
+    stored = {}
+    t0 = time.perf_counter()
+    for key in range(args.fingerprints):
+        fp = prints[key] if key < len(prints) else rnd.getrandbits(dedup.BITS)
+        index.add(key, fp)
+        stored[key] = fp
+    print(f'Indexed {args.fingerprints} fingerprints in {time.perf_counter() - t0:.1f}s '
+          f'(max distance {index.max_distance})')
+
+    words = texts[0].split()
+    words[3] = 'changed'
+    probe = dedup.simhash(' '.join(words))
+    miss = rnd.getrandbits(dedup.BITS)
+    for name, fp in (('near-duplicate', probe), ('no match', miss)):
+        found = index.near(fp)
+        indexed = timed(lambda: index.near(fp))
+        scan = timed(lambda: [k for k, v in stored.items() if (v ^ fp).bit_count() <= index.max_distance],
+                     repeat=3)
+        print(f'{name:<15} {len(found):>3} found  index {indexed:.3f}ms  scan {scan:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Micro-benchmark: original if/in heuristic vs the compiled rule engine.
+
+Also times the engine with several hundred extra synthetic phrases to show
+that fallback cost stays roughly flat as rules are added.
+
+Usage:
+  python -m benchmarks.bench_heuristic --iterations 20000
+"""
+import argparse
+import json
+import timeit
+
+from classifier import CATEGORIES, PRIORITY_LEVELS
+from heuristic_rules import DEFAULT_RULES_PATH, RuleEngine
+
+SAMPLES = [
+    'I forgot my password and cannot login to the portal this morning',
+    'The office printer on floor 3 is jammed again and shows error 50.1',
+    'VPN keeps dropping my internet connection every ten minutes',
+    'I think I clicked a phishing link with malware attached',
+    'The reporting app crashes when I export a report to PDF ' * 8,
+]
+
+
+def legacy_heuristic(text):
+    """The original chain of substring checks, kept for comparison."""
+    text_l = text.lower()
+    if 'password' in text_l or 'login' in text_l or 'mfa' in text_l:
+        return {'category': 'microsoft 365', 'priority': 'High', 'confidence': 0.5}
+    if 'printer' in text_l or 'hard drive' in text_l or 'keyboard' in text_l or 'mouse' in text_l:
+        return {'category': 'hardware', 'priority': 'Medium', 'confidence': 0.35}
+    if 'vpn' in text_l or 'network' in text_l or 'internet' in text_l:
+        return {'category': 'networking', 'priority': 'High', 'confidence': 0.5}
+    if 'phish' in text_l or 'malware' in text_l or 'ransom' in text_l:
+        return {'category': 'security', 'priority': 'Critical', 'confidence': 0.6}
+    return {'category': 'software', 'priority': 'Medium', 'confidence': 0.25}
+
+
+def legacy_with_extra(extra):
+    """Legacy style extended with ``extra`` additional substring checks."""
+    def fn(text):
+        text_l = text.lower()
+        for phrase in extra:
+            if phrase in text_l:
+                return {'category': 'other', 'priority': 'Low', 'confidence': 0.2}
+        return legacy_heuristic(text)
+    return fn
+
+
+def _time(fn, iterations):
+    total = timeit.timeit(lambda: [fn(t) for t in SAMPLES], number=iterations)
+    return total / (iterations * len(SAMPLES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--extra-rules', type=int, default=500)
+    args = parser.parse_args()
+
+    with open(DEFAULT_RULES_PATH) as fh:
+        config = json.load(fh)
+    engine = RuleEngine(config, CATEGORIES, PRIORITY_LEVELS)
+
+    extra = [f'synthetic phrase {i:04d}' for i in range(args.extra_rules)]
+    big = json.loads(json.dumps(config))
+    big['categories']['microsoft 365']['keywords'].update({p: 0.1 for p in extra})
+    big_engine = RuleEngine(big, CATEGORIES, PRIORITY_LEVELS)
+
+    n = args.iterations
+    print(f'{"legacy if/in chain":<34} {_time(legacy_heuristic, n):8.2f} us/text')
+    print(f'{"rule engine":<34} {_time(engine.classify, n):8.2f} us/text')
+    print(f'{f"legacy + {len(extra)} checks":<34} {_time(legacy_with_extra(extra), n // 10):8.2f} us/text')
+    print(f'{f"rule engine + {len(extra)} phrases":<34} {_time(big_engine.classify, n):8.2f} us/text')
+
+
+if __name__ == '__main__':
+    main()
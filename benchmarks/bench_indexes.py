@@ -0,0 +1,98 @@
+"""Query plans and timings for the hot queries, before and after indexes.
+
+Seeds a scratch SQLite database with the pre-index schema, times each hot
+query and prints its EXPLAIN QUERY PLAN, then applies the migrations and
+repeats.
+
+Usage:
+  python -m benchmarks.bench_indexes --tickets 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+import migrations
+from tests.test_migrations import LEGACY_SCHEMA
+
+CATEGORIES = ['networking', 'hardware', 'microsoft 365', 'software', 'security', 'other']
+PRIORITIES = ['Low', 'Medium', 'High', 'Critical']
+STAFF = [f'tech{i}' for i in range(40)]
+
+
+def seed(path, tickets, rnd):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    start = datetime(2022, 1, 1)
+    span = (datetime(2025, 1, 1) - start).total_seconds()
+    batch = []
+    for i in range(1, tickets + 1):
+        ts = (start + timedelta(seconds=span * i / tickets)).isoformat(' ')
+        batch.append((i, f'Ticket {i}', 'Seeded description', rnd.choice(CATEGORIES),
+                      rnd.choice(PRIORITIES), 0.5, 'Open', ts, ts))
+        if len(batch) == 50_000:
+            conn.executemany('INSERT INTO tickets VALUES (?,?,?,?,?,?,?,?,?)', batch)
+            batch.clear()
+    conn.executemany('INSERT INTO tickets VALUES (?,?,?,?,?,?,?,?,?)', batch)
+    fixed = [(i, i, f'Ticket {i}', 'Seeded description', rnd.choice(CATEGORIES), rnd.choice(PRIORITIES),
+              0.5, 'Fixed', rnd.choice(STAFF),
+              (start + timedelta(seconds=span * i / tickets)).isoformat(' '), None)
+             for i in range(1, tickets + 1, 3)]
+    conn.executemany('INSERT INTO fixed_issues VALUES (?,?,?,?,?,?,?,?,?,?,?)', fixed)
+    corrections = [(None, rnd.randint(1, tickets), 'software', 'networking', 'Low', 'High', 'admin',
+                    start.isoformat(' '), None) for _ in range(tickets // 10)]
+    conn.executemany('INSERT INTO ticket_corrections VALUES (?,?,?,?,?,?,?,?,?)', corrections)
+    conn.commit()
+    conn.execute('ANALYZE')
+    return conn
+
+
+QUERIES = {
+    'ticket list page': ('SELECT * FROM tickets ORDER BY created_at DESC LIMIT 15', ()),
+    'today count (date())': ("SELECT count(*) FROM tickets WHERE date(created_at) = ?", ('2024-06-01',)),
+    'today count (range)': ('SELECT count(*) FROM tickets WHERE created_at >= ? AND created_at < ?',
+                            ('2024-06-01', '2024-06-02')),
+    'fixed by category': ('SELECT * FROM fixed_issues WHERE category = ? ORDER BY fixed_at DESC LIMIT 15',
+                          ('security',)),
+    'fixed by fixed_by': ('SELECT * FROM fixed_issues WHERE fixed_by = ? ORDER BY fixed_at DESC LIMIT 15',
+                          ('tech7',)),
+    'ticket corrections': ('SELECT * FROM ticket_corrections WHERE ticket_id = ? ORDER BY corrected_at DESC',
+                           (4242,)),
+}
+
+
+def run(conn, label):
+    print(f'\n== {label} ==')
+    for name, (sql, params) in QUERIES.items():
+        plan = '; '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+        start = time.perf_counter()
+        for _ in range(5):
+            conn.execute(sql, params).fetchall()
+        ms = (time.perf_counter() - start) / 5 * 1000
+        print(f'{name:<22} {ms:9.2f} ms  {plan}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    t0 = time.perf_counter()
+    conn = seed(path, args.tickets, random.Random(args.seed))
+    print(f'Seeded {args.tickets} tickets in {time.perf_counter() - t0:.1f}s ({path})')
+    run(conn, 'before (no secondary indexes)')
+    migrations.upgrade(create_engine(f'sqlite:///{path}'))
+    conn.execute('ANALYZE')
+    run(conn, 'after migrations')
+    conn.close()
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Instrumentation overhead: metric updates and whole requests with the
+metrics hooks on and off.
+
+Times the primitive updates (a histogram observation, a counter increment,
+writing the per-process snapshot), then serves ``--requests`` requests of
+the public ticket list through Flask's test client against a scratch SQLite
+database, once without and once with the request and database hooks.
+
+Usage:
+  python -m benchmarks.bench_metrics --requests 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def make_app(path, enabled):
+    os.environ.update(DATABASE_URL=f'sqlite:///{path}', FLASK_ENV='testing', CLASSIFY_WORKERS='0')
+    os.environ.pop('OPENAI_API_KEY', None)
+    import metrics
+    metrics.ENABLED = enabled
+    from app import create_app
+    return create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+    import metrics
+    from models import db, Ticket
+
+    print(f'histogram observe   {timed(lambda: metrics.REQUEST_SECONDS.observe(0.004, "GET", "bench"), 200_000):8.2f} us')
+    print(f'counter inc         {timed(lambda: metrics.REQUESTS.inc("GET", "bench", "200"), 200_000):8.2f} us')
+    metrics.registry.configure(tempfile.mkdtemp())
+    print(f'snapshot flush      {timed(metrics.registry.flush, 500):8.2f} us')
+    metrics.registry.configure(None)
+
+    print(f'\n{"metrics":<8} {"requests":>9} {"ms/request":>11}')
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    results = {}
+    for enabled in (False, True, False, True):
+        app = make_app(path, enabled)
+        with app.app_context():
+            if not Ticket.query.count():
+                db.session.add_all(Ticket(title=f'T{i}', description='d', category='other', priority='Low',
+                                          confidence=0.5, status='Open') for i in range(200))
+                db.session.commit()
+        client = app.test_client()
+        for _ in range(50):
+            client.get('/tickets')
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            client.get('/tickets')
+        results.setdefault(enabled, []).append((time.perf_counter() - start) / args.requests * 1000)
+    for enabled, runs in results.items():
+        print(f'{"on" if enabled else "off":<8} {args.requests:>9} {min(runs):>11.3f}')
+    off, on = min(results[False]), min(results[True])
+    print(f'overhead: {on - off:+.3f} ms/request ({(on - off) / off:+.1%})')
+
+
+if __name__ == '__main__':
+    main()
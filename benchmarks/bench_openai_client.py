@@ -0,0 +1,56 @@
+"""Compare a client-per-call against the pooled client manager.
+
+Runs ``classify_text`` against a local stub, first building a new OpenAI
+client for each call (the previous behaviour) and then through
+``classifier.clients``. Reports per-call latency and how many TCP
+connections the stub accepted. The stub is plain HTTP, so the measured
+saving is the TCP handshake plus client construction; over TLS to the real
+API each avoided connection also saves a TLS handshake (typically 1-2 RTTs).
+
+Usage:
+  python -m benchmarks.bench_openai_client --calls 200
+"""
+import argparse
+import os
+import time
+
+import classifier
+from benchmarks.openai_stub import StubServer
+
+
+def _fresh_client_call(text, base_url):
+    client = classifier.OpenAI(api_key=os.environ['OPENAI_API_KEY'], base_url=base_url)
+    client.chat.completions.create(
+        model='stub', messages=[{'role': 'user', 'content': text}], max_tokens=200,
+    )
+    client.close()
+
+
+def _run(label, fn, calls, server):
+    before = server.connections
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(f'VPN is down #{i}')
+    elapsed = time.perf_counter() - start
+    print(f'{label:<22} {elapsed / calls * 1000:8.3f} ms/call  '
+          f'{server.connections - before:5d} connections')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    server = StubServer().start()
+    os.environ['OPENAI_API_KEY'] = 'stub'
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    # Measure the client path, not the cache.
+    classifier.cache.max_entries = 0
+
+    _run('client per call', lambda t: _fresh_client_call(t, server.base_url), args.calls, server)
+    _run('pooled client', classifier.classify_text, args.calls, server)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Rate-limit storage overhead: in-memory counters versus the shared SQLite
+file, per hit and per request.
+
+Times ``--hits`` sliding-window hits spread over ``--keys`` client keys on
+each storage, then the same on the SQLite file from ``--processes``
+processes at once (what gunicorn workers contend for), and finally serves
+``--requests`` rate-limited API calls through Flask's test client with each
+storage behind Flask-Limiter.
+
+Usage:
+  python -m benchmarks.bench_rate_limits --hits 50000 --processes 4 --requests 2000
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+LIMIT = '1000000 per minute'
+
+
+def hits(uri, n, keys):
+    """Microseconds per sliding-window hit against the storage at ``uri``."""
+    from limits import parse
+    from limits.storage import storage_from_string
+    from limits.strategies import SlidingWindowCounterRateLimiter
+    import rate_limits  # noqa: F401 -- registers sqlite://
+    limiter = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    limit = parse(LIMIT)
+    start = time.perf_counter()
+    for i in range(n):
+        limiter.hit(limit, f'10.0.{i % keys // 256}.{i % 256}')
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def _worker(uri, n, keys, results):
+    results.put(hits(uri, n, keys))
+
+
+def make_app(path, storage_uri):
+    os.environ.update(DATABASE_URL=f'sqlite:///{path}', FLASK_ENV='development', CLASSIFY_WORKERS='0',
+                      API_TOKENS='bench', LOCAL_MODEL_PATH='', RATELIMIT_STORAGE_URI=storage_uri)
+    os.environ.pop('OPENAI_API_KEY', None)
+    import api
+    api.RATE_LIMIT = LIMIT
+    from app import create_app
+    return create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hits', type=int, default=50_000)
+    parser.add_argument('--keys', type=int, default=1_000, help='distinct client keys')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+    sqlite_uri = f'sqlite:///{os.path.join(tmp, "limits.db")}'
+
+    print(f'{"storage":<22} {"us/hit":>8}')
+    print(f'{"memory":<22} {hits("memory://", args.hits, args.keys):>8.2f}')
+    print(f'{"sqlite":<22} {hits(sqlite_uri, args.hits, args.keys):>8.2f}')
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    n = args.hits // args.processes
+    start = time.perf_counter()
+    workers = [ctx.Process(target=_worker, args=(sqlite_uri, n, args.keys, results))
+               for _ in range(args.processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = (time.perf_counter() - start) / (n * args.processes) * 1e6
+    per_process = sum(results.get() for _ in workers) / args.processes
+    print(f'{f"sqlite x{args.processes} processes":<22} {per_process:>8.2f}  ({wall:.2f} us/hit wall clock)')
+
+    print(f'\n{"storage":<8} {"requests":>9} {"ms/request":>11}')
+    path = os.path.join(tmp, 'bench.db')
+    results = {}
+    for name, uri in (('memory', 'memory://'), ('sqlite', sqlite_uri)) * 2:
+        client = make_app(path, uri).test_client()
+        auth = {'Authorization': 'Bearer bench'}
+        for _ in range(50):
+            client.get('/api/tickets', headers=auth)
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            assert client.get('/api/tickets', headers=auth).status_code == 200
+        results.setdefault(name, []).append((time.perf_counter() - start) / args.requests * 1000)
+    for name, runs in results.items():
+        print(f'{name:<8} {args.requests:>9} {min(runs):>11.3f}')
+    memory, sqlite = min(results['memory']), min(results['sqlite'])
+    print(f'overhead: {sqlite - memory:+.3f} ms/request ({(sqlite - memory) / memory:+.1%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Full-text search latency: FTS5 ranking versus a LIKE scan.
+
+Seeds a scratch SQLite database with synthetic tickets (a Zipf-ish
+vocabulary, so some terms are rare and some very common), applies the
+migrations (which build the FTS index) and times ranked searches through
+``search.search_tickets`` next to the equivalent ``LIKE`` query.
+
+Usage:
+  python -m benchmarks.bench_search --tickets 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from flask import Flask
+
+import migrations
+import search
+from models import db
+from tests.test_migrations import LEGACY_SCHEMA
+
+WORDS = [f'w{i}' for i in range(20_000)]
+TOPICS = ['outlook', 'sync', 'printer', 'vpn', 'teams', 'password', 'laptop', 'firmware']
+
+
+def seed(path, tickets, rnd):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(WORDS))))
+    batch = []
+    for i in range(1, tickets + 1):
+        words = rnd.choices(WORDS, cum_weights=cum_weights, k=25) + rnd.sample(TOPICS, 2)
+        rnd.shuffle(words)
+        batch.append((i, ' '.join(words[:5]), ' '.join(words[5:]), 'software', 'Low', 0.5, 'Open',
+                      '2024-01-01 00:00:00', '2024-01-01 00:00:00'))
+        if len(batch) == 50_000:
+            conn.executemany('INSERT INTO tickets VALUES (?,?,?,?,?,?,?,?,?)', batch)
+            batch.clear()
+    conn.executemany('INSERT INTO tickets VALUES (?,?,?,?,?,?,?,?,?)', batch)
+    conn.commit()
+    return conn
+
+
+def timed(fn, repeat=5):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    t0 = time.perf_counter()
+    conn = seed(path, args.tickets, random.Random(args.seed))
+    print(f'Seeded {args.tickets} tickets in {time.perf_counter() - t0:.1f}s ({path})')
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(app)
+    with app.app_context():
+        t0 = time.perf_counter()
+        migrations.upgrade(db.engine)
+        print(f'Built FTS index in {time.perf_counter() - t0:.1f}s')
+        queries = {
+            'rare term': 'w19000',
+            'rare + topic': 'w15000 outlook',
+            'two topics': 'outlook sync',
+            'prefix': 'firmw*',
+            'common term': 'w0',
+        }
+        print(f'{"query":<14} {"matches":>9} {"fts p1":>10} {"fts p5":>10} {"like p1":>10}')
+        for name, q in queries.items():
+            terms = q.split()
+            matches = conn.execute('SELECT count(*) FROM tickets_fts WHERE tickets_fts MATCH ?',
+                                   (search.match_query(q),)).fetchone()[0]
+            fts1 = timed(lambda: search.search_tickets(q, page=1))
+            fts5 = timed(lambda: search.search_tickets(q, page=5))
+            like_sql = ('SELECT id FROM tickets WHERE ' + ' AND '.join(
+                ['(title LIKE ? OR description LIKE ?)'] * len(terms)) + ' ORDER BY created_at DESC LIMIT 16')
+            params = [p for t in terms for p in (f'%{t}%', f'%{t}%')]
+            like = timed(lambda: conn.execute(like_sql, params).fetchall(), repeat=1)
+            print(f'{name:<14} {matches:>9} {fts1:>8.2f}ms {fts5:>8.2f}ms {like:>8.1f}ms')
+    conn.close()
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Mixed read/write load on one SQLite file: default settings versus WAL mode.
+
+Runs writer processes that submit tickets and reader processes that load
+the ticket list and detail pages, all through the Flask app like separate
+gunicorn workers would, for a fixed duration. It reports write throughput,
+"database is locked" failures and read latency percentiles, first with
+the stock SQLite settings (rollback journal, one shared pool) and then
+with ``database.py``'s pragmas and read-only pool.
+
+Usage:
+  python -m benchmarks.bench_sqlite_concurrency --writers 3 --readers 3 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from tests.test_migrations import LEGACY_SCHEMA
+
+WORDS = ('outlook printer vpn teams password laptop sync firmware monitor dock '
+         'mail crash slow error login screen network drive update install').split()
+
+
+def seed(path, tickets):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    rnd = random.Random(1)
+    conn.executemany('INSERT INTO tickets VALUES (?,?,?,?,?,?,?,?,?)', [
+        (i, f'Ticket {i}', ' '.join(rnd.choices(WORDS, k=20)), 'software', 'Low', 0.5, 'Open',
+         '2024-01-01 00:00:00', '2024-01-01 00:00:00') for i in range(1, tickets + 1)])
+    conn.commit()
+    conn.close()
+
+
+def make_app(path, tuned):
+    os.environ.update(DATABASE_URL=f'sqlite:///{path}', FLASK_ENV='testing', CLASSIFY_WORKERS='0')
+    os.environ.pop('OPENAI_API_KEY', None)
+    import database
+    if not tuned:
+        database.configure = database.install = lambda *args: None
+    from app import create_app
+    return create_app()
+
+
+def writer(path, tuned, seconds, results):
+    client = make_app(path, tuned).test_client()
+    rnd = random.Random(os.getpid())
+    ok = failed = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        description = ' '.join(rnd.choices(WORDS, k=25))
+        try:
+            resp = client.post('/submit', data={'title': 'Load', 'description': description})
+            ok += resp.status_code == 302
+        except Exception:  # "database is locked" surfaces as an OperationalError
+            failed += 1
+    results.put(('write', ok, failed, []))
+
+
+def reader(path, tuned, seconds, results, tickets):
+    client = make_app(path, tuned).test_client()
+    rnd = random.Random(os.getpid())
+    latencies, failed = [], 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        url = '/tickets' if rnd.random() < 0.5 else f'/ticket/{rnd.randint(1, tickets)}'
+        start = time.perf_counter()
+        try:
+            client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            failed += 1
+    results.put(('read', len(latencies), failed, latencies))
+
+
+def run(tuned, args):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    seed(path, args.tickets)
+    ctx = multiprocessing.get_context('spawn')
+    # Apply migrations once, before the workers start.
+    setup = ctx.Process(target=make_app, args=(path, tuned))
+    setup.start()
+    setup.join()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=writer, args=(path, tuned, args.seconds, results))
+             for _ in range(args.writers)]
+    procs += [ctx.Process(target=reader, args=(path, tuned, args.seconds, results, args.tickets))
+              for _ in range(args.readers)]
+    for p in procs:
+        p.start()
+    outcomes = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    writes = sum(ok for kind, ok, _, _ in outcomes if kind == 'write')
+    write_errors = sum(failed for kind, _, failed, _ in outcomes if kind == 'write')
+    latencies = sorted(ms for kind, _, _, lat in outcomes if kind == 'read' for ms in lat)
+    read_errors = sum(failed for kind, _, failed, _ in outcomes if kind == 'read')
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    label = 'WAL + pragmas' if tuned else 'default'
+    print(f'{label:<14} {writes / args.seconds:>8.1f}/s {write_errors:>7} '
+          f'{len(latencies) / args.seconds:>8.1f}/s {q[49]:>7.1f}ms {q[94]:>7.1f}ms {q[98]:>7.1f}ms {read_errors:>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=3)
+    parser.add_argument('--readers', type=int, default=3)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--tickets', type=int, default=50_000)
+    args = parser.parse_args()
+    print(f'{"settings":<14} {"writes":>10} {"w.errs":>7} {"reads":>10} {"p50":>9} {"p95":>9} {"p99":>9} {"r.errs":>7}')
+    for tuned in (False, True):
+        run(tuned, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""HTTP load test: throughput and p50/p95/p99 latency per endpoint.
+
+Starts the app under gunicorn against a copy of a seeded database (see
+``benchmarks.seed``; the seed file is created on first use), with
+classification going through ``classify_text`` to a local OpenAI stub
+whose latency and error rate are configurable. Then ``--users``
+concurrent users, each with its own keep-alive connection, pick endpoints
+from ``--mix`` for ``--seconds`` after a warm-up. Every run starts from the
+same seeded rows, so two runs differ only by the code and the settings.
+
+The server runs with ``FLASK_ENV=testing`` so the form's CSRF token and
+rate limits do not get in the way; admin users log in with a generated
+password. Results are printed and saved as JSON (``--out``); ``--compare``
+prints the change against an earlier result file.
+
+The driver shares the machine with the server, and its threads share one
+interpreter, so absolute numbers are a lower bound; compare runs made on
+the same machine, or run the driver elsewhere with ``--url`` (the target
+must then allow the load: testing mode or raised limits, and
+``--admin-password`` for the admin endpoints).
+
+Usage:
+  python -m benchmarks.loadtest --tickets 100000 --users 20 --seconds 60 \\
+      --stub-latency 0.8 --stub-error-rate 0.02 --out before.json
+  python -m benchmarks.loadtest --tickets 100000 --users 20 --seconds 60 --compare before.json
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import secrets
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks import seed
+from benchmarks.openai_stub import StubServer
+
+# endpoint -> share of requests; admin endpoints need a logged-in session.
+DEFAULT_MIX = 'list_tickets=45,ticket_detail=25,submit_ticket=15,admin_search=10,export=5'
+ADMIN_ENDPOINTS = {'admin_search', 'export'}
+SEARCH_WORDS = ['vpn', 'printer', 'outlook', 'password', 'malware', 'update', 'monitor', 'sync']
+PERCENTILES = (50, 95, 99)
+# Repository root, for gunicorn.conf.py (its hook starts the classification threads).
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in REQUESTS:
+            raise SystemExit(f'Unknown endpoint {name!r}; choose from {", ".join(REQUESTS)}.')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _list_tickets(user):
+    return 'GET', '/tickets', None
+
+
+def _ticket_detail(user):
+    return 'GET', f'/ticket/{user.rnd.randint(1, user.tickets)}', None
+
+
+def _submit_ticket(user):
+    title, description = seed.ticket_text(user.rnd, user.rnd.choice(list(seed.PHRASES)))
+    return 'POST', '/submit', {'title': title, 'description': description}
+
+
+def _admin_search(user):
+    return 'GET', '/admin/search?' + urlencode({'q': user.rnd.choice(SEARCH_WORDS)}), None
+
+
+def _export(user):
+    query = urlencode({'category': user.rnd.choice(list(seed.PHRASES))})
+    return 'GET', f'/admin/fixed-issues/export.csv?{query}', None
+
+
+REQUESTS = {'list_tickets': _list_tickets, 'ticket_detail': _ticket_detail, 'submit_ticket': _submit_ticket,
+            'admin_search': _admin_search, 'export': _export}
+
+
+class User:
+    """One simulated user: a keep-alive connection and a session cookie."""
+
+    def __init__(self, base_url, tickets, seed_value):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.tickets = tickets
+        self.rnd = random.Random(seed_value)
+        self.cookie = None
+        self.conn = None
+
+    def request(self, method, path, form=None):
+        """Send one request and read the whole body; returns the status."""
+        headers = {}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.conn.request(method, path, body, headers)
+                resp = self.conn.getresponse()
+                resp.read()
+                break
+            except (OSError, http.client.HTTPException):
+                # The server closed an idle keep-alive connection; retry once.
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        cookie = resp.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return resp.status
+
+    def login(self, password):
+        status = self.request('POST', '/admin/login', {'password': password})
+        if status != 302:
+            raise SystemExit(f'Admin login failed ({status}); check --admin-password.')
+
+
+def _user_loop(user, mix, stop, warmup_until, think, results):
+    names, weights = list(mix), list(mix.values())
+    while not stop.is_set():
+        name = user.rnd.choices(names, weights)[0]
+        method, path, form = REQUESTS[name](user)
+        start = time.perf_counter()
+        try:
+            status = user.request(method, path, form)
+            ok = status < 400
+        except (OSError, http.client.HTTPException):
+            ok = False
+        elapsed = time.perf_counter() - start
+        if start >= warmup_until:
+            results[name].append((elapsed, ok))
+        if think:
+            time.sleep(user.rnd.expovariate(1 / think))
+
+
+def run_load(base_url, mix, users, seconds, warmup, tickets, think=0.0, admin_password=None, seed_value=1):
+    """Drive ``base_url``; returns ``{endpoint: summary}`` and the totals."""
+    results = defaultdict(list)
+    stop = threading.Event()
+    pool = [User(base_url, tickets, seed_value * 1000 + i) for i in range(users)]
+    if ADMIN_ENDPOINTS & set(mix):
+        for user in pool:
+            user.login(admin_password)
+    warmup_until = time.perf_counter() + warmup
+    threads = [threading.Thread(target=_user_loop, args=(user, mix, stop, warmup_until, think, results),
+                                daemon=True) for user in pool]
+    for t in threads:
+        t.start()
+    time.sleep(warmup + seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    endpoints = {name: summarize(samples, seconds) for name, samples in sorted(results.items())}
+    total = summarize([s for samples in results.values() for s in samples], seconds)
+    return endpoints, total
+
+
+def summarize(samples, seconds):
+    latencies = sorted(elapsed * 1000 for elapsed, _ in samples)
+    summary = {
+        'requests': len(samples),
+        'errors': sum(1 for _, ok in samples if not ok),
+        'rps': round(len(samples) / seconds, 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        'max_ms': round(latencies[-1], 2) if latencies else None,
+    }
+    for p in PERCENTILES:
+        value = percentile(latencies, p)
+        summary[f'p{p}_ms'] = round(value, 2) if value is not None else None
+    return summary
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base_url, process, timeout=60):
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit('gunicorn exited during start-up; see its output above.')
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+            conn.request('GET', '/tickets')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('gunicorn did not answer within a minute.')
+
+
+def prepare_database(path, tickets, seed_value):
+    """Seed ``path`` if needed and return a scratch copy for this run."""
+    if not os.path.exists(path):
+        print(f'Seeding {tickets:,} tickets into {path} (once)...')
+        os.makedirs(os.path.dirname(os.path.abspath(path)) or '.', exist_ok=True)
+        subprocess.run([sys.executable, '-m', 'benchmarks.seed', '--db', path, '--tickets', str(tickets),
+                        '--seed', str(seed_value)], check=True)
+    conn = sqlite3.connect(path)
+    seeded = conn.execute('SELECT max(id) FROM tickets').fetchone()[0] or 0
+    # Fold the WAL into the main file so a plain copy is complete.
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    if seeded != tickets:
+        raise SystemExit(f'{path} holds {seeded:,} tickets, not {tickets:,}; pick another --db.')
+    scratch = os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'run.db')
+    shutil.copyfile(path, scratch)
+    return scratch
+
+
+def start_server(db_path, stub, args, admin_password):
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', FLASK_ENV='testing',
+               FLASK_SECRET=secrets.token_hex(16), ADMIN_PASSWORD=admin_password,
+               CLASSIFY_WORKERS=str(args.classify_workers), OPENAI_API_KEY='stub',
+               OPENAI_BASE_URL=stub.base_url, METRICS_DIR=os.path.join(os.path.dirname(db_path), 'metrics'))
+    env.pop('ADMIN_PASSWORD_HASH', None)
+    env.pop('LOCAL_MODEL_PATH', None)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', os.path.join(ROOT, 'gunicorn.conf.py'), '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+         '--threads', str(args.threads), '--log-level', 'warning', 'app:create_app()'], env=env)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        _wait_ready(base_url, process)
+    except BaseException:
+        process.terminate()
+        raise
+    return process, base_url
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(endpoints, total):
+    columns = ('requests', 'errors', 'rps') + tuple(f'p{p}_ms' for p in PERCENTILES) + ('max_ms',)
+    print(f'\n{"endpoint":<15}' + ''.join(f'{c:>10}' for c in columns))
+    for name, summary in list(endpoints.items()) + [('total', total)]:
+        print(f'{name:<15}' + ''.join(f'{"-" if summary[c] is None else summary[c]:>10}' for c in columns))
+
+
+def print_comparison(old, new):
+    print(f'\nChange against {old["commit"] or "baseline"} ({old["started_at"]}):')
+    print(f'{"endpoint":<15}' + ''.join(f'{c:>26}' for c in ('rps', 'p95_ms', 'p99_ms')))
+    rows = [(name, old['endpoints'].get(name), summary) for name, summary in new['endpoints'].items()]
+    for name, before, after in rows + [('total', old['total'], new['total'])]:
+        if not before:
+            continue
+        cells = []
+        for key in ('rps', 'p95_ms', 'p99_ms'):
+            a, b = before[key], after[key]
+            change = f'{(b - a) / a:+.0%}' if a and b is not None else ''
+            cells.append(f'{a} -> {b} {change}')
+        print(f'{name:<15}' + ''.join(f'{c:>26}' for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=10_000, help='seeded tickets')
+    parser.add_argument('--db', help='seeded database to copy (default instance/loadtest-<tickets>.db)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--think', type=float, default=0.0, help='mean pause between requests, seconds')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint=weight list')
+    parser.add_argument('--workers', type=int, default=3, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--classify-workers', type=int, default=2, help='classification threads per worker')
+    parser.add_argument('--stub-latency', type=float, default=0.5, help='stub OpenAI latency, seconds')
+    parser.add_argument('--stub-jitter', type=float, default=0.5)
+    parser.add_argument('--stub-error-rate', type=float, default=0.0)
+    parser.add_argument('--url', help='drive this server instead of starting one')
+    parser.add_argument('--admin-password', help='admin password of the --url server')
+    parser.add_argument('--out', help='write the results as JSON here '
+                                      '(default benchmarks/results/<time>.json)')
+    parser.add_argument('--compare', help='an earlier result file to compare against')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    process = stub = None
+    admin_password = args.admin_password
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        db_path = prepare_database(args.db or f'instance/loadtest-{args.tickets}.db', args.tickets, args.seed)
+        stub = StubServer(latency=args.stub_latency, jitter=args.stub_jitter,
+                          error_rate=args.stub_error_rate, seed=args.seed).start()
+        admin_password = secrets.token_urlsafe(12)
+        process, base_url = start_server(db_path, stub, args, admin_password)
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    print(f'{args.users} users for {args.seconds:g} s (+{args.warmup:g} s warm-up) against {base_url}')
+    try:
+        endpoints, total = run_load(base_url, mix, args.users, args.seconds, args.warmup, args.tickets,
+                                    args.think, admin_password, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if stub is not None:
+            stub.shutdown()
+
+    result = {
+        'started_at': started_at,
+        'commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'cpus': os.cpu_count(),
+        'settings': {k: v for k, v in vars(args).items() if k not in ('out', 'compare', 'admin_password')},
+        'mix': mix,
+        'endpoints': endpoints,
+        'total': total,
+        'stub': {'calls': stub.calls, 'errors': stub.errors} if stub is not None else None,
+    }
+    print_table(endpoints, total)
+    if stub is not None:
+        print(f'\nstub OpenAI: {stub.calls} calls, {stub.errors} injected errors')
+    out = args.out or os.path.join('benchmarks', 'results', started_at.replace(':', '') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as fh:
+        json.dump(result, fh, indent=2)
+    print(f'Saved {out}')
+    if args.compare:
+        with open(args.compare) as fh:
+            print_comparison(json.load(fh), result)
+
+
+if __name__ == '__main__':
+    main()
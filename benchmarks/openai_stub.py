@@ -0,0 +1,146 @@
+"""Minimal local stand-in for the OpenAI Chat Completions endpoint.
+
+Speaks HTTP/1.1 with keep-alive and counts accepted TCP connections, so
+benchmarks can show how many handshakes a client performs. ``latency``
+(plus up to ``jitter``) seconds are added to every response and an
+``error_rate`` share of requests fail, alternating between 429 and 500
+(both of which the SDK retries), so load tests can model a slow or
+flaky upstream. Answers pick the category whose keyword appears in the
+ticket text, falling back to "software".
+
+Usage:
+  python -m benchmarks.openai_stub --port 8765 --latency 0.8 --jitter 0.4 --error-rate 0.02
+  OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python app.py
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+KEYWORDS = {'vpn': 'networking', 'wi-fi': 'networking', 'network': 'networking',
+            'printer': 'hardware', 'monitor': 'hardware', 'keyboard': 'hardware',
+            'outlook': 'microsoft 365', 'onedrive': 'microsoft 365', 'teams': 'microsoft 365',
+            'phishing': 'security', 'malware': 'security', 'ransom': 'security'}
+
+
+def completion(category, priority, confidence=0.9):
+    return {
+        'id': 'chatcmpl-stub',
+        'object': 'chat.completion',
+        'created': 0,
+        'model': 'stub',
+        'choices': [{
+            'index': 0,
+            'finish_reason': 'stop',
+            'message': {
+                'role': 'assistant',
+                'content': json.dumps({'category': category, 'priority': priority, 'confidence': confidence}),
+            },
+        }],
+        'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2},
+    }
+
+
+def _category(body):
+    try:
+        text = body['messages'][-1]['content'].lower()
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return 'software'
+    return next((c for word, c in KEYWORDS.items() if word in text), 'software')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body in one segment; otherwise Nagle + delayed ACK add
+    # ~40 ms per response and drown out what we're trying to measure.
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        status, payload, delay = self.server.respond(raw)
+        if delay:
+            time.sleep(delay)
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.connections = 0
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def get_request(self):
+        conn = super().get_request()
+        self.connections += 1
+        return conn
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-request (an app being stopped) are expected.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def respond(self, raw):
+        """``(status, JSON payload, delay in seconds)`` for one request body."""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+            failed = self.error_rate and self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+                errors = self.errors
+        if failed:
+            status = 429 if errors % 2 else 500
+            return status, {'error': {'message': 'stub failure', 'type': 'server_error', 'code': status}}, delay
+        try:
+            category = _category(json.loads(raw))
+        except ValueError:
+            category = 'software'
+        return 200, completion(category, 'High' if category in ('networking', 'security') else 'Medium'), delay
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenAI-compatible stub server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many extra seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered 429/500')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    server = StubServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.seed)
+    print(f'Serving stub OpenAI API at {server.base_url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Fill a database with realistic ticket volumes for benchmarks and load tests.
+
+Writes ``--tickets`` tickets spread over the last ``--days`` days, with
+descriptions assembled from per-category phrases (so search, dedup and the
+heuristic classifier see text shaped like real tickets). A ``--fixed``
+share of them is marked Fixed with a matching ``fixed_issues`` row, and a
+``--corrections`` share carries an admin re-categorization. Rows go in
+through Core ``executemany`` in chunks, so the FTS triggers fire as they
+would in production; the fingerprints and the dashboard rollup are then
+backfilled the way ``flask db-upgrade`` and ``flask stats-rebuild`` would.
+
+The same ``--seed`` always produces the same rows (dates count back from
+today), so runs against two builds compare like with like. Expect about
+30 seconds per 100k tickets, mostly FTS indexing and fingerprinting.
+
+Usage:
+  python -m benchmarks.seed --db instance/loadtest.db --tickets 100000 --reset
+"""
+import argparse
+import os
+import random
+import time
+from datetime import timedelta
+
+from sqlalchemy import insert, select
+
+from models import utcnow
+
+PHRASES = {
+    'networking': ['the VPN disconnects every few minutes', 'no internet access on the third floor',
+                   'Wi-Fi drops when I move between meeting rooms', 'DNS lookups for the intranet time out',
+                   'the network drive is very slow today'],
+    'hardware': ['the printer on floor 2 jams on every job', 'my docking station does not detect the monitor',
+                 'keyboard keys stick after a coffee spill', 'the laptop fan is loud and it overheats',
+                 'the external hard drive is not recognised'],
+    'microsoft 365': ['Outlook keeps asking for my password', 'MFA prompt never arrives on my phone',
+                      'OneDrive sync is stuck on processing changes', 'cannot open the SharePoint site',
+                      'Teams meeting audio cuts out'],
+    'software': ['the accounting app crashes on startup', 'an update failed with error 0x80070005',
+                 'Excel freezes when opening large files', 'the licence for the design tool expired',
+                 'the browser shows a certificate warning for the HR portal'],
+    'security': ['I clicked a link in a phishing email', 'antivirus reported malware in downloads',
+                 'a colleague received a suspicious invoice attachment', 'my account shows logins from abroad',
+                 'files on the share were renamed with a ransom note'],
+    'other': ['please order a new chair for the new starter', 'the kitchen display shows nothing',
+              'question about the holiday rota', 'request access to the parking system',
+              'the meeting room calendar is wrong'],
+}
+DETAILS = ['since this morning', 'after the last update', 'only on my laptop', 'for the whole team',
+           'it worked yesterday', 'I already restarted twice', 'this is blocking a customer call',
+           'urgent please', 'happens every day around noon', 'error message attached below']
+PRIORITIES = {'networking': 'High', 'hardware': 'Medium', 'microsoft 365': 'High',
+              'software': 'Medium', 'security': 'Critical', 'other': 'Low'}
+STAFF = ['alice', 'bob', 'chen', 'dana', 'eve']
+CHUNK = 10_000
+
+
+def ticket_text(rnd, category):
+    """A (title, description) pair for ``category``."""
+    phrase = rnd.choice(PHRASES[category])
+    details = rnd.sample(DETAILS, 2)
+    description = (f'Hi, {phrase} {details[0]}. {details[1].capitalize()}. '
+                   f'Reference {rnd.randint(1000, 99999)}, asset tag LT-{rnd.randint(100, 9999)}.')
+    return phrase[:1].upper() + phrase[1:60], description
+
+
+def generate(count, fixed_share, corrections_share, days, seed, now=None):
+    """Yield ``(ticket, fixed issue or None, correction or None)`` dicts,
+    oldest ticket first."""
+    rnd = random.Random(seed)
+    # Relative to today, so the newest tickets fall inside the dedup window.
+    now = now or utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = now - timedelta(days=days)
+    step = timedelta(days=days) / max(count, 1)
+    categories = list(PHRASES)
+    for i in range(1, count + 1):
+        category = rnd.choice(categories)
+        priority = PRIORITIES[category] if rnd.random() < 0.7 else rnd.choice(list(set(PRIORITIES.values())))
+        created = start + step * i + timedelta(seconds=rnd.randint(0, 59))
+        title, description = ticket_text(rnd, category)
+        fixed = rnd.random() < fixed_share
+        updated = created + timedelta(hours=rnd.randint(1, 96)) if fixed else created
+        ticket = {'id': i, 'title': title, 'description': description, 'category': category,
+                  'priority': priority, 'confidence': round(rnd.uniform(0.4, 0.99), 2),
+                  'status': 'Fixed' if fixed else 'Open', 'created_at': created, 'updated_at': updated}
+        correction = None
+        if rnd.random() < corrections_share:
+            new_category = rnd.choice(categories)
+            correction = {'ticket_id': i, 'old_category': category, 'new_category': new_category,
+                          'old_priority': priority, 'new_priority': PRIORITIES[new_category],
+                          'corrected_by': rnd.choice(STAFF), 'corrected_at': created + timedelta(minutes=30),
+                          'notes': f'Moved to {new_category} after triage'}
+            ticket.update(category=new_category, priority=PRIORITIES[new_category])
+        fixed_issue = None
+        if fixed:
+            fixed_issue = {key: ticket[key] for key in ('title', 'description', 'category', 'priority', 'confidence')}
+            fixed_issue.update(ticket_id=i, status='Fixed', fixed_by=rnd.choice(STAFF), fixed_at=updated,
+                               notes=f'Resolved: {rnd.choice(DETAILS)}')
+        yield ticket, fixed_issue, correction
+
+
+def seed(count, fixed_share=0.3, corrections_share=0.1, days=365, seed=1, echo=print):
+    """Insert the generated rows into the current app's database; returns
+    ``{table: rows}``."""
+    import dedup
+    import stats
+    from models import db, Ticket, TicketCorrection, FixedIssue
+
+    counts = {'tickets': 0, 'fixed_issues': 0, 'ticket_corrections': 0}
+    rows = generate(count, fixed_share, corrections_share, days, seed)
+    start = time.perf_counter()
+    with db.engine.begin() as conn:
+        if conn.execute(select(Ticket.id).limit(1)).first() is not None:
+            raise SystemExit('The database already has tickets; use --reset or another --db.')
+    while True:
+        chunk = [row for _, row in zip(range(CHUNK), rows)]
+        if not chunk:
+            break
+        with db.engine.begin() as conn:
+            for table, batch in ((Ticket, [t for t, _, _ in chunk]),
+                                 (FixedIssue, [f for _, f, _ in chunk if f]),
+                                 (TicketCorrection, [c for _, _, c in chunk if c])):
+                if batch:
+                    conn.execute(insert(table), batch)
+                    counts[table.__tablename__] += len(batch)
+        echo(f'  {counts["tickets"]:>9,} tickets ({time.perf_counter() - start:.1f} s)')
+    with db.engine.begin() as conn:
+        dedup.backfill(conn)
+    stats.rebuild(db.session)
+    db.session.commit()
+    echo(f'Seeded {counts} in {time.perf_counter() - start:.1f} s.')
+    return counts
+
+
+def make_app(path):
+    os.environ.update(DATABASE_URL=f'sqlite:///{os.path.abspath(path)}', FLASK_ENV='testing',
+                      CLASSIFY_WORKERS='0')
+    os.environ.pop('OPENAI_API_KEY', None)
+    from app import create_app
+    return create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='instance/loadtest.db', help='SQLite file to fill')
+    parser.add_argument('--tickets', type=int, default=10_000)
+    parser.add_argument('--fixed', type=float, default=0.3, help='share of tickets that are fixed')
+    parser.add_argument('--corrections', type=float, default=0.1, help='share of tickets re-categorized')
+    parser.add_argument('--days', type=int, default=365, help='spread created_at over this many days')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reset', action='store_true', help='delete the database file first')
+    args = parser.parse_args()
+    if args.reset:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    with make_app(args.db).app_context():
+        seed(args.tickets, args.fixed, args.corrections, args.days, args.seed)
+
+
+if __name__ == '__main__':
+    main()
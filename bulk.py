@@ -0,0 +1,99 @@
+"""Bulk admin actions: complete or re-label many tickets in one transaction.
+
+The single-ticket views load each ticket through the ORM, copy it and
+commit, one POST per ticket. These actions are set-based instead: per
+chunk of ids there is one ``INSERT ... SELECT`` (into ``fixed_issues`` or
+``ticket_corrections``) and one ``UPDATE`` of ``tickets``. All chunks share
+one transaction, so an action on a few thousand tickets takes a few dozen
+statements and either fully applies or not at all.
+
+Being Core statements, they bypass the ORM flush hook and adjust the
+``ticket_stats`` rollup with :func:`stats.record` themselves.
+"""
+from sqlalchemy import insert, literal, or_, select, update
+
+from models import db, Ticket, TicketCorrection, FixedIssue, utcnow
+import dedup
+import stats
+
+# Ticket ids bound per statement, well below SQLite's parameter limit.
+CHUNK = 500
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for i in range(0, len(ids), CHUNK):
+        yield ids[i:i + CHUNK]
+
+
+def with_duplicates(ids):
+    """``ids`` plus every ticket grouped under one of them."""
+    found = set(ids)
+    for chunk in _chunks(ids):
+        found.update(db.session.execute(
+            select(Ticket.id).where(Ticket.duplicate_of.in_(chunk))).scalars())
+    return found
+
+
+def complete(ids, fixed_by='admin', notes=''):
+    """Archive the not-yet-fixed tickets among ``ids`` as fixed issues and
+    mark them Fixed. Returns how many were completed."""
+    now = utcnow()
+    transitions, archived = [], []
+    for chunk in _chunks(ids):
+        selected = (Ticket.id.in_(chunk), Ticket.status != 'Fixed')
+        # Insert first: the rows read below are then already under this
+        # transaction's write lock.
+        archived += db.session.execute(
+            insert(FixedIssue).from_select(
+                ['ticket_id', 'title', 'description', 'category', 'priority', 'confidence',
+                 'status', 'fixed_by', 'fixed_at', 'notes', 'simhash'],
+                select(Ticket.id, Ticket.title, Ticket.description, Ticket.category, Ticket.priority,
+                       Ticket.confidence, literal('Fixed'), literal(fixed_by), literal(now),
+                       literal(notes), Ticket.simhash).where(*selected),
+            ).returning(FixedIssue.id, FixedIssue.ticket_id, FixedIssue.simhash)
+        ).all()
+        for row in db.session.execute(
+            select(Ticket.created_at, Ticket.category, Ticket.priority, Ticket.status).where(*selected)
+        ):
+            transitions.append((stats.key(*row),
+                                stats.key(row.created_at, row.category, row.priority, 'Fixed')))
+        db.session.execute(update(Ticket).where(*selected).values(status='Fixed', updated_at=now),
+                           execution_options={'synchronize_session': False})
+    stats.record(db.session, transitions)
+    db.session.commit()
+    dedup.index.add_fixes(archived)
+    return len(archived)
+
+
+def recategorize(ids, category=None, priority=None, corrected_by='admin', notes=None):
+    """Set ``category`` and/or ``priority`` on ``ids`` (None keeps the
+    current value), logging a correction for every ticket that changes.
+    Returns how many changed."""
+    values = {k: v for k, v in (('category', category), ('priority', priority)) if v}
+    if not values:
+        return 0
+    now = utcnow()
+    changed = or_(*(getattr(Ticket, k).is_distinct_from(v) for k, v in values.items()))
+    new_category = literal(category) if 'category' in values else Ticket.category
+    new_priority = literal(priority) if 'priority' in values else Ticket.priority
+    count, transitions = 0, []
+    for chunk in _chunks(ids):
+        selected = (Ticket.id.in_(chunk), changed)
+        count += db.session.execute(insert(TicketCorrection).from_select(
+            ['ticket_id', 'old_category', 'new_category', 'old_priority', 'new_priority',
+             'corrected_by', 'corrected_at', 'notes'],
+            select(Ticket.id, Ticket.category, new_category, Ticket.priority, new_priority,
+                   literal(corrected_by), literal(now), literal(notes)).where(*selected),
+        )).rowcount
+        for row in db.session.execute(
+            select(Ticket.created_at, Ticket.category, Ticket.priority, Ticket.status).where(*selected)
+        ):
+            transitions.append((stats.key(*row), stats.key(
+                row.created_at, values.get('category', row.category),
+                values.get('priority', row.priority), row.status)))
+        db.session.execute(update(Ticket).where(*selected).values(**values, label_source='admin', updated_at=now),
+                           execution_options={'synchronize_session': False})
+    stats.record(db.session, transitions)
+    db.session.commit()
+    return count
@@ -1,8 +1,22 @@
 import os
 import re
 import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta, timezone
 
-from typing import Dict
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from heuristic_rules import load_rules
+import local_model
+import metrics
 
 # SECURITY NOTE: Ticket text is sent to a third-party LLM (OpenAI) for
 # classification. Before transmission we apply a conservative redaction pass
@@ -13,43 +27,75 @@ from typing import Dict
 
 try:  # openai>=1.0 SDK
     from openai import OpenAI
+    import httpx
 except ImportError:  # pragma: no cover - import guard
     OpenAI = None
+    httpx = None
 
 # Cap on characters sent to the model (bounds token cost / leakage surface).
 MAX_MODEL_CHARS = 4000
 
 REDACTION_PLACEHOLDER = '[REDACTED]'
 
-# Conservative redaction patterns. Order matters: more specific key/token
-# patterns run before the generic long-blob pattern.
-_REDACTION_PATTERNS = [
-    # Email addresses
-    re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}'),
+# Conservative redaction patterns, applied one after another in this order
+# (more specific key/token patterns before the generic long-blob pattern);
+# each pass sees the previous one's placeholders.
+_REDACTION_PATTERNS = (
+    ('emails', re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')),
     # OpenAI-style keys (sk-..., sk-proj-..., etc.)
-    re.compile(r'\bsk-[A-Za-z0-9_-]{8,}\b'),
-    # Bearer tokens in Authorization-style headers
-    re.compile(r'(?i)\bBearer\s+[A-Za-z0-9._~+/=-]{8,}'),
-    # Long base64/hex-like secret blobs (20+ chars, mixed token chars)
-    re.compile(r'\b[A-Za-z0-9+/_=-]{20,}\b'),
-]
+    ('keys', re.compile(r'\bsk-[A-Za-z0-9_-]{8,}\b')),
+    # Bearer tokens in Authorization-style headers.
+    ('bearer_tokens', re.compile(r'\b(?i:Bearer)\s+[A-Za-z0-9._~+/=-]{8,}')),
+    # Long base64/hex-like secret blobs (20+ chars, mixed token chars).
+    ('blobs', re.compile(r'\b[A-Za-z0-9+/_=-]{20,}\b')),
+)
+_REDACTION_KINDS = tuple(kind for kind, _ in _REDACTION_PATTERNS)
+# All patterns as one alternation, used only to detect that a text needs no
+# redaction at all: if none of them matches the input, no pass changes it.
+# Most tickets are plain prose, so they cost one scan instead of four. Every
+# match starts with one of the lookahead's characters; rejecting other
+# positions up front keeps the per-character cost low.
+_REDACTION_RE = re.compile(
+    r'(?=[A-Za-z0-9._%+/=-])(?:' + '|'.join(f'(?:{p.pattern})' for _, p in _REDACTION_PATTERNS) + ')')
 
+# Hard bound on how much input a single redaction will look at. Far above
+# what the submit form or API accept, so it only guards bulk callers
+# against pathological inputs; the cut is placed on whitespace so it never
+# splits a token.
+MAX_SCAN_CHARS = MAX_MODEL_CHARS * 4
 
-def _redact(text: str) -> str:
-    """Mask obvious secrets/PII before sending text to the third-party LLM.
+
+def redact_for_model(text: str):
+    """Redact secrets/PII and cap ``text`` at ``MAX_MODEL_CHARS`` for the
+    copy sent to the third-party LLM.
 
     Conservative by design so normal prose is left intact: only emails,
-    API-key/token-like strings and long base64/hex blobs are masked.
+    API-key/token-like strings and long base64/hex blobs are masked. Returns
+    ``(safe_text, stats)`` where ``stats`` counts redactions per kind
+    (``emails``, ``keys``, ``bearer_tokens``, ``blobs``) and says whether the
+    text was ``truncated``.
     """
-    redacted = text
-    for pattern in _REDACTION_PATTERNS:
-        redacted = pattern.sub(REDACTION_PLACEHOLDER, redacted)
-    return redacted
+    stats = dict.fromkeys(_REDACTION_KINDS, 0)
+    scanned = text
+    if len(text) > MAX_SCAN_CHARS:
+        cut = text.rfind(' ', 0, MAX_SCAN_CHARS)
+        scanned = text[:cut if cut > 0 else MAX_SCAN_CHARS]
+    out = scanned
+    if _REDACTION_RE.search(out):
+        for kind, pattern in _REDACTION_PATTERNS:
+            out, stats[kind] = pattern.subn(REDACTION_PLACEHOLDER, out)
+    stats['truncated'] = len(out) > MAX_MODEL_CHARS or len(scanned) < len(text)
+    return out[:MAX_MODEL_CHARS], stats
+
 
+def _observe_redaction(stats):
+    """Count what :func:`redact_for_model` masked in the ``/metrics`` counters."""
+    for kind in _REDACTION_KINDS:
+        if stats[kind]:
+            metrics.CLASSIFY_REDACTIONS.inc(kind, amount=stats[kind])
+    if stats['truncated']:
+        metrics.CLASSIFY_TRUNCATED.inc()
 
-def _sanitize_for_model(text: str) -> str:
-    """Redact secrets then cap length for the copy sent to the model."""
-    return _redact(text)[:MAX_MODEL_CHARS]
 
 # Category taxonomy and basic priority mapping
 CATEGORIES = [
@@ -63,6 +109,334 @@ CATEGORIES = [
 
 PRIORITY_LEVELS = ['Low', 'Medium', 'High', 'Critical']
 
+# Bump whenever CATEGORIES, PRIORITY_LEVELS or the prompt change so cached
+# classifications made under the old taxonomy are no longer served.
+TAXONOMY_VERSION = '1'
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _normalize_for_cache(text: str) -> str:
+    """Collapse whitespace and case so trivially different texts share a key."""
+    return ' '.join(text.split()).casefold()
+
+
+def cache_key(safe_text: str, model: str) -> str:
+    """Cache key for already-redacted model input under ``model``."""
+    raw = f"{TAXONOMY_VERSION}\0{model}\0{_normalize_for_cache(safe_text)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class SQLCacheStore:
+    """Classification cache table shared by every worker process.
+
+    Uses its own short transactions on ``engine`` so cache traffic never
+    touches the caller's ORM session. Failures are swallowed by the caller:
+    the cache is an optimization, never a reason to fail classification.
+    """
+
+    def __init__(self, engine, table, max_rows: int = 100_000):
+        self.engine = engine
+        self.table = table
+        self.max_rows = max_rows
+
+    def get(self, key: str) -> Optional[Dict]:
+        t = self.table
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(t.c.category, t.c.priority, t.c.confidence)
+                .where(t.c.key == key, t.c.expires_at > _utcnow())
+            ).first()
+        if row is None:
+            return None
+        return {'category': row.category, 'priority': row.priority, 'confidence': row.confidence}
+
+    def put(self, key: str, model: str, result: Dict, ttl: float):
+        t = self.table
+        now = _utcnow()
+        with self.engine.begin() as conn:
+            conn.execute(delete(t).where(t.c.key == key))
+            conn.execute(insert(t).values(
+                key=key, model=model, category=result['category'],
+                priority=result['priority'], confidence=result['confidence'],
+                created_at=now, expires_at=now + timedelta(seconds=ttl),
+            ))
+
+    def evict(self):
+        """Drop expired rows, then the oldest rows beyond ``max_rows``."""
+        t = self.table
+        with self.engine.begin() as conn:
+            conn.execute(delete(t).where(t.c.expires_at <= _utcnow()))
+            excess = conn.execute(select(func.count()).select_from(t)).scalar() - self.max_rows
+            if excess > 0:
+                oldest = select(t.c.key).order_by(t.c.created_at).limit(excess).scalar_subquery()
+                conn.execute(delete(t).where(t.c.key.in_(oldest)))
+
+
+class ClassificationCache:
+    """In-process LRU (with TTL) in front of an optional shared store."""
+
+    # Run store eviction roughly once per this many writes.
+    EVICT_EVERY = 100
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 7 * 24 * 3600, store=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(result)
+                del self._entries[key]
+        if self.store is not None:
+            try:
+                result = self.store.get(key)
+            except Exception:
+                logger.warning('Classification cache store read failed', exc_info=True)
+                result = None
+            if result is not None:
+                self._remember(key, result, now)
+                with self._lock:
+                    self.store_hits += 1
+                return dict(result)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, model: str, result: Dict):
+        self._remember(key, result, time.monotonic())
+        if self.store is None:
+            return
+        try:
+            self.store.put(key, model, result, self.ttl)
+            if random.randrange(self.EVICT_EVERY) == 0:
+                self.store.evict()
+        except Exception:
+            logger.warning('Classification cache store write failed', exc_info=True)
+
+    def _remember(self, key, result, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class _ClientManager:
+    """Process-wide OpenAI client with a keep-alive connection pool.
+
+    Building a client per call throws away its connection pool, so every
+    ticket paid a fresh TCP+TLS handshake. One client is kept per process and
+    rebuilt only when its configuration (API key, base URL, timeouts) changes
+    or the process has forked — sockets must never be shared with a gunicorn
+    parent. ``OPENAI_MODEL`` is read on every call, so model changes apply
+    immediately. A bounded semaphore caps in-flight model calls per process.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        # Called in forked children too: drop (don't close) the parent's
+        # client, since closing could tear down sockets the parent still uses.
+        # The lock is new as well: another thread may have held it at fork.
+        self._lock = threading.Lock()
+        self._client = None
+        self._config = None
+        self._pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(int(os.environ.get('OPENAI_MAX_CONCURRENCY', 4)))
+        self._executor = None
+
+    @staticmethod
+    def _current_config(api_key):
+        return (
+            OpenAI, api_key, os.environ.get('OPENAI_BASE_URL') or None,
+            float(os.environ.get('OPENAI_CONNECT_TIMEOUT', 5)),
+            float(os.environ.get('OPENAI_READ_TIMEOUT', 20)),
+            int(os.environ.get('OPENAI_MAX_CONCURRENCY', 4)),
+            int(os.environ.get('OPENAI_MAX_RETRIES', 2)),
+        )
+
+    def get(self, api_key):
+        config = self._current_config(api_key)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._client is None or self._config != config:
+                old = self._client
+                self._client = self._build(config)
+                if self._config is not None and self._config[5] != config[5]:
+                    self._slots = threading.BoundedSemaphore(config[5])
+                self._config = config
+                if old is not None:
+                    try:
+                        old.close()
+                    except Exception:
+                        pass
+            return self._client
+
+    @staticmethod
+    def _build(config):
+        factory, api_key, base_url, connect_timeout, read_timeout, max_conns, max_retries = config
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        http_client = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_conns, max_keepalive_connections=max_conns,
+                                keepalive_expiry=60),
+        )
+        return factory(api_key=api_key, base_url=base_url, timeout=timeout,
+                       max_retries=max_retries, http_client=http_client)
+
+    def slot(self, limit=None, wait=False):
+        """Acquire an in-flight slot; returns None if none frees up in time
+        (``OPENAI_QUEUE_TIMEOUT``, default half a second, or ``limit``
+        seconds if sooner), so calls over the cap fall back promptly.
+        ``wait=True`` queues for a slot as long as it takes."""
+        slots = self._slots
+        if wait:
+            slots.acquire()
+            return slots
+        timeout = float(os.environ.get('OPENAI_QUEUE_TIMEOUT', 0.5))
+        if limit is not None:
+            timeout = max(0.0, min(timeout, limit))
+        return slots if slots.acquire(timeout=timeout) else None
+
+    def submit(self, fn, *args):
+        """Run ``fn(*args)`` on this process's model-call threads, so the
+        caller can stop waiting at its deadline while the call completes."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get('OPENAI_MAX_CONCURRENCY', 4)),
+                    thread_name_prefix='openai-call')
+            return self._executor.submit(fn, *args)
+
+
+class CircuitBreaker:
+    """Stops calling the model while it keeps failing.
+
+    ``failures`` consecutive failed or slow calls (an error, a missed
+    deadline, or an answer slower than ``CLASSIFY_SLOW_SECONDS``) open the
+    circuit: for ``cooldown`` seconds every classification goes straight to
+    the heuristic. Then the circuit is half-open and lets a single probe
+    call through; its success closes the circuit, its failure opens it for
+    another cooldown. ``failures=0`` disables the breaker.
+    """
+
+    def __init__(self, failures=None, cooldown=None, clock=time.monotonic):
+        self.failures = int(os.environ.get('CLASSIFY_BREAKER_FAILURES', 5)) if failures is None else failures
+        self.cooldown = (float(os.environ.get('CLASSIFY_BREAKER_COOLDOWN_SECONDS', 30))
+                         if cooldown is None else cooldown)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self._streak = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _set(self, state):
+        self.state = state
+        metrics.CLASSIFY_CIRCUIT.inc(state)
+        log = logger.warning if state == 'open' else logger.info
+        log('Classifier circuit %s', state)
+
+    def allow(self):
+        """True if a model call may be made now."""
+        if not self.failures:
+            return True
+        with self._lock:
+            if self.state == 'open' and self._clock() - self._opened_at >= self.cooldown:
+                self._set('half-open')
+            if self.state == 'closed':
+                return True
+            if self.state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def retry_after(self):
+        """Seconds until :meth:`allow` may let a call through again: 0 while
+        closed, the rest of the cooldown while open, a full cooldown while a
+        probe is out."""
+        if not self.failures:
+            return 0.0
+        with self._lock:
+            if self.state == 'open':
+                return max(0.0, self.cooldown - (self._clock() - self._opened_at))
+            if self.state == 'half-open' and self._probing:
+                return self.cooldown
+            return 0.0
+
+    def cancel(self):
+        """Give back a probe that :meth:`allow` granted but was never sent."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok):
+        """Record the outcome of an allowed call."""
+        if not self.failures:
+            return
+        with self._lock:
+            self._probing = False
+            if ok:
+                self._streak = 0
+                if self.state != 'closed':
+                    self._set('closed')
+                return
+            self._streak += 1
+            if self.state == 'half-open' or (self.state == 'closed' and self._streak >= self.failures):
+                self._opened_at = self._clock()
+                self._set('open')
+
+
+clients = _ClientManager()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=clients._reset)
+
+breaker = CircuitBreaker()
+
+
+# Process-wide cache; ``create_app`` attaches the shared SQL store.
+# CLASSIFY_CACHE_SIZE=0 disables caching entirely.
+cache = ClassificationCache(
+    max_entries=int(os.environ.get('CLASSIFY_CACHE_SIZE', 2048)),
+    ttl=float(os.environ.get('CLASSIFY_CACHE_TTL', 7 * 24 * 3600)),
+)
+
 
 def _build_system_message() -> str:
     """Trusted instructions only — never includes untrusted ticket text."""
@@ -92,61 +466,190 @@ def _build_user_message(text: str) -> str:
     )
 
 
+_rules = None
+
+
+def _rule_engine():
+    """Compiled heuristic rules, loaded on first use."""
+    global _rules
+    if _rules is None:
+        _rules = load_rules(categories=CATEGORIES, priorities=PRIORITY_LEVELS)
+    return _rules
+
+
 def _heuristic(text: str) -> Dict:
-    """Keyword-based fallback used when the OpenAI call or parsing fails."""
-    text_l = text.lower()
-    if 'password' in text_l or 'login' in text_l or 'mfa' in text_l:
-        return {'category': 'microsoft 365', 'priority': 'High', 'confidence': 0.5}
-    if 'printer' in text_l or 'hard drive' in text_l or 'keyboard' in text_l or 'mouse' in text_l:
-        return {'category': 'hardware', 'priority': 'Medium', 'confidence': 0.35}
-    if 'vpn' in text_l or 'network' in text_l or 'internet' in text_l:
-        return {'category': 'networking', 'priority': 'High', 'confidence': 0.5}
-    if 'phish' in text_l or 'malware' in text_l or 'ransom' in text_l:
-        return {'category': 'security', 'priority': 'Critical', 'confidence': 0.6}
-    return {'category': 'software', 'priority': 'Medium', 'confidence': 0.25}
-
-
-def classify_text(text: str) -> Dict:
+    """Keyword-based fallback used when the OpenAI call or parsing fails.
+
+    Rules come from ``heuristic_rules.json``; see :mod:`heuristic_rules`.
+    """
+    return _rule_engine().classify(text)
+
+
+# Deadline default for classify_text's ``deadline`` argument.
+_DEFAULT = object()
+
+
+def _deadline_seconds():
+    """``CLASSIFY_DEADLINE_SECONDS``: how long a classification may wait for
+    the model (0 waits as long as the client timeout allows)."""
+    return float(os.environ.get('CLASSIFY_DEADLINE_SECONDS', 5)) or None
+
+
+# Ticket.label_source for each path that can answer. 'fallback' is the
+# heuristic standing in for a model that was wanted but failed, was busy,
+# missed its deadline or had its circuit open: such labels are provisional.
+LABEL_SOURCES = {'openai': 'model', 'cache': 'model', 'local': 'local',
+                 'heuristic': 'heuristic', 'fallback': 'heuristic', 'empty': 'heuristic'}
+MODEL_PATHS = ('openai', 'cache', 'local')
+
+
+def classify_text(text: str, deadline=_DEFAULT, on_late=None) -> Dict:
     """Classify a ticket description into category/priority/confidence.
 
     Uses the OpenAI Chat Completions API (openai>=1.0) with JSON output, and
     falls back to simple keyword heuristics if the API key is missing or the
     call/parsing fails — so ticket submission never hard-fails on classification.
+    Model answers are cached by normalized, redacted text (see ``cache``),
+    and a confident answer from the local trained model (see
+    :mod:`local_model`) skips the OpenAI call altogether.
+
+    The model gets ``deadline`` seconds (default ``CLASSIFY_DEADLINE_SECONDS``,
+    ``None`` for no deadline). When they run out the heuristic answer is
+    returned at once; the call carries on, and if it succeeds its answer is
+    cached and handed to ``on_late(result, fallback)`` on a background
+    thread, ``fallback`` being the heuristic answer returned earlier. While
+    :data:`breaker` is open the model is not called at all.
     """
+    return classify(text, deadline, on_late)[0]
+
+
+def classify(text: str, deadline=_DEFAULT, on_late=None):
+    """:func:`classify_text`, returning ``(result, path)``: the path that
+    answered, one of ``local``, ``cache``, ``openai``, ``heuristic`` (no
+    model configured), ``fallback`` (the model failed, see
+    :data:`LABEL_SOURCES`) or ``empty``."""
+    start = time.perf_counter()
+    if deadline is _DEFAULT:
+        deadline = _deadline_seconds()
+    result, path = _classify(text, deadline, on_late)
+    metrics.CLASSIFY_SECONDS.observe(time.perf_counter() - start, path)
+    return result, path
+
+
+def _ask_model(client, model, safe_text):
+    """One completion call, validated into a classification."""
+    resp = client.chat.completions.create(
+        model=model,
+        messages=[
+            {'role': 'system', 'content': _build_system_message()},
+            {'role': 'user', 'content': _build_user_message(safe_text)},
+        ],
+        max_tokens=200,
+        temperature=0.0,
+        response_format={'type': 'json_object'},
+    )
+    content = resp.choices[0].message.content
+    data = json.loads(content)
+
+    category = str(data.get('category', '')).lower()
+    if category not in CATEGORIES:
+        category = 'other'
+    priority = data.get('priority', 'Medium')
+    if priority not in PRIORITY_LEVELS:
+        priority = 'Medium'
+    confidence = float(data.get('confidence', 0.0))
+    # Clamp to the documented 0..1 range.
+    confidence = max(0.0, min(1.0, confidence))
+    return {'category': category, 'priority': priority, 'confidence': confidence}
+
+
+def _late_answer(future, key, model, on_late, fallback):
+    """Done-callback of a call that missed its deadline."""
+    try:
+        result = future.result()
+    except Exception:
+        return
+    metrics.CLASSIFY_LATE.inc()
+    if key is not None:
+        cache.put(key, model, result)
+    if on_late is not None:
+        try:
+            on_late(result, fallback)
+        except Exception:
+            logger.exception('Applying a late classification failed')
+
+
+def _classify(text: str, deadline=None, on_late=None):
+    """``classify_text``'s work; returns ``(result, path that answered)``."""
     if not text:
-        return {'category': 'other', 'priority': 'Low', 'confidence': 0.0}
+        return {'category': 'other', 'priority': 'Low', 'confidence': 0.0}, 'empty'
+
+    # Local tier: a model trained on our own corrected tickets answers most
+    # tickets in-process; only low-confidence ones go on to the LLM.
+    model = local_model.loader.get()
+    if model is not None:
+        local = model.predict(text)
+        if local is not None and local['confidence'] >= float(os.environ.get('LOCAL_MODEL_MIN_CONFIDENCE', 0.8)):
+            return local, 'local'
 
     api_key = os.environ.get('OPENAI_API_KEY')
     if not api_key or OpenAI is None:
-        return _heuristic(text)
+        metrics.CLASSIFY_FALLBACKS.inc('unconfigured')
+        return _heuristic(text), 'heuristic'
 
     # Redact secrets/PII and cap length on the copy sent to the third-party LLM.
-    safe_text = _sanitize_for_model(text)
+    safe_text, redaction = redact_for_model(text)
+    _observe_redaction(redaction)
+    model = os.environ.get('OPENAI_MODEL', 'gpt-4o-mini')
+
+    use_cache = cache.max_entries > 0
+    key = None
+    if use_cache:
+        key = cache_key(safe_text, model)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, 'cache'
 
+    if not breaker.allow():
+        # The model has been failing or slow; don't spend the deadline on it.
+        metrics.CLASSIFY_FALLBACKS.inc('circuit_open')
+        return _heuristic(text), 'fallback'
+    started = time.monotonic()
+    # Without a deadline (bulk reclassification) a fallback answer is of no
+    # use, so wait for a slot instead.
+    slot = clients.slot(deadline, wait=deadline is None)
+    if slot is None:
+        # Too many calls already in flight in this process; don't queue
+        # behind them, classify locally instead.
+        breaker.cancel()
+        metrics.CLASSIFY_FALLBACKS.inc('busy')
+        return _heuristic(text), 'fallback'
     try:
-        client = OpenAI(api_key=api_key)
-        resp = client.chat.completions.create(
-            model=os.environ.get('OPENAI_MODEL', 'gpt-4o-mini'),
-            messages=[
-                {'role': 'system', 'content': _build_system_message()},
-                {'role': 'user', 'content': _build_user_message(safe_text)},
-            ],
-            max_tokens=200,
-            temperature=0.0,
-            response_format={'type': 'json_object'},
-        )
-        content = resp.choices[0].message.content
-        data = json.loads(content)
-
-        category = str(data.get('category', '')).lower()
-        if category not in CATEGORIES:
-            category = 'other'
-        priority = data.get('priority', 'Medium')
-        if priority not in PRIORITY_LEVELS:
-            priority = 'Medium'
-        confidence = float(data.get('confidence', 0.0))
-        # Clamp to the documented 0..1 range.
-        confidence = max(0.0, min(1.0, confidence))
-        return {'category': category, 'priority': priority, 'confidence': confidence}
+        future = clients.submit(_ask_model, clients.get(api_key), model, safe_text)
+    except Exception:
+        slot.release()
+        breaker.record(False)
+        metrics.CLASSIFY_FALLBACKS.inc('error')
+        return _heuristic(text), 'fallback'
+    future.add_done_callback(lambda _: slot.release())
+    remaining = None if deadline is None else max(0.0, deadline - (time.monotonic() - started))
+    try:
+        result = future.result(timeout=remaining)
+    except FutureTimeout:
+        # Answer now; a late answer still lands in the cache and ``on_late``.
+        breaker.record(False)
+        metrics.CLASSIFY_FALLBACKS.inc('deadline')
+        fallback = _heuristic(text)
+        future.add_done_callback(lambda f: _late_answer(f, key, model, on_late, dict(fallback)))
+        return fallback, 'fallback'
     except Exception:
-        return _heuristic(text)
+        breaker.record(False)
+        metrics.CLASSIFY_FALLBACKS.inc('error')
+        return _heuristic(text), 'fallback'
+    slow = float(os.environ.get('CLASSIFY_SLOW_SECONDS', 0)) or deadline
+    breaker.record(slow is None or time.monotonic() - started < slow)
+    # Only model answers are cached; heuristic fallbacks are cheap and would
+    # otherwise pin an outage's guesses in the cache.
+    if use_cache:
+        cache.put(key, model, result)
+    return result, 'openai'
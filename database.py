@@ -0,0 +1,100 @@
+"""Engine configuration: SQLite production settings and read/write routing.
+
+With several gunicorn workers sharing one SQLite file, the default rollback
+journal lets a long read (a list page, the CSV export) hold a lock that
+makes concurrent writers fail with "database is locked". On connect every
+SQLite connection therefore gets:
+
+* ``journal_mode=WAL``: readers and the single writer no longer block each
+  other; readers see the last committed state;
+* ``synchronous=NORMAL``: fsync at checkpoints instead of every commit
+  (safe with WAL; a power cut can lose the last commits, not corrupt);
+* ``busy_timeout``: a writer waits for the write lock instead of failing;
+* ``mmap_size`` and ``cache_size``: fewer read syscalls and page-cache
+  misses on hot indexes.
+
+Views that only read are marked with :func:`read_only` and run on a
+separate connection pool (the ``read`` bind): the same SQLite file opened
+with ``query_only``, or ``DATABASE_READ_URL`` (e.g. a replica) when set.
+Reads never queue behind write connections, and a read-only view that tries
+to write fails loudly instead of silently taking the write lock.
+"""
+import os
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+READ_BIND = 'read'
+
+# Applied to every SQLite connection, in this order.
+PRAGMAS = {
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Negative values are KiB rather than pages.
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+}
+
+
+def is_sqlite_file(url):
+    """True for a SQLite URL backed by a file (not ``:memory:``)."""
+    url = make_url(url)
+    return (url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+            and url.query.get('mode') != 'memory')
+
+
+def configure(app):
+    """Add the read bind to ``app.config``. Call before ``db.init_app``."""
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    read_url = os.environ.get('DATABASE_READ_URL') or (uri if is_sqlite_file(uri) else None)
+    if read_url:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[READ_BIND] = read_url
+
+
+def _pragma_listener(wal, query_only):
+    def set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            if wal:
+                cursor.execute('PRAGMA journal_mode=WAL')
+            for name, value in PRAGMAS.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+            if query_only:
+                cursor.execute('PRAGMA query_only=ON')
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def install(engines):
+    """Attach the connect-time pragmas to ``db.engines``. Call after
+    ``db.init_app``, before the first connection."""
+    for key, engine in engines.items():
+        if engine.dialect.name != 'sqlite' or not is_sqlite_file(engine.url):
+            continue
+        read = key == READ_BIND
+        event.listen(engine, 'connect', _pragma_listener(wal=not read, query_only=read))
+
+
+def read_only(view):
+    """Run ``view``'s queries on the read bind (when one is configured)."""
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return decorated
+
+
+class RoutingSession(Session):
+    """Session that sends everything to the read bind inside
+    :func:`read_only` views and to the models' own bind otherwise."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('db_read_only'):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
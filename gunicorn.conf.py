@@ -0,0 +1,13 @@
+"""Gunicorn settings, read from the working directory by ``gunicorn``.
+
+Background classification threads are started here, once per serving
+worker process, rather than in ``create_app``: every ``flask`` CLI command
+builds an app too, and maintenance commands (``db-upgrade``,
+``reclassify``, ``archive``...) must not start claiming jobs.
+"""
+
+
+def post_worker_init(worker):
+    import jobs
+    app = worker.wsgi
+    jobs.start_workers(app, app.config['CLASSIFY_WORKERS'])
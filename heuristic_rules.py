@@ -0,0 +1,135 @@
+"""Data-driven keyword rules for the offline classification fallback.
+
+Rules live in a JSON file (``heuristic_rules.json`` by default, override with
+``HEURISTIC_RULES_PATH``)::
+
+    {
+      "default": {"category": "software", "priority": "Medium", "confidence": 0.25},
+      "categories": {
+        "<category>": {"priority": "High", "confidence": 0.5,
+                       "keywords": {"<phrase>": <weight>, ...}},
+        ...
+      },
+      "priority_keywords": {"<priority>": ["<phrase>", ...]}
+    }
+
+All phrases are compiled into one regex shaped like a prefix trie, so a
+single scan over the lowercased text scores every category at once and the
+work per position depends on phrase length, not on how many rules exist
+(a flat ``a|b|c`` alternation would try every phrase at every position). Phrases match as substrings (``phish``
+matches "phishing"), like the original ``in`` checks: the scan is
+overlapping (the regex is a lookahead, so it tries every position) and a
+phrase found at a position also counts the shorter phrases it starts with,
+so "internetwork" scores both "internet" and "network". Each distinct phrase
+counts once; the highest-scoring category wins and ties go to the category
+listed first. Priority is the category's priority, raised by any matching
+``priority_keywords``.
+"""
+import json
+import os
+import re
+from typing import Dict, Iterable
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'heuristic_rules.json')
+
+# Extra confidence per additional distinct phrase hit, and the ceiling, so
+# keyword guesses never look as sure as a model answer.
+CONFIDENCE_STEP = 0.05
+MAX_CONFIDENCE = 0.75
+
+
+def _trie_regex(phrases) -> str:
+    """Regex source matching any of ``phrases``, factored by common prefix.
+
+    At every node the longer continuation is tried first, so the longest
+    phrase starting at a position wins, as with a longest-first alternation.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def emit(node):
+        end = '' in node
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if end else body
+
+    return emit(trie)
+
+
+class RuleEngine:
+    """Compiled keyword rules; build with :func:`load_rules`."""
+
+    def __init__(self, config: Dict, categories: Iterable[str] = None, priorities: Iterable[str] = None):
+        priorities = list(priorities) if priorities is not None else None
+        self.default = dict(config['default'])
+        self._order = {}
+        self._category_meta = {}
+        # phrase -> list of (category, weight) or ('!priority', level)
+        self._phrases = {}
+        for rank, (category, rule) in enumerate(config.get('categories', {}).items()):
+            if categories is not None and category not in categories:
+                raise ValueError(f'Unknown category in heuristic rules: {category!r}')
+            self._check_priority(rule['priority'], priorities)
+            self._order[category] = rank
+            self._category_meta[category] = (rule['priority'], float(rule['confidence']))
+            for phrase, weight in rule.get('keywords', {}).items():
+                self._phrases.setdefault(phrase.lower(), []).append((category, float(weight)))
+        self._priority_rank = {p: i for i, p in enumerate(priorities or [])}
+        for level, phrases in config.get('priority_keywords', {}).items():
+            self._check_priority(level, priorities)
+            for phrase in phrases:
+                self._phrases.setdefault(phrase.lower(), []).append((None, level))
+        # Longest phrase at a position -> every phrase it starts with.
+        self._prefixes = {phrase: [phrase[:n] for n in range(1, len(phrase) + 1) if phrase[:n] in self._phrases]
+                          for phrase in self._phrases}
+        if self._phrases:
+            self._pattern = re.compile('(?=(' + _trie_regex(self._phrases) + '))')
+        else:
+            self._pattern = None
+
+    @staticmethod
+    def _check_priority(level, priorities):
+        if priorities is not None and level not in priorities:
+            raise ValueError(f'Unknown priority in heuristic rules: {level!r}')
+
+    def classify(self, text: str) -> Dict:
+        if self._pattern is None:
+            return dict(self.default)
+        hits = {phrase for longest in set(self._pattern.findall(text.lower()))
+                for phrase in self._prefixes[longest]}
+        if not hits:
+            return dict(self.default)
+        scores = {}
+        counts = {}
+        bump = None
+        for phrase in hits:
+            for category, value in self._phrases[phrase]:
+                if category is None:
+                    if bump is None or self._priority_rank.get(value, 0) > self._priority_rank.get(bump, 0):
+                        bump = value
+                    continue
+                scores[category] = scores.get(category, 0.0) + value
+                counts[category] = counts.get(category, 0) + 1
+        if not scores:
+            result = dict(self.default)
+        else:
+            best = max(scores, key=lambda c: (scores[c], -self._order[c]))
+            priority, confidence = self._category_meta[best]
+            confidence = min(MAX_CONFIDENCE, confidence + CONFIDENCE_STEP * (counts[best] - 1))
+            result = {'category': best, 'priority': priority, 'confidence': confidence}
+        if bump is not None and self._priority_rank.get(bump, 0) > self._priority_rank.get(result['priority'], 0):
+            result['priority'] = bump
+        return result
+
+
+def load_rules(path: str = None, categories=None, priorities=None) -> RuleEngine:
+    """Load and compile the rules file at ``path`` (default: bundled rules)."""
+    path = path or os.environ.get('HEURISTIC_RULES_PATH') or DEFAULT_RULES_PATH
+    with open(path, encoding='utf-8') as fh:
+        return RuleEngine(json.load(fh), categories, priorities)
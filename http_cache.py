@@ -0,0 +1,104 @@
+"""Conditional GETs (ETag / Last-Modified) for the public ticket pages.
+
+Kiosk screens reload the ticket list and detail pages all day, and most of
+those reloads see exactly what they saw last time. Every change to tickets,
+corrections or fixed issues bumps a single-row counter in ``data_version``
+(SQLite triggers, so ORM and Core write paths are all covered, as with the
+search index). :func:`conditional` reads that row and answers
+``304 Not Modified`` when the client's validator still matches, before the
+view runs any ORM query or renders a template.
+
+Responses are only shared-cacheable for anonymous visitors:
+
+* logged-in admins see corrections and staff-only notes, so their pages are
+  sent ``private, no-store`` and never validated;
+* a pending flash message must be rendered (and consumed), so that request
+  always runs the view.
+
+ETags also cover the templates and static assets, so a deploy invalidates
+them.
+Databases without the triggers (non-SQLite) simply skip validation.
+"""
+import hashlib
+import os
+from functools import wraps
+
+from flask import Response, make_response, request, session
+from sqlalchemy import DateTime, Integer, column, select, table, text
+from werkzeug.http import is_resource_modified
+
+from models import db
+
+_TRACKED = ('tickets', 'ticket_corrections', 'fixed_issues')
+_VERSION = table('data_version', column('id', Integer), column('version', Integer),
+                 column('changed_at', DateTime))
+
+
+def install(conn):
+    """Create the change counter and its triggers. No-op off SQLite."""
+    if conn.dialect.name != 'sqlite':
+        return False
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS data_version (id INTEGER PRIMARY KEY CHECK (id = 1), '
+        'version INTEGER NOT NULL, changed_at DATETIME NOT NULL)'))
+    conn.execute(text("INSERT OR IGNORE INTO data_version VALUES (1, 0, datetime('now'))"))
+    bump = "UPDATE data_version SET version = version + 1, changed_at = datetime('now') WHERE id = 1;"
+    for name in _TRACKED:
+        for op in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(text(f'CREATE TRIGGER IF NOT EXISTS {name}_version_{op.lower()} '
+                              f'AFTER {op} ON {name} BEGIN {bump} END'))
+    return True
+
+
+def current_version():
+    """``(version, changed_at)`` of the tracked tables, or None if the
+    database has no change counter."""
+    if db.session.get_bind().dialect.name != 'sqlite':
+        return None
+    row = db.session.execute(select(_VERSION.c.version, _VERSION.c.changed_at)
+                             .where(_VERSION.c.id == 1)).first()
+    return None if row is None else tuple(row)
+
+
+def templates_digest(app):
+    """Digest of the app's template sources, identical across workers."""
+    digest = hashlib.sha1()
+    for root, _dirs, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+        for name in sorted(files):
+            with open(os.path.join(root, name), 'rb') as fh:
+                digest.update(name.encode() + b'\0' + fh.read())
+    return digest.hexdigest()[:12]
+
+
+def conditional(app):
+    """Decorator factory: ETag/Last-Modified validation for a public view."""
+    code_version = templates_digest(app)
+    manifest = app.extensions.get('assets')
+
+    def decorator(view):
+        @wraps(view)
+        def decorated(*args, **kwargs):
+            if session.get('admin_logged_in'):
+                resp = make_response(view(*args, **kwargs))
+                resp.headers['Cache-Control'] = 'private, no-store'
+                return resp
+            state = None if '_flashes' in session else current_version()
+            if state is None:
+                return view(*args, **kwargs)
+            version, changed_at = state
+            static = manifest.digest if manifest is not None else ''
+            etag = hashlib.sha1(f'{code_version}:{static}:{version}:{request.full_path}'.encode()).hexdigest()[:20]
+            if not is_resource_modified(request.environ, etag=etag, last_modified=changed_at):
+                resp = Response(status=304)
+            else:
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag)
+            resp.last_modified = changed_at
+            # Revalidate on every use; Vary keeps admins' pages apart.
+            resp.headers['Cache-Control'] = 'public, no-cache'
+            resp.vary.add('Cookie')
+            return resp
+        return decorated
+    return decorator
@@ -0,0 +1,136 @@
+"""Creating tickets: shared by the web form and the JSON API.
+
+Every new ticket gets the same treatment wherever it comes from: the form's
+length limits, a SimHash fingerprint, grouping under an ongoing incident
+(see :mod:`dedup`) and a classification job when it still needs one.
+
+Bulk ingestion (:func:`create_batch`) also groups near-duplicates *within*
+the batch, so an alert storm of a thousand identical lines becomes one
+root ticket plus grouped duplicates. Duplicates of a root that is still
+being classified get no job of their own: the root's job hands its labels
+down to them (``jobs.process``), so a group costs one classification. A
+root that is unclassified but has no queued or running job (it failed) has
+nothing to hand down, so its new duplicates are queued themselves.
+"""
+from sqlalchemy import select
+
+from models import db, Ticket, ClassificationJob, utcnow
+import dedup
+import jobs
+
+MAX_TITLE_CHARS = 255
+MAX_DESCRIPTION_CHARS = 5000
+
+
+class InvalidTicket(ValueError):
+    """Submitted fields break the ticket limits; the message is user-facing."""
+
+
+def clean(title, description):
+    """Return normalised ``(title, description)`` or raise :class:`InvalidTicket`."""
+    title = (title or '').strip()[:MAX_TITLE_CHARS]
+    description = (description or '').strip()
+    if not description:
+        raise InvalidTicket('Please provide a description of the issue')
+    if len(description) > MAX_DESCRIPTION_CHARS:
+        raise InvalidTicket(f'Description must be between 1 and {MAX_DESCRIPTION_CHARS} characters')
+    return title or (description[:60] + '...'), description
+
+
+def _new_ticket(title, description, fingerprint, incident, known_fix):
+    now = utcnow()
+    ticket = Ticket(title=title, description=description, status='Open', created_at=now,
+                    updated_at=now, simhash=dedup.to_db(fingerprint))
+    source = incident if incident is not None else known_fix
+    if incident is not None:
+        ticket.duplicate_of = incident.id
+    if source is not None and source.category is not None:
+        ticket.category = source.category
+        ticket.priority = source.priority
+        ticket.confidence = source.confidence
+        ticket.label_source = incident.label_source if source is incident else 'fixed'
+    return ticket
+
+
+def _awaited(incidents):
+    """Ids of the unclassified ``incidents`` whose job is still queued or running."""
+    ids = {i.id for i in incidents if i is not None and i.pending_classification}
+    if not ids:
+        return set()
+    return set(db.session.execute(
+        select(ClassificationJob.ticket_id)
+        .where(ClassificationJob.ticket_id.in_(ids),
+               ClassificationJob.status.in_(('queued', 'running')))
+    ).scalars())
+
+
+def create_ticket(title, description):
+    """Add one cleaned ticket to the session (flushed, not committed).
+
+    Returns ``(ticket, incident, known_fix)``: the open incident it was
+    grouped under and the closest fixed issue, either of which may be None.
+    Commit with :func:`commit`.
+    """
+    fingerprint = dedup.simhash(description)
+    incident = dedup.index.find_incident(fingerprint)
+    known_fix = dedup.index.find_fix(fingerprint)
+    ticket = _new_ticket(title, description, fingerprint, incident, known_fix)
+    db.session.add(ticket)
+    db.session.flush()
+    if ticket.pending_classification and (incident is None or incident.id not in _awaited([incident])):
+        jobs.enqueue(ticket)
+    return ticket, incident, known_fix
+
+
+def create_batch(rows):
+    """Add cleaned ``(title, description)`` pairs as tickets (flushed, not
+    committed). Returns the tickets in input order."""
+    # Incidents already seen in this batch, by fingerprint. Checked before
+    # the shared index so a storm of duplicates costs no database lookups.
+    batch_index = dedup.SimHashIndex()
+    incidents = []
+    new_roots = set()   # incidents first reported in this batch
+    tickets, grouped = [], []
+    waiting = {}        # ticket -> incident whose job should classify it
+    for title, description in rows:
+        fingerprint = dedup.simhash(description)
+        near = batch_index.near(fingerprint) if fingerprint is not None else None
+        incident = incidents[near[0][1]] if near else dedup.index.find_incident(fingerprint)
+        known_fix = dedup.index.find_fix(fingerprint) if incident is None else None
+        ticket = _new_ticket(title, description, fingerprint, incident, known_fix)
+        if incident in new_roots:
+            grouped.append((ticket, incident))
+        if incident is not None and incident.pending_classification:
+            waiting[ticket] = incident
+        if fingerprint is not None and not near:
+            batch_index.add(len(incidents), fingerprint)
+            incidents.append(incident if incident is not None else ticket)
+            if incident is None:
+                new_roots.add(ticket)
+        tickets.append(ticket)
+
+    # Tickets grouped under an incident from this batch go in once it has
+    # an id to point at.
+    later = [ticket for ticket, _ in grouped]
+    skip = set(later)
+    db.session.add_all(t for t in tickets if t not in skip)
+    db.session.flush()
+    for ticket, incident in grouped:
+        ticket.duplicate_of = incident.id
+    db.session.add_all(later)
+    db.session.flush()
+    # Roots from this batch are queued below; earlier ones must still have a job.
+    awaited = _awaited(set(waiting.values()) - new_roots) | {t.id for t in new_roots}
+    now = utcnow()
+    db.session.add_all([ClassificationJob(ticket_id=t.id, status='queued', run_after=now)
+                        for t in tickets if t.pending_classification
+                        and (t not in waiting or waiting[t].id not in awaited)])
+    return tickets
+
+
+def commit(tickets):
+    """Commit the session, then index the new tickets and wake the workers."""
+    entries = [(t.id, t.simhash) for t in tickets]
+    db.session.commit()
+    dedup.index.add_tickets(entries)
+    jobs.notify()
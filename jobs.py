@@ -0,0 +1,335 @@
+"""Durable background classification queue.
+
+``submit_ticket`` only inserts the ticket plus a ``ClassificationJob`` row and
+returns; the (potentially slow) model round-trip happens here, outside the
+request. The queue lives in the application database so it survives restarts
+and is shared by every gunicorn worker:
+
+* Jobs are claimed with a conditional ``UPDATE`` so two workers can never
+  run the same job.
+* A claim is a lease (``CLASSIFY_LEASE_SECONDS``). If a worker crashes
+  mid-job, the lease expires and the job is picked up again.
+* Failures are retried with exponential backoff up to
+  ``CLASSIFY_MAX_ATTEMPTS`` times before the job is marked ``failed``.
+  So is a model outage: when the classifier falls back to the heuristic
+  (model error, busy, deadline, circuit open) its labels are saved as
+  provisional (``label_source = 'heuristic'``) and the job is retried, no
+  sooner than the circuit breaker's cooldown allows; a later model answer
+  replaces them.
+
+Workers run either as daemon threads inside each serving process
+(``CLASSIFY_WORKERS``, default 2; started by ``gunicorn.conf.py`` and by
+``python app.py``, never by CLI commands) or as a separate process via
+``flask classify-worker``.
+"""
+import os
+import socket
+import threading
+import logging
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, or_, select, update
+
+from models import db, Ticket, ClassificationJob, utcnow
+from classifier import LABEL_SOURCES, classify
+import classifier
+import metrics
+import stats
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = int(os.environ.get('CLASSIFY_MAX_ATTEMPTS', 5))
+LEASE_SECONDS = int(os.environ.get('CLASSIFY_LEASE_SECONDS', 120))
+RETRY_BASE_SECONDS = float(os.environ.get('CLASSIFY_RETRY_BASE_SECONDS', 5))
+POLL_SECONDS = float(os.environ.get('CLASSIFY_POLL_SECONDS', 1))
+
+# Set after a local enqueue so idle in-process workers pick the job up
+# immediately instead of waiting for the next poll.
+_wakeup = threading.Event()
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def enqueue(ticket):
+    """Queue ``ticket`` for classification in the caller's transaction."""
+    job = ClassificationJob(ticket_id=ticket.id, status='queued', run_after=utcnow())
+    db.session.add(job)
+    return job
+
+
+def notify():
+    """Wake in-process workers; call after the enqueueing transaction commits."""
+    _wakeup.set()
+
+
+def _claimable(now):
+    return or_(
+        and_(ClassificationJob.status == 'queued', ClassificationJob.run_after <= now),
+        # Lease expired: the worker that held it died or hung.
+        and_(ClassificationJob.status == 'running', ClassificationJob.locked_until < now),
+    )
+
+
+def claim_next(worker_id=None):
+    """Atomically lease the oldest runnable job, or return None."""
+    worker_id = worker_id or _worker_id()
+    while True:
+        now = utcnow()
+        job_id = db.session.execute(
+            select(ClassificationJob.id).where(_claimable(now))
+            .order_by(ClassificationJob.id).limit(1)
+        ).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+        # Re-check the claim condition in the UPDATE itself so a concurrent
+        # worker that grabbed the same row makes this one a no-op.
+        result = db.session.execute(
+            update(ClassificationJob)
+            .where(ClassificationJob.id == job_id, _claimable(now))
+            .values(status='running', locked_by=worker_id,
+                    locked_until=now + timedelta(seconds=LEASE_SECONDS),
+                    attempts=ClassificationJob.attempts + 1, updated_at=now)
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return db.session.get(ClassificationJob, job_id)
+        # Lost the race; try the next candidate.
+
+
+def process(job):
+    """Classify the job's ticket and record the outcome."""
+    try:
+        ticket = db.session.get(Ticket, job.ticket_id)
+        path = None
+        if ticket is not None and (ticket.pending_classification or ticket.label_source == 'heuristic'):
+            # A ticket grouped under an incident that has been classified
+            # since takes the incident's labels instead of a model call.
+            root = db.session.get(Ticket, ticket.duplicate_of) if ticket.duplicate_of else None
+            if root is not None and not root.pending_classification:
+                result = {'category': root.category, 'priority': root.priority, 'confidence': root.confidence}
+                source = root.label_source
+            else:
+                # Past the deadline this is the heuristic's answer; the
+                # model's, if it still comes, replaces it (see _late_answer).
+                result, path = classify(ticket.description,
+                                        on_late=_late_answer(current_app._get_current_object(), ticket.id))
+                source = LABEL_SOURCES[path]
+            old_key = stats.key(ticket.created_at, ticket.category, ticket.priority, ticket.status)
+            category = result.get('category', 'other')
+            priority = result.get('priority', 'Medium')
+            # Only fill in a classification nobody has set in the meantime
+            # (an admin may have corrected the ticket while it was queued).
+            updated = db.session.execute(
+                update(Ticket)
+                .where(Ticket.id == ticket.id, _provisional())
+                .values(category=category, priority=priority,
+                        confidence=result.get('confidence', 0.0),
+                        label_source=source, updated_at=utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            if updated.rowcount:
+                # Core UPDATE bypasses the ORM flush hook; record it explicitly.
+                stats.record(db.session, [(old_key, stats.key(ticket.created_at, category, priority, ticket.status))])
+                _hand_down(ticket.id, category, priority, result.get('confidence', 0.0), source)
+        if path == 'fallback':
+            # The model was wanted but did not answer: keep the heuristic
+            # labels as provisional and try the model again once the circuit
+            # breaker would let a call through.
+            db.session.commit()
+            _record_failure(job.id, 'model unavailable; heuristic labels are provisional',
+                            not_before=classifier.breaker.retry_after())
+            return False
+        job.status = 'done'
+        job.locked_until = None
+        job.last_error = None
+        db.session.commit()
+        metrics.CLASSIFY_JOBS.inc('done')
+        return True
+    except Exception as exc:
+        db.session.rollback()
+        logger.warning('Classification job %s failed (attempt %s): %s', job.id, job.attempts, exc)
+        _record_failure(job.id, exc)
+        return False
+
+
+def _late_answer(app, ticket_id):
+    """``on_late`` callback for ``ticket_id``'s classification.
+
+    Replaces the provisional (heuristic) labels on the ticket and on
+    duplicates that took them, but only where they are still unchanged:
+    nobody corrected them in the meantime. Rows not labelled yet (the late
+    answer beat the job's own commit) are labelled too.
+    """
+    def apply(result, provisional):
+        with app.app_context():
+            try:
+                _relabel(ticket_id, result, provisional)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception('Late classification of ticket %s failed', ticket_id)
+    return apply
+
+
+def _provisional():
+    """Tickets whose labels a classification may still fill in or replace:
+    none yet, or the heuristic's."""
+    return or_(Ticket.category.is_(None), Ticket.label_source == 'heuristic')
+
+
+def _relabel(ticket_id, result, provisional):
+    category = result.get('category', 'other')
+    priority = result.get('priority', 'Medium')
+    confidence = result.get('confidence', 0.0)
+    unchanged = or_(Ticket.category.is_(None), and_(
+        Ticket.label_source.is_distinct_from('admin'),
+        Ticket.category == provisional['category'], Ticket.priority == provisional['priority'],
+        Ticket.confidence == provisional['confidence']))
+    rows = {row.id: row for row in db.session.execute(
+        select(Ticket.id, Ticket.created_at, Ticket.category, Ticket.priority, Ticket.status)
+        .where(or_(Ticket.id == ticket_id, Ticket.duplicate_of == ticket_id), unchanged)
+    ).all()}
+    if not rows:
+        return
+    done = db.session.execute(
+        update(Ticket)
+        .where(Ticket.id.in_(rows), unchanged)
+        .values(category=category, priority=priority, confidence=confidence,
+                label_source='model', updated_at=utcnow())
+        .returning(Ticket.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    stats.record(db.session, [
+        (stats.key(row.created_at, row.category, row.priority, row.status),
+         stats.key(row.created_at, category, priority, row.status))
+        for row in (rows[i] for i in done)
+    ])
+
+
+def _waiting_duplicates(ticket_id):
+    return db.session.execute(
+        select(Ticket.id, Ticket.created_at, Ticket.category, Ticket.priority, Ticket.status)
+        .where(Ticket.duplicate_of == ticket_id, _provisional())
+    ).all()
+
+
+def _hand_down(ticket_id, category, priority, confidence, source):
+    """Give ``ticket_id``'s new labels to its duplicates that are still
+    unclassified or only provisionally labelled.
+
+    Bulk-ingested duplicates of a pending incident get no job of their own
+    (see :mod:`intake`); they wait for this one.
+    """
+    waiting = {row.id: row for row in _waiting_duplicates(ticket_id)}
+    if not waiting:
+        return
+    done = db.session.execute(
+        update(Ticket)
+        .where(Ticket.id.in_(waiting), _provisional())
+        .values(category=category, priority=priority, confidence=confidence,
+                label_source=source, updated_at=utcnow())
+        .returning(Ticket.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    stats.record(db.session, [
+        (stats.key(row.created_at, row.category, row.priority, row.status),
+         stats.key(row.created_at, category, priority, row.status))
+        for row in (waiting[i] for i in done)
+    ])
+
+
+def _record_failure(job_id, exc, not_before=0.0):
+    """Requeue the job with backoff (at least ``not_before`` seconds), or
+    mark it failed after ``MAX_ATTEMPTS``."""
+    job = db.session.get(ClassificationJob, job_id)
+    if job is None:
+        return
+    job.last_error = str(exc)[:2000]
+    job.locked_until = None
+    if job.attempts >= MAX_ATTEMPTS:
+        job.status = 'failed'
+        # Duplicates waiting on this job would otherwise never be classified.
+        now = utcnow()
+        db.session.add_all([ClassificationJob(ticket_id=row.id, status='queued', run_after=now)
+                            for row in _waiting_duplicates(job.ticket_id) if row.category is None])
+        metrics.CLASSIFY_JOBS.inc('failed')
+    else:
+        metrics.CLASSIFY_JOBS.inc('retry')
+        job.status = 'queued'
+        delay = max(RETRY_BASE_SECONDS * (2 ** (job.attempts - 1)), not_before)
+        job.run_after = utcnow() + timedelta(seconds=delay)
+    db.session.commit()
+
+
+def run_pending(limit=None):
+    """Drain runnable jobs in the current app context. Returns jobs processed."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next()
+        if job is None:
+            break
+        process(job)
+        processed += 1
+    return processed
+
+
+def pending_count():
+    """Number of jobs waiting to run (queued or leased)."""
+    return db.session.execute(
+        select(db.func.count(ClassificationJob.id))
+        .where(ClassificationJob.status.in_(('queued', 'running')))
+    ).scalar()
+
+
+def queue_depth():
+    """Jobs per unfinished status, for the metrics gauge."""
+    counts = dict.fromkeys(('queued', 'running', 'failed'), 0)
+    counts.update(db.session.execute(
+        select(ClassificationJob.status, db.func.count(ClassificationJob.id))
+        .where(ClassificationJob.status.in_(tuple(counts)))
+        .group_by(ClassificationJob.status)
+    ).all())
+    return counts
+
+
+def _worker_loop(app, stop):
+    while not stop.is_set():
+        try:
+            with app.app_context():
+                processed = run_pending(limit=50)
+        except Exception:
+            logger.exception('Classification worker error')
+            processed = 0
+        # A standalone worker serves no requests; publish its metrics here.
+        metrics.registry.maybe_flush()
+        if not processed:
+            _wakeup.wait(POLL_SECONDS)
+            _wakeup.clear()
+
+
+def start_workers(app, count):
+    """Start ``count`` daemon worker threads for this process."""
+    stop = threading.Event()
+    for i in range(count):
+        t = threading.Thread(target=_worker_loop, args=(app, stop),
+                             name=f'classify-worker-{i}', daemon=True)
+        t.start()
+    return stop
+
+
+@click.command('classify-worker')
+@click.option('--once', is_flag=True, help='Drain the queue and exit instead of polling forever.')
+@with_appcontext
+def worker_command(once):
+    """Run a standalone classification worker."""
+    if once:
+        click.echo(f'Processed {run_pending()} job(s).')
+        return
+    click.echo('Classification worker started; press Ctrl+C to stop.')
+    _worker_loop(current_app._get_current_object(), threading.Event())
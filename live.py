@@ -0,0 +1,243 @@
+"""Live admin dashboard updates over Server-Sent Events.
+
+Admins used to reload ``/admin`` (keyset page, stats and a full render) to
+see new tickets. Instead the dashboard subscribes to ``/admin/events`` and
+patches its queue in place from small JSON deltas:
+
+* ``new``: a ticket was submitted (form, API or bulk ingestion);
+* ``reclassified``: its category or priority changed (the background
+  classifier, a late model answer, an admin correction or a bulk update);
+* ``fixed``: it was marked fixed.
+
+The change feed is the ``ticket_events`` table, filled by SQLite triggers on
+``tickets`` so every write path is covered (as with the search index and
+the HTTP change counter), and capped at the newest ``KEEP_EVENTS`` rows by a
+trigger of its own. Each process runs one :class:`Feed`: while any stream is
+open, a single thread polls for rows past the last id it saw, joins the
+ticket columns the dashboard shows, formats each event once and wakes every
+connected client, so the database cost does not grow with the number of
+open dashboards.
+
+A held stream occupies a thread, so one is only held under a threaded
+server (gunicorn ``gthread``, the development server), at most
+``LIVE_MAX_STREAMS`` per process and for ``LIVE_STREAM_SECONDS`` before the
+browser reconnects. Otherwise (sync workers, or all slots taken) the request
+returns the pending events at once and the ``retry`` hint makes the browser
+come back after ``LIVE_RETRY_SECONDS``: cheap polling, never a worker parked
+per client. ``Last-Event-ID`` makes reconnects resume where they stopped; a
+client that fell further behind than the buffer is told to reload.
+Databases without the triggers (non-SQLite) answer 204, which stops the
+browser from retrying.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import Response
+from sqlalchemy import Integer, String, column, func, select, table, text
+
+from models import Ticket, db
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = float(os.environ.get('LIVE_POLL_SECONDS', 1))
+STREAM_SECONDS = float(os.environ.get('LIVE_STREAM_SECONDS', 30))
+MAX_STREAMS = int(os.environ.get('LIVE_MAX_STREAMS', 4))
+RETRY_SECONDS = float(os.environ.get('LIVE_RETRY_SECONDS', 5))
+# Events kept per process for reconnecting clients.
+BACKLOG = int(os.environ.get('LIVE_BACKLOG', 1000))
+HEARTBEAT_SECONDS = 15
+KEEP_EVENTS = 10_000
+
+_EVENTS = table('ticket_events', column('id', Integer), column('ticket_id', Integer), column('kind', String))
+_TRIGGERS = {
+    'tickets_event_insert': "AFTER INSERT ON tickets BEGIN "
+                            "INSERT INTO ticket_events (ticket_id, kind) VALUES (NEW.id, 'new'); END",
+    'tickets_event_reclassify': "AFTER UPDATE OF category, priority ON tickets "
+                                "WHEN NEW.category IS NOT OLD.category OR NEW.priority IS NOT OLD.priority BEGIN "
+                                "INSERT INTO ticket_events (ticket_id, kind) VALUES (NEW.id, 'reclassified'); END",
+    'tickets_event_fixed': "AFTER UPDATE OF status ON tickets "
+                           "WHEN NEW.status = 'Fixed' AND OLD.status IS NOT 'Fixed' BEGIN "
+                           "INSERT INTO ticket_events (ticket_id, kind) VALUES (NEW.id, 'fixed'); END",
+    'ticket_events_prune': f'AFTER INSERT ON ticket_events BEGIN '
+                           f'DELETE FROM ticket_events WHERE id <= NEW.id - {KEEP_EVENTS}; END',
+}
+
+
+def install(conn):
+    """Create the event table and its triggers. No-op off SQLite."""
+    if conn.dialect.name != 'sqlite':
+        return False
+    # AUTOINCREMENT: ids are never reused after pruning, so Last-Event-ID
+    # stays meaningful.
+    conn.execute(text('CREATE TABLE IF NOT EXISTS ticket_events (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                      'ticket_id INTEGER NOT NULL, kind VARCHAR(20) NOT NULL)'))
+    for name, body in _TRIGGERS.items():
+        conn.execute(text(f'CREATE TRIGGER IF NOT EXISTS {name} {body}'))
+    return True
+
+
+def latest_id():
+    """Id of the newest event, for the dashboard to resume from; None if
+    the database has no change feed."""
+    if db.session.get_bind().dialect.name != 'sqlite':
+        return None
+    return db.session.execute(select(func.coalesce(func.max(_EVENTS.c.id), 0))).scalar()
+
+
+def _frame(event_id, kind, ticket_id, row):
+    """One SSE message: the event plus the ticket fields the queue shows."""
+    data = {'kind': kind, 'id': ticket_id}
+    if row is not None:
+        title, description, category, priority, status, duplicate_of, created_at = row
+        data.update(title=title,
+                    description=description[:150] + ('…' if len(description) > 150 else ''),
+                    category=category, priority=priority, status=status, duplicate_of=duplicate_of,
+                    created_at=created_at.strftime('%Y-%m-%d %H:%M'))
+    return f'id: {event_id}\ndata: {json.dumps(data)}\n\n'
+
+
+class Feed:
+    """Per-process view of ``ticket_events`` shared by all open streams."""
+
+    def __init__(self, engine, backlog=None):
+        self.engine = engine
+        self.supported = engine.dialect.name == 'sqlite'
+        self.backlog = BACKLOG if backlog is None else backlog
+        self.streams = 0
+        self._cond = threading.Condition()
+        self._events = []  # (event id, frame), oldest first
+        self._last_id = None  # newest id polled; None before the first poll
+        self._horizon = 0  # every event after this id is in _events
+        self._polled_at = float('-inf')
+        self._thread = None
+        self._pid = None
+
+    def _query(self, after):
+        t = Ticket.__table__
+        stmt = (select(_EVENTS.c.id, _EVENTS.c.kind, _EVENTS.c.ticket_id, t.c.id, t.c.title,
+                       func.substr(t.c.description, 1, 151), t.c.category, t.c.priority, t.c.status,
+                       t.c.duplicate_of, t.c.created_at)
+                .select_from(_EVENTS.outerjoin(t, t.c.id == _EVENTS.c.ticket_id)))
+        if after is None:
+            # First poll: the newest events, for clients resuming from a page
+            # rendered a moment ago.
+            stmt = stmt.order_by(_EVENTS.c.id.desc()).limit(self.backlog)
+        else:
+            stmt = stmt.where(_EVENTS.c.id > after).order_by(_EVENTS.c.id).limit(self.backlog)
+        with self.engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+        return rows[::-1] if after is None else rows
+
+    def refresh(self, max_age=0.0):
+        """Fetch new events unless the last poll is under ``max_age`` seconds
+        old, and wake the streams if there were any."""
+        with self._cond:
+            if time.monotonic() - self._polled_at < max_age:
+                return
+            first = self._last_id is None
+            rows = self._query(self._last_id)
+            self._polled_at = time.monotonic()
+            if first:
+                self._last_id = self._horizon = rows[0][0] - 1 if rows else 0
+            if not rows:
+                return
+            for row in rows:
+                ticket = row[4:] if row[3] is not None else None  # None once archived
+                self._events.append((row[0], _frame(row[0], row[1], row[2], ticket)))
+            self._last_id = rows[-1][0]
+            if len(self._events) > self.backlog:
+                del self._events[:-self.backlog]
+                self._horizon = self._events[0][0] - 1
+            self._cond.notify_all()
+
+    def _after(self, since):
+        """Frames of the events after ``since``, or None if some of them are
+        no longer buffered. Call with the lock held."""
+        if since is None:
+            since = self._last_id
+        if since < self._horizon:
+            return None
+        return [(event_id, frame) for event_id, frame in self._events if event_id > since]
+
+    def _ensure_poller(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='live-feed', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            if self.streams:
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception('Polling ticket events failed')
+            time.sleep(POLL_SECONDS)
+
+    def poll(self, since):
+        """Pending frames for a client that will reconnect (no held thread)."""
+        self.refresh(max_age=POLL_SECONDS)
+        with self._cond:
+            batch = self._after(since)
+        if batch is None:
+            return 'event: reload\ndata: {}\n\n'
+        return ''.join(frame for _, frame in batch)
+
+    def stream(self, since, seconds=None):
+        """Yield frames as events arrive, with keep-alives, for ``seconds``."""
+        end = time.monotonic() + (STREAM_SECONDS if seconds is None else seconds)
+        self.refresh(max_age=POLL_SECONDS)
+        with self._cond:
+            self.streams += 1
+            since = self._last_id if since is None else since
+        self._ensure_poller()
+        try:
+            # Reconnect promptly when the server ends the stream.
+            yield 'retry: 1000\n\n'
+            while True:
+                with self._cond:
+                    batch = self._after(since)
+                    left = end - time.monotonic()
+                    if batch == [] and left > 0:
+                        self._cond.wait(min(HEARTBEAT_SECONDS, left))
+                        batch = self._after(since)
+                if batch is None:
+                    yield 'event: reload\ndata: {}\n\n'
+                    return
+                if batch:
+                    since = batch[-1][0]
+                    yield ''.join(frame for _, frame in batch)
+                elif left <= 0:
+                    return
+                else:
+                    yield ': keep-alive\n\n'
+        finally:
+            with self._cond:
+                self.streams -= 1
+
+
+def init_app(app, engine):
+    """Attach a :class:`Feed` polling ``engine`` to the app."""
+    app.extensions['live'] = Feed(engine)
+
+
+def response(feed, request):
+    """The ``/admin/events`` response for ``request``."""
+    if not feed.supported:
+        return Response(status=204)
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    since = int(since) if since and since.isdigit() else None
+    hold = request.environ.get('wsgi.multithread') and feed.streams < MAX_STREAMS
+    if hold:
+        body = feed.stream(since)
+    else:
+        body = f'retry: {int(RETRY_SECONDS * 1000)}\n\n' + feed.poll(since)
+    resp = Response(body, mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies (nginx) from buffering the stream.
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
@@ -0,0 +1,261 @@
+"""In-process classifier trained on our own labelled tickets.
+
+Every admin correction, every ticket that made it to ``FixedIssue`` and every
+ticket the OpenAI model labelled is an example. This module turns them into a small TF-IDF + multinomial
+naive Bayes model (one head for category, one for priority) that
+``classify_text`` consults before calling OpenAI: confident local answers
+return in well under a millisecond, and only the uncertain remainder pays
+for a model round-trip.
+
+Training streams rows from the database twice (document frequencies, then
+per-class feature sums), so memory is O(classes x vocabulary) whatever the
+table size. The result is saved as a compressed ``.npz`` artifact::
+
+    flask --app app:create_app train-local-model
+
+NumPy is optional: without it the tier is simply skipped.
+"""
+import math
+import os
+import re
+import time
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Optional
+
+import click
+from flask.cli import with_appcontext
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - import guard
+    np = None
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'local_model.npz')
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'+.-]*[a-z0-9]|[a-z0-9]")
+
+# Example weights: an admin-confirmed label is worth more than the model's.
+WEIGHT_CORRECTED = 3.0
+WEIGHT_FIXED = 2.0
+WEIGHT_TICKET = 1.0
+
+
+def tokenize(text: str):
+    """Lowercased word unigrams plus adjacent-word bigrams."""
+    words = _TOKEN_RE.findall(text.lower())
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+class LocalModel:
+    """TF-IDF features scored by per-head multinomial naive Bayes."""
+
+    HEADS = ('category', 'priority')
+
+    def __init__(self, vocabulary, idf, heads):
+        self.vocabulary = vocabulary          # term -> column
+        self.idf = idf                        # (V,) float32
+        self.heads = heads                    # name -> (labels, log_prior (C,), log_lik (C, V))
+
+    def _features(self, text):
+        counts = Counter(t for t in tokenize(text) if t in self.vocabulary)
+        if not counts:
+            return None, None
+        idx = np.fromiter((self.vocabulary[t] for t in counts), dtype=np.int64, count=len(counts))
+        tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        values = tf * self.idf[idx]
+        norm = float(np.sqrt(values @ values))
+        return idx, values / norm if norm else values
+
+    def _head(self, name, idx, values):
+        labels, log_prior, log_lik = self.heads[name]
+        scores = log_prior + log_lik[:, idx] @ values
+        scores = np.exp(scores - scores.max())
+        probs = scores / scores.sum()
+        best = int(probs.argmax())
+        return labels[best], float(probs[best])
+
+    def predict(self, text: str) -> Optional[Dict]:
+        """Return a classification dict, or None if no known terms occur."""
+        idx, values = self._features(text)
+        if idx is None:
+            return None
+        category, p_cat = self._head('category', idx, values)
+        priority, p_pri = self._head('priority', idx, values)
+        # The ticket is only as certain as its least certain head.
+        return {'category': category, 'priority': priority, 'confidence': min(p_cat, p_pri)}
+
+    def save(self, path: str):
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        arrays = {
+            # Vocabulary as one compressed newline-joined blob: far smaller
+            # than an object array and loads without pickle.
+            'vocabulary': np.frombuffer(zlib.compress('\n'.join(terms).encode('utf-8')), dtype=np.uint8),
+            'idf': self.idf,
+        }
+        for name, (labels, log_prior, log_lik) in self.heads.items():
+            arrays[f'{name}_labels'] = np.array(labels)
+            arrays[f'{name}_log_prior'] = log_prior
+            arrays[f'{name}_log_lik'] = log_lik
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'LocalModel':
+        with np.load(path, allow_pickle=False) as data:
+            terms = zlib.decompress(data['vocabulary'].tobytes()).decode('utf-8').split('\n')
+            heads = {
+                name: ([str(label) for label in data[f'{name}_labels']],
+                       data[f'{name}_log_prior'], data[f'{name}_log_lik'])
+                for name in cls.HEADS
+            }
+            return cls({t: i for i, t in enumerate(terms)}, data['idf'], heads)
+
+
+def train(examples, min_df: int = 2, max_features: int = 50_000, alpha: float = 0.1) -> LocalModel:
+    """Fit a model from ``examples``.
+
+    ``examples`` is a zero-argument callable returning a fresh iterable of
+    ``(text, category, priority, weight)`` tuples; it is iterated twice.
+    """
+    if np is None:
+        raise RuntimeError('numpy is required to train the local model')
+
+    # Pass 1: document frequencies.
+    df = Counter()
+    n_docs = 0
+    for text, _, _, _ in examples():
+        df.update(set(tokenize(text)))
+        n_docs += 1
+    if not n_docs:
+        raise ValueError('no training examples')
+    kept = [t for t, c in df.most_common(max_features) if c >= min_df]
+    vocabulary = {t: i for i, t in enumerate(sorted(kept))}
+    idf = np.zeros(len(vocabulary), dtype=np.float32)
+    for t, i in vocabulary.items():
+        idf[i] = math.log((1 + n_docs) / (1 + df[t])) + 1.0
+    model = LocalModel(vocabulary, idf, {})
+
+    # Pass 2: per-class weighted sums of normalized TF-IDF vectors.
+    sums = {name: {} for name in LocalModel.HEADS}
+    priors = {name: Counter() for name in LocalModel.HEADS}
+    for text, category, priority, weight in examples():
+        idx, values = model._features(text)
+        for name, label in (('category', category), ('priority', priority)):
+            priors[name][label] += weight
+            if idx is None:
+                continue
+            row = sums[name].setdefault(label, np.zeros(len(vocabulary), dtype=np.float64))
+            row[idx] += values * weight
+
+    for name in LocalModel.HEADS:
+        labels = sorted(priors[name])
+        total = sum(priors[name].values())
+        log_prior = np.log(np.array([priors[name][l] / total for l in labels], dtype=np.float32))
+        matrix = np.vstack([sums[name].get(l, np.zeros(len(vocabulary))) for l in labels]) + alpha
+        log_lik = np.log(matrix / matrix.sum(axis=1, keepdims=True)).astype(np.float32)
+        model.heads[name] = (labels, log_prior, log_lik)
+    return model
+
+
+def training_examples(chunk_size: int = 1000):
+    """Return a callable streaming labelled examples from the database.
+
+    Uses corrected tickets (their current labels are the admin's), archived
+    fixes not already represented by a ticket, and tickets labelled by the
+    OpenAI model (``label_source == 'model'``). Heuristic guesses and this
+    model's own labels are left out, whatever their confidence: training on
+    them would only teach it to imitate the fallback and itself. Must be
+    called inside an app context.
+    """
+    from sqlalchemy import exists, or_, select
+    from models import db, Ticket, TicketCorrection, FixedIssue
+
+    corrected = exists().where(TicketCorrection.ticket_id == Ticket.id)
+
+    def stream(query, key):
+        last = 0
+        while True:
+            rows = db.session.execute(query.where(key > last).order_by(key).limit(chunk_size)).all()
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1][0]
+
+    def examples():
+        tickets = select(Ticket.id, Ticket.description, Ticket.category, Ticket.priority, corrected).where(
+            Ticket.category.is_not(None), Ticket.priority.is_not(None),
+            or_(corrected, Ticket.label_source == 'model'),
+        )
+        for _, text, category, priority, was_corrected in stream(tickets, Ticket.id):
+            yield text, category, priority, WEIGHT_CORRECTED if was_corrected else WEIGHT_TICKET
+        fixed = select(FixedIssue.id, FixedIssue.description, FixedIssue.category, FixedIssue.priority).where(
+            FixedIssue.category.is_not(None), FixedIssue.priority.is_not(None),
+            or_(FixedIssue.ticket_id.is_(None), ~exists().where(Ticket.id == FixedIssue.ticket_id)),
+        )
+        for _, text, category, priority in stream(fixed, FixedIssue.id):
+            yield text, category, priority, WEIGHT_FIXED
+
+    return examples
+
+
+class _Loader:
+    """Loads the saved model lazily and picks up retrained artifacts."""
+
+    CHECK_SECONDS = 30
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path = None
+        self._mtime = None
+        self._model = None
+        self._checked = 0.0
+
+    def get(self) -> Optional[LocalModel]:
+        if np is None:
+            return None
+        path = os.environ.get('LOCAL_MODEL_PATH', DEFAULT_MODEL_PATH)
+        if not path:
+            return None
+        now = time.monotonic()
+        if path == self._path and now - self._checked < self.CHECK_SECONDS:
+            return self._model
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                self._path, self._mtime, self._model = path, None, None
+                return None
+            if path != self._path or mtime != self._mtime:
+                try:
+                    self._model = LocalModel.load(path)
+                except Exception:
+                    self._model = None
+                self._path, self._mtime = path, mtime
+            return self._model
+
+
+loader = _Loader()
+
+
+@click.command('train-local-model')
+@click.option('--output', default=None, help='Artifact path (default: LOCAL_MODEL_PATH or instance/local_model.npz).')
+@click.option('--min-df', default=2, show_default=True, help='Ignore terms seen in fewer documents.')
+@click.option('--max-features', default=50_000, show_default=True, help='Vocabulary size cap.')
+@with_appcontext
+def train_command(output, min_df, max_features):
+    """Retrain the local classifier from tickets, corrections and fixed issues."""
+    output = output or os.environ.get('LOCAL_MODEL_PATH') or DEFAULT_MODEL_PATH
+    start = time.perf_counter()
+    try:
+        model = train(training_examples(), min_df=min_df, max_features=max_features)
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    model.save(output)
+    size_kb = os.path.getsize(output) / 1024
+    click.echo(f'Trained on vocabulary of {len(model.vocabulary)} terms in '
+               f'{time.perf_counter() - start:.1f}s; saved {size_kb:.0f} KiB to {output}')
@@ -0,0 +1,304 @@
+"""Prometheus metrics: request latency, database work per request, the
+classifier's paths and fallbacks, the classification queue and rate-limit
+rejections, served as text at ``/metrics``.
+
+Counters and histograms live in plain per-process dicts, so recording a
+value is a lock and a few additions. Under gunicorn every worker has its
+own, which is why, with ``METRICS_DIR`` set, each process also writes a
+snapshot to ``<METRICS_DIR>/<pid>-<token>.json`` (at most once per
+``METRICS_FLUSH_SECONDS``, from the request and worker loops). A scrape,
+served by any worker, sums the snapshots of all processes. Snapshots of
+workers that exited stay in the directory so counters never go backwards;
+point ``METRICS_DIR`` at a directory that starts empty with each deploy
+(the Docker image uses ``/tmp``). Without ``METRICS_DIR`` a scrape reports
+the serving process only, which is right for a single-process server.
+
+Gauges (the queue depth) are read from the database at scrape time and are
+not summed across processes.
+
+Set ``METRICS_TOKEN`` to require ``Authorization: Bearer <token>`` for
+``/metrics``; ``METRICS_ENABLED=0`` turns the endpoint and the request
+hooks off.
+"""
+import bisect
+import glob
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 1))
+# Seconds; tuned for a web app whose requests take milliseconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.metrics.append(self)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(k), v if not isinstance(v, list) else list(v)] for k, v in self._values.items()]
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+    def lines(self, values):
+        return [f'{self.name}{_labels(self.labelnames, k)} {_number(v)}' for k, v in sorted(values.items())]
+
+
+class Gauge(Counter):
+    """A value set by the scraping process; not summed across processes."""
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def snapshot(self):
+        return []
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        # Per-bucket (not cumulative) counts, then the sum.
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def merge(self, total, value):
+        return [a + b for a, b in zip(total, value)] if total else list(value)
+
+    def lines(self, values):
+        out = []
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                out.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", _number(bound))])} {cumulative}')
+            out.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(counts[-1])}')
+            out.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return out
+
+
+class Registry:
+    """All metrics of this process, plus the snapshot files of the others."""
+
+    def __init__(self):
+        self.metrics = []
+        self.directory = None
+        self._pid = self._path = None
+        self._flushed = 0.0
+        self._flush_lock = threading.Lock()
+
+    def configure(self, directory):
+        self.directory = directory or None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _own_path(self):
+        # Re-derived after a fork (gunicorn --preload), and unique even when
+        # the OS reuses the pid of a worker that exited.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, f'{self._pid}-{secrets.token_hex(4)}.json')
+        return self._path
+
+    def flush(self):
+        """Write this process's snapshot (no-op without ``METRICS_DIR``)."""
+        if not self.directory:
+            return
+        with self._flush_lock:
+            self._flushed = time.monotonic()
+            data = {m.name: m.snapshot() for m in self.metrics if m.kind != 'gauge'}
+            path = self._own_path()
+            with open(path + '.tmp', 'w') as fh:
+                json.dump(data, fh)
+            os.replace(path + '.tmp', path)
+
+    def maybe_flush(self):
+        if self.directory and time.monotonic() - self._flushed >= FLUSH_SECONDS:
+            self.flush()
+
+    def _snapshots(self):
+        if not self.directory:
+            yield {m.name: m.snapshot() for m in self.metrics}
+            return
+        self.flush()
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as fh:
+                    yield json.load(fh)
+            except (OSError, ValueError):
+                continue
+
+    def render(self):
+        """All metrics in the Prometheus text format."""
+        merged = {m.name: {} for m in self.metrics}
+        by_name = {m.name: m for m in self.metrics}
+        for snapshot in self._snapshots():
+            for name, series in snapshot.items():
+                metric = by_name.get(name)
+                if metric is None:
+                    continue
+                for labels, value in series:
+                    key = tuple(labels)
+                    merged[name][key] = metric.merge(merged[name].get(key), value)
+        lines = []
+        for metric in self.metrics:
+            values = merged[metric.name]
+            if metric.kind == 'gauge':
+                with metric._lock:
+                    values = dict(metric._values)
+            lines += metric.header() + metric.lines(values)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Time to build the response, by route.',
+                            ('method', 'endpoint'))
+REQUESTS = Counter('http_requests_total', 'Responses by route and status code.',
+                   ('method', 'endpoint', 'status'))
+REQUEST_DB_QUERIES = Histogram('http_request_db_queries', 'Database statements per request.',
+                               ('endpoint',), buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+REQUEST_DB_SECONDS = Histogram('http_request_db_seconds', 'Database time per request.', ('endpoint',))
+CLASSIFY_SECONDS = Histogram('classify_duration_seconds',
+                             'classify_text latency by the path that answered '
+                             '(local model, cache, openai, heuristic when no model is '
+                             'configured, fallback when it failed).', ('path',))
+CLASSIFY_FALLBACKS = Counter('classify_fallbacks_total',
+                             'Heuristic answers given instead of the model, by reason '
+                             '(unconfigured, busy, error, deadline, circuit_open).', ('reason',))
+CLASSIFY_REDACTIONS = Counter('classify_redactions_total',
+                              'Secrets and personal data masked in text sent to the model, by kind '
+                              '(emails, keys, bearer_tokens, blobs).', ('kind',))
+CLASSIFY_TRUNCATED = Counter('classify_truncated_total',
+                             'Texts cut to MAX_MODEL_CHARS before being sent to the model.')
+CLASSIFY_LATE = Counter('classify_late_answers_total', 'Model answers that arrived after the deadline.')
+CLASSIFY_CIRCUIT = Counter('classify_circuit_transitions_total',
+                           'Classifier circuit breaker state changes, by new state.', ('state',))
+CLASSIFY_JOBS = Counter('classify_jobs_total', 'Finished classification job attempts by outcome.',
+                        ('outcome',))
+RATE_LIMITED = Counter('rate_limit_rejections_total', 'Requests rejected by a rate limit.', ('endpoint',))
+QUEUE_DEPTH = Gauge('classify_queue_jobs', 'Classification jobs by status (done jobs omitted).',
+                    ('status',))
+
+# Database statements of the request being served on this thread.
+_local = threading.local()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'queries', None) is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is not None and getattr(_local, 'queries', None) is not None:
+        _local.queries += 1
+        _local.db_seconds += time.perf_counter() - start
+
+
+def rate_limited(limit):
+    """Flask-Limiter ``on_breach`` callback."""
+    RATE_LIMITED.inc(request.endpoint or 'unmatched')
+
+
+def _authorized(token):
+    scheme, _, sent = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(sent.strip(), token)
+
+
+def init_app(app, engines, queue_depth):
+    """Install the request and database hooks and the ``/metrics`` view.
+
+    ``queue_depth`` returns ``{status: jobs}`` for the gauge at scrape time.
+    """
+    if not ENABLED:
+        return
+    registry.configure(os.environ.get('METRICS_DIR'))
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        _local.queries, _local.db_seconds = 0, 0.0
+
+    @app.after_request
+    def _record(resp):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            # Unmatched URLs share one label so scanners cannot blow up the
+            # number of series.
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, endpoint)
+            REQUESTS.inc(request.method, endpoint, str(resp.status_code))
+            REQUEST_DB_QUERIES.observe(_local.queries, endpoint)
+            REQUEST_DB_SECONDS.observe(_local.db_seconds, endpoint)
+            _local.queries = None
+            registry.maybe_flush()
+        return resp
+
+    @app.route('/metrics')
+    def metrics():
+        token = os.environ.get('METRICS_TOKEN')
+        if token and not _authorized(token):
+            return Response('Unauthorized\n', 401, mimetype='text/plain')
+        for status, count in queue_depth().items():
+            QUEUE_DEPTH.set(count, status)
+        return Response(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,136 @@
+"""Versioned schema migrations.
+
+``db.create_all()`` creates missing tables but never alters existing ones, so
+databases created by an older release would silently miss new indexes and
+columns. Each entry in ``MIGRATIONS`` is applied once, in order, inside its
+own transaction, and recorded in the ``schema_version`` table.
+
+Because fresh databases get the current schema from ``create_all`` before
+migrations run, every migration must be idempotent: use ``IF NOT EXISTS``
+for indexes and :func:`add_column` for columns.
+
+Migrations run automatically from ``create_app``; ``flask db-upgrade`` and
+``flask db-version`` exist for running them by hand.
+"""
+import logging
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, text
+
+import dedup
+import http_cache
+import live
+import search
+import stats
+from models import TicketStat, utcnow
+
+logger = logging.getLogger(__name__)
+
+
+def add_column(conn, table, name, ddl):
+    """``ALTER TABLE ... ADD COLUMN`` unless ``table.name`` already exists."""
+    columns = {c['name'] for c in inspect(conn).get_columns(table)}
+    if name not in columns:
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+
+
+def _add_label_source(conn):
+    add_column(conn, 'tickets', 'label_source', 'VARCHAR(20)')
+
+
+def _add_archived_stats(conn):
+    add_column(conn, 'ticket_stats', 'archived', 'INTEGER NOT NULL DEFAULT 0')
+    stats.rebuild(conn)
+
+
+def _create_indexes(*statements):
+    def migrate(conn):
+        for stmt in statements:
+            conn.execute(text(stmt))
+    return migrate
+
+
+def _backfill_stats(conn):
+    TicketStat.__table__.create(conn, checkfirst=True)
+    stats.rebuild(conn)
+
+
+def _add_fingerprints(conn):
+    add_column(conn, 'tickets', 'simhash', 'BIGINT')
+    add_column(conn, 'tickets', 'duplicate_of', 'INTEGER REFERENCES tickets (id)')
+    add_column(conn, 'fixed_issues', 'simhash', 'BIGINT')
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_tickets_duplicate_of ON tickets (duplicate_of)'))
+    dedup.backfill(conn)
+
+
+MIGRATIONS = [
+    (1, 'Secondary indexes for ticket, correction and fixed-issue queries', _create_indexes(
+        'CREATE INDEX IF NOT EXISTS ix_tickets_created_at_id ON tickets (created_at, id)',
+        'CREATE INDEX IF NOT EXISTS ix_ticket_corrections_ticket_id_corrected_at '
+        'ON ticket_corrections (ticket_id, corrected_at)',
+        'CREATE INDEX IF NOT EXISTS ix_fixed_issues_fixed_at_id ON fixed_issues (fixed_at, id)',
+        'CREATE INDEX IF NOT EXISTS ix_fixed_issues_category_fixed_at ON fixed_issues (category, fixed_at)',
+        'CREATE INDEX IF NOT EXISTS ix_fixed_issues_priority_fixed_at ON fixed_issues (priority, fixed_at)',
+        'CREATE INDEX IF NOT EXISTS ix_fixed_issues_fixed_by_fixed_at ON fixed_issues (fixed_by, fixed_at)',
+    )),
+    (2, 'Backfill the ticket statistics rollup', _backfill_stats),
+    (3, 'Full-text search indexes (SQLite FTS5)', search.install),
+    (4, 'Near-duplicate fingerprints and incident grouping', _add_fingerprints),
+    (5, 'Change counter for HTTP conditional requests', http_cache.install),
+    (6, 'Full-text index for archived tickets (SQLite FTS5)', search.install_archive),
+    (7, 'Ticket change feed for live admin updates', live.install),
+    (8, 'Record where ticket labels came from', _add_label_source),
+    (9, 'Count archived tickets separately in the statistics rollup', _add_archived_stats),
+]
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_version ('
+        'version INTEGER PRIMARY KEY, description VARCHAR(255) NOT NULL, applied_at DATETIME NOT NULL)'
+    ))
+
+
+def current_version(engine):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return conn.execute(text('SELECT COALESCE(MAX(version), 0) FROM schema_version')).scalar()
+
+
+def upgrade(engine):
+    """Apply pending migrations. Returns the list of versions applied."""
+    applied = []
+    start = current_version(engine)
+    for version, description, migrate in MIGRATIONS:
+        if version <= start:
+            continue
+        with engine.begin() as conn:
+            # Another process may have applied it since we looked.
+            if conn.execute(text('SELECT 1 FROM schema_version WHERE version = :v'), {'v': version}).first():
+                continue
+            migrate(conn)
+            conn.execute(
+                text('INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)'),
+                {'v': version, 'd': description, 't': utcnow()},
+            )
+        logger.info('Applied schema migration %s: %s', version, description)
+        applied.append(version)
+    return applied
+
+
+@click.command('db-upgrade')
+@with_appcontext
+def upgrade_command():
+    """Apply pending schema migrations."""
+    from models import db
+    applied = upgrade(db.engine)
+    click.echo(f'Applied migrations: {applied}' if applied else 'Schema is up to date.')
+
+
+@click.command('db-version')
+@with_appcontext
+def version_command():
+    """Show the current schema version."""
+    from models import db
+    click.echo(f'Schema version {current_version(db.engine)} (latest {MIGRATIONS[-1][0]}).')
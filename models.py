@@ -1,7 +1,12 @@
+import json
+import zlib
+
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone
 
-db = SQLAlchemy()
+from database import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
 def utcnow():
@@ -15,6 +20,11 @@ def utcnow():
 
 class Ticket(db.Model):
     __tablename__ = 'tickets'
+    __table_args__ = (
+        # Every ticket list is newest-first; id breaks created_at ties.
+        db.Index('ix_tickets_created_at_id', 'created_at', 'id'),
+        db.Index('ix_tickets_duplicate_of', 'duplicate_of'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -24,15 +34,31 @@ class Ticket(db.Model):
     status = db.Column(db.String(50), nullable=False, default='Open')
     created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+    # SimHash of the description (signed 64-bit, see dedup.py) and the open
+    # incident this ticket was grouped under as a near-duplicate.
+    simhash = db.Column(db.BigInteger, nullable=True)
+    duplicate_of = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=True)
+    # Who set category/priority: 'model' (OpenAI), 'local' (trained model),
+    # 'heuristic' (keyword rules; provisional while the model is failing),
+    # 'admin' or 'fixed' (copied from a known fix). NULL for older rows.
+    label_source = db.Column(db.String(20), nullable=True)
 
     corrections = db.relationship('TicketCorrection', backref='ticket', lazy=True)
 
+    @property
+    def pending_classification(self):
+        """True until the background classifier has filled in the category."""
+        return self.category is None
+
     def __repr__(self):
         return f"<Ticket {self.id} {self.title}>"
 
 
 class TicketCorrection(db.Model):
     __tablename__ = 'ticket_corrections'
+    __table_args__ = (
+        db.Index('ix_ticket_corrections_ticket_id_corrected_at', 'ticket_id', 'corrected_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False)
     old_category = db.Column(db.String(100), nullable=True)
@@ -49,6 +75,14 @@ class TicketCorrection(db.Model):
 
 class FixedIssue(db.Model):
     __tablename__ = 'fixed_issues'
+    __table_args__ = (
+        # Unfiltered archive listing, plus one index per filter column so
+        # each filter can both seek and return rows already in fixed_at order.
+        db.Index('ix_fixed_issues_fixed_at_id', 'fixed_at', 'id'),
+        db.Index('ix_fixed_issues_category_fixed_at', 'category', 'fixed_at'),
+        db.Index('ix_fixed_issues_priority_fixed_at', 'priority', 'fixed_at'),
+        db.Index('ix_fixed_issues_fixed_by_fixed_at', 'fixed_by', 'fixed_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=True)
     title = db.Column(db.String(255), nullable=False)
@@ -60,6 +94,131 @@ class FixedIssue(db.Model):
     fixed_by = db.Column(db.String(100), nullable=True)
     fixed_at = db.Column(db.DateTime, nullable=False, default=utcnow)
     notes = db.Column(db.Text, nullable=True)
+    simhash = db.Column(db.BigInteger, nullable=True)
 
     def __repr__(self):
         return f"<FixedIssue {self.id} ticket={self.ticket_id} fixed_at={self.fixed_at}>"
+
+
+class ArchivedTicket(db.Model):
+    """A fixed ticket moved out of ``tickets`` by the retention job.
+
+    Keeps the ticket's id, title and labels as plain columns; the
+    description and the correction history (a JSON list) are stored
+    zlib-compressed. ``description_z`` is NULL when the ticket's fixed issue
+    already holds the same text (see :mod:`archive`).
+    """
+    __tablename__ = 'ticket_archive'
+    __table_args__ = (
+        db.Index('ix_ticket_archive_created_at_id', 'created_at', 'id'),
+    )
+    # The original ticket id, so links to /ticket/<id> keep working.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(255), nullable=False)
+    description_z = db.Column(db.LargeBinary, nullable=True)
+    category = db.Column(db.String(100), nullable=True)
+    priority = db.Column(db.String(50), nullable=True)
+    confidence = db.Column(db.Float, nullable=True)
+    status = db.Column(db.String(50), nullable=False)
+    duplicate_of = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    corrections_z = db.Column(db.LargeBinary, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    pending_classification = False
+    # Set by list views that load the fixed issues' text in one query.
+    fixed_description = None
+
+    @property
+    def description(self):
+        if self.description_z is not None:
+            return zlib.decompress(self.description_z).decode('utf-8')
+        if self.fixed_description is None:
+            fixed = (FixedIssue.query.filter_by(ticket_id=self.id)
+                     .order_by(FixedIssue.id.desc()).first())
+            self.fixed_description = fixed.description if fixed is not None else ''
+        return self.fixed_description
+
+    @property
+    def corrections(self):
+        """The archived correction history as (unsaved) TicketCorrection objects."""
+        if self.corrections_z is None:
+            return []
+        rows = json.loads(zlib.decompress(self.corrections_z))
+        return [TicketCorrection(ticket_id=self.id, **dict(row, corrected_at=datetime.fromisoformat(row['corrected_at'])))
+                for row in rows]
+
+    def __repr__(self):
+        return f"<ArchivedTicket {self.id} {self.title}>"
+
+
+class ClassificationJob(db.Model):
+    """A queued request to classify one ticket in the background.
+
+    Jobs are claimed with a lease (``locked_until``); a worker that dies
+    mid-job simply lets the lease expire and another worker reclaims it.
+    """
+    __tablename__ = 'classification_jobs'
+    __table_args__ = (
+        db.Index('ix_classification_jobs_status_run_after', 'status', 'run_after'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False)
+    # queued -> running -> done | failed (running jobs with an expired lease
+    # are treated as queued again).
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=utcnow)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+
+    def __repr__(self):
+        return f"<ClassificationJob {self.id} ticket={self.ticket_id} {self.status}>"
+
+
+class ClassificationCacheEntry(db.Model):
+    """Shared (cross-worker) cache of model classifications.
+
+    Keyed on a hash of the normalized, redacted text plus model name and
+    taxonomy version, so no raw ticket text is stored here.
+    """
+    __tablename__ = 'classification_cache'
+    __table_args__ = (
+        db.Index('ix_classification_cache_expires_at', 'expires_at'),
+    )
+    key = db.Column(db.String(64), primary_key=True)
+    model = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    priority = db.Column(db.String(50), nullable=False)
+    confidence = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ClassificationCacheEntry {self.key[:12]} {self.category}/{self.priority}>"
+
+
+class TicketStat(db.Model):
+    """Rollup of ticket counts by creation day, category, priority and status.
+
+    Maintained incrementally by :mod:`stats` in the same transaction as the
+    ticket change it reflects; ``flask rebuild-stats`` recomputes it from
+    scratch. Unclassified tickets are counted under an empty category and
+    priority (NULL cannot be part of a primary key).
+    """
+    __tablename__ = 'ticket_stats'
+    day = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(100), primary_key=True, default='')
+    priority = db.Column(db.String(50), primary_key=True, default='')
+    status = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    # How many of ``count`` have been moved to the archive (still counted
+    # on the dashboard, no longer in the ticket lists).
+    archived = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f"<TicketStat {self.day} {self.category}/{self.priority}/{self.status} {self.count}>"
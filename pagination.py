@@ -0,0 +1,117 @@
+"""Keyset (cursor) pagination for the newest-first list pages.
+
+``Query.paginate()`` issues ``OFFSET (page-1)*per_page`` plus a full
+``COUNT(*)`` on every view, so deep pages get linearly slower as tables grow.
+Here a page is addressed by an opaque cursor holding the ``(timestamp, id)``
+of the row at its edge, and fetched with a row-value comparison that the
+``(timestamp, id)`` indexes serve directly. Page N therefore costs the same
+as page 1. Totals come from :class:`CachedCount`, which re-counts at most once
+per TTL.
+"""
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+
+from flask import request, url_for
+from sqlalchemy import tuple_
+
+
+def encode_cursor(ts, id_):
+    raw = json.dumps([ts.isoformat(), id_], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return ``(datetime, id)`` or None for a missing/garbled token."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        ts, id_ = json.loads(raw)
+        return datetime.fromisoformat(ts), int(id_)
+    except (ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """One page of results plus cursors to its neighbours."""
+
+    def __init__(self, items, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, ts_col, id_col, per_page, after=None, before=None, total=None):
+    """Fetch one newest-first page of ``query`` ordered by ``(ts_col, id_col)``.
+
+    ``after`` / ``before`` are cursor tokens from a previous page's
+    ``next_cursor`` / ``prev_cursor``; with neither, the first page is returned.
+    """
+    key = tuple_(ts_col, id_col)
+    after_key, before_key = decode_cursor(after), decode_cursor(before)
+    if before_key is not None:
+        # Walk backwards (ascending) from the cursor, then restore order.
+        rows = (query.filter(key > tuple_(*before_key))
+                .order_by(ts_col.asc(), id_col.asc()).limit(per_page + 1).all())
+        more_newer = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_prev, has_next = more_newer, True
+    else:
+        if after_key is not None:
+            query = query.filter(key < tuple_(*after_key))
+        rows = query.order_by(ts_col.desc(), id_col.desc()).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_prev, has_next = after_key is not None, len(rows) > per_page
+    ts_name, id_name = ts_col.key, id_col.key
+
+    def cursor(item):
+        return encode_cursor(getattr(item, ts_name), getattr(item, id_name))
+
+    return KeysetPage(
+        items,
+        next_cursor=cursor(items[-1]) if items and has_next else None,
+        prev_cursor=cursor(items[0]) if items and has_prev else None,
+        total=total,
+    )
+
+
+class CachedCount:
+    """Per-process ``COUNT(*)`` cache so totals don't cost a scan per view."""
+
+    def __init__(self, ttl=60.0, max_keys=256):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, count_fn):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._values.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        value = count_fn()
+        with self._lock:
+            if len(self._values) >= self.max_keys:
+                self._values.clear()
+            self._values[key] = (now + self.ttl, value)
+        return value
+
+
+def page_url(**cursor):
+    """URL for the current view with its filters kept and ``cursor`` applied."""
+    args = {k: v for k, v in request.args.items() if k not in ('after', 'before', 'page')}
+    args.update(cursor)
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
@@ -0,0 +1,143 @@
+"""Opt-in SQL profiling for development and incident diagnosis.
+
+With ``SQL_PROFILE=1`` every request logs one line with its route, status,
+statement count, database time and slowest statements, and answers with a
+``Server-Timing`` header so the numbers also show in the browser's network
+panel. In addition:
+
+* any statement slower than ``SQL_SLOW_MS`` (default 100) is logged with
+  its SQL (never its parameters), in requests and background jobs alike;
+* a statement shape (the SQL with ``IN`` lists collapsed) run
+  ``SQL_REPEAT_THRESHOLD`` (default 5) or more times in one request is
+  reported as a likely N+1: a lazy relationship or attribute loaded per
+  row of a list;
+* ``PROFILE_SAMPLE_RATE`` (0-1, default 0) of requests also run under
+  cProfile and dump their stats to ``PROFILE_DIR`` as
+  ``<endpoint>-<time>.prof`` (view with ``python -m pstats`` or snakeviz).
+
+When ``SQL_PROFILE`` is off, :func:`init_app` installs nothing: no event
+listeners, no request hooks, no cost.
+"""
+import cProfile
+import heapq
+import os
+import random
+import re
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+
+ENABLED = os.environ.get('SQL_PROFILE', '').lower() in ('1', 'true', 'yes')
+SLOW_MS = float(os.environ.get('SQL_SLOW_MS', 100))
+REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 5))
+SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+# Slowest statements named in each request's log line.
+TOP_N = 3
+MAX_SQL_CHARS = 300
+
+_IN_LIST_RE = re.compile(r'\?(?:\s*,\s*\?)+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def shape(statement):
+    """``statement`` with whitespace and ``IN (?, ?, ...)`` lists collapsed,
+    so the same query with different parameters has the same shape."""
+    return _IN_LIST_RE.sub('?...', _SPACE_RE.sub(' ', statement).strip())
+
+
+def _short(statement):
+    text = shape(statement)
+    return text if len(text) <= MAX_SQL_CHARS else text[:MAX_SQL_CHARS] + '…'
+
+
+class RequestProfile:
+    """Statements issued while serving one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = {}      # shape -> [count, seconds]
+        self.slowest = []     # min-heap of (seconds, statement), TOP_N long
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        entry = self.shapes.setdefault(shape(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        item = (seconds, statement)
+        if len(self.slowest) < TOP_N:
+            heapq.heappush(self.slowest, item)
+        elif item > self.slowest[0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def repeated(self, threshold=None):
+        """``(shape, count, seconds)`` for shapes run ``threshold``+ times."""
+        threshold = threshold or REPEAT_THRESHOLD
+        return sorted(((s, n, t) for s, (n, t) in self.shapes.items() if n >= threshold),
+                      key=lambda item: -item[1])
+
+
+_local = threading.local()
+
+
+def current():
+    """The :class:`RequestProfile` of the request on this thread, or None."""
+    return getattr(_local, 'profile', None)
+
+
+def init_app(app, engines):
+    """Install the statement hooks and request middleware if ``SQL_PROFILE``
+    is set. Call inside an app context, after ``db.init_app``."""
+    if not ENABLED:
+        return
+    log = app.logger
+    profile_dir = os.environ.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._profile_start = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - context._profile_start
+        profile = current()
+        if profile is not None:
+            profile.add(statement, seconds)
+        if seconds * 1000 >= SLOW_MS:
+            log.warning('Slow query (%.1f ms)%s: %s', seconds * 1000,
+                        f' in {request.endpoint}' if profile is not None else '', _short(statement))
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+    @app.before_request
+    def _start_profile():
+        _local.profile = RequestProfile()
+        g._profile_start = time.perf_counter()
+        if SAMPLE_RATE and random.random() < SAMPLE_RATE:
+            g._cprofile = cProfile.Profile()
+            g._cprofile.enable()
+
+    @app.after_request
+    def _report_profile(resp):
+        profile, _local.profile = current(), None
+        if profile is None:
+            return resp
+        elapsed = time.perf_counter() - g.pop('_profile_start')
+        endpoint = request.endpoint or 'unmatched'
+        profiler = g.pop('_cprofile', None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(profile_dir, f'{endpoint}-{time.time():.3f}.prof'))
+        slowest = '; '.join(f'{s * 1000:.1f} ms {_short(sql)}'
+                            for s, sql in sorted(profile.slowest, reverse=True))
+        log.info('%s %s %s: %d queries, %.1f ms DB, %.1f ms total%s', request.method, endpoint,
+                 resp.status_code, profile.count, profile.seconds * 1000, elapsed * 1000,
+                 f'; slowest: {slowest}' if slowest else '')
+        for sql, count, seconds in profile.repeated():
+            log.warning('Possible N+1 in %s: %d x (%.1f ms) %s', endpoint, count, seconds * 1000, _short(sql))
+        resp.headers.add('Server-Timing', f'db;dur={profile.seconds * 1000:.1f};desc="{profile.count} queries"')
+        return resp
@@ -0,0 +1,191 @@
+"""Rate-limit counters shared by every worker process on a host.
+
+Flask-Limiter's default in-memory storage gives each gunicorn worker its
+own counters, so "5 per minute" on the admin login really allowed five per
+worker, and the counters of every client IP ever seen stayed in memory.
+:class:`SQLiteStorage` keeps them in a small SQLite file instead (WAL mode,
+``synchronous=OFF``: counters are disposable), registered with ``limits``
+under the ``sqlite://`` scheme:
+
+* each hit is one short write transaction on a per-thread connection,
+  tens of microseconds (``python -m benchmarks.bench_rate_limits``);
+* it implements the fixed-window and sliding-window-counter strategies;
+  the app uses the latter, which weights the previous window's count so a
+  burst straddling a window boundary cannot get twice the limit;
+* idle keys expire: about once a minute (``RATELIMIT_SWEEP_SECONDS``)
+  expired rows are deleted, and if more than ``RATELIMIT_MAX_KEYS`` remain
+  the ones closest to expiry go first, so the file stays bounded whatever
+  the number of distinct clients.
+
+By default the file sits next to a SQLite ``DATABASE_URL``
+(``tickets.db`` -> ``tickets-ratelimit.db``). ``RATELIMIT_STORAGE_URI``
+overrides it, e.g. ``redis://...`` for limits shared across hosts or
+``memory://`` for the old per-process behaviour.
+"""
+import os
+import sqlite3
+import threading
+import time
+from math import floor
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+
+from database import is_sqlite_file
+
+MAX_KEYS = int(os.environ.get('RATELIMIT_MAX_KEYS', 100_000))
+SWEEP_SECONDS = float(os.environ.get('RATELIMIT_SWEEP_SECONDS', 60))
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS counters ('
+    'key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS ix_counters_expires_at ON counters (expires_at)',
+)
+# Add ``amount`` to a live counter, or restart an expired/missing one.
+_INCR = (
+    'INSERT INTO counters (key, count, expires_at) VALUES (:key, :amount, :now + :expiry) '
+    'ON CONFLICT (key) DO UPDATE SET '
+    'count = CASE WHEN expires_at <= :now THEN :amount ELSE count + :amount END, '
+    'expires_at = CASE WHEN expires_at <= :now THEN :now + :expiry ELSE expires_at END '
+    'RETURNING count'
+)
+
+
+def default_uri(database_url):
+    """``sqlite:///`` URI of the counter file next to ``database_url`` (the
+    engine's resolved URL), or None if the app database is not a SQLite file."""
+    if not is_sqlite_file(database_url):
+        return None
+    stem, _ = os.path.splitext(database_url.database)
+    return f'sqlite:///{stem}-ratelimit.db'
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """``limits`` storage backed by one SQLite file shared between processes."""
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri=None, wrap_exceptions=False, max_keys=None, sweep_seconds=None, **options):
+        self.path = uri.split('://', 1)[1][1:] if uri else ''
+        if not self.path:
+            raise ValueError('sqlite:// rate-limit storage needs a file, e.g. sqlite:///ratelimit.db')
+        self.max_keys = MAX_KEYS if max_keys is None else int(max_keys)
+        self.sweep_seconds = SWEEP_SECONDS if sweep_seconds is None else float(sweep_seconds)
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        conn = self._conn()
+        for stmt in _SCHEMA:
+            conn.execute(stmt)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _conn(self):
+        # One connection per thread, reopened in forked workers.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _write(self, fn):
+        """Run ``fn(conn, now)`` in one IMMEDIATE transaction."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn, now)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_seconds
+            self.sweep(now)
+        return result
+
+    def sweep(self, now=None):
+        """Delete expired counters, then the soonest-expiring ones beyond
+        ``max_keys``. Returns the number of rows deleted."""
+        now = time.time() if now is None else now
+        conn = self._conn()
+        deleted = conn.execute('DELETE FROM counters WHERE expires_at <= ?', (now,)).rowcount
+        excess = conn.execute('SELECT count(*) FROM counters').fetchone()[0] - self.max_keys
+        if excess > 0:
+            deleted += conn.execute(
+                'DELETE FROM counters WHERE key IN '
+                '(SELECT key FROM counters ORDER BY expires_at LIMIT ?)', (excess,)).rowcount
+        return deleted
+
+    def _live(self, conn, keys, now):
+        """``{key: (count, expires_at)}`` for the unexpired ``keys``."""
+        rows = conn.execute(
+            f'SELECT key, count, expires_at FROM counters WHERE key IN ({",".join("?" * len(keys))}) '
+            'AND expires_at > ?', (*keys, now)).fetchall()
+        return {key: (count, expires_at) for key, count, expires_at in rows}
+
+    # Fixed window.
+
+    def incr(self, key, expiry, amount=1):
+        return self._write(lambda conn, now: conn.execute(
+            _INCR, {'key': key, 'amount': amount, 'now': now, 'expiry': expiry}).fetchone()[0])
+
+    def get(self, key):
+        now = time.time()
+        return self._live(self._conn(), [key], now).get(key, (0, now))[0]
+
+    def get_expiry(self, key):
+        now = time.time()
+        return self._live(self._conn(), [key], now).get(key, (0, now))[1]
+
+    def clear(self, key):
+        self._conn().execute('DELETE FROM counters WHERE key = ?', (key,))
+
+    def reset(self):
+        return self._conn().execute('DELETE FROM counters').rowcount
+
+    def check(self):
+        try:
+            self._conn().execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    # Sliding window counter.
+
+    def _window(self, live, previous_key, current_key, expiry, now):
+        previous_count = live.get(previous_key, (0,))[0]
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, live.get(current_key, (0,))[0], current_ttl
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+
+        def acquire(conn, now):
+            previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+            live = self._live(conn, [previous_key, current_key], now)
+            previous, previous_ttl, current, _ = self._window(live, previous_key, current_key, expiry, now)
+            # The check and the increment share one write transaction, so
+            # concurrent workers cannot both take the last slot.
+            if floor(previous * previous_ttl / expiry + current) + amount > limit:
+                return False
+            conn.execute(_INCR, {'key': current_key, 'amount': amount, 'now': now, 'expiry': 2 * expiry})
+            return True
+        return self._write(acquire)
+
+    def get_sliding_window(self, key, expiry):
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        live = self._live(self._conn(), [previous_key, current_key], now)
+        return self._window(live, previous_key, current_key, expiry, now)
+
+    def clear_sliding_window(self, key, expiry):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self._conn().execute('DELETE FROM counters WHERE key IN (?, ?)', (previous_key, current_key))
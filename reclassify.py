@@ -0,0 +1,194 @@
+"""Bulk re-classification of existing tickets.
+
+Run after changing ``CATEGORIES``/``PRIORITY_LEVELS`` or ``OPENAI_MODEL``::
+
+    flask --app app:create_app reclassify --concurrency 8 --rate 5 --dry-run
+
+Tickets are streamed by primary key in chunks (keyset, never OFFSET), so
+memory stays flat regardless of table size. Each chunk is classified on a
+thread pool under a requests-per-second budget, written back with one
+batched ``UPDATE`` and then checkpointed, so an interrupted run resumes
+where it stopped.
+
+Only model answers (OpenAI, its cache or the local model) are written: a
+heuristic stand-in is skipped, leaving the ticket as it was. Tickets an
+admin corrected are left out unless ``--include-corrected`` is given, and
+each row is only updated if its labels are still the ones read, so edits
+made while the run was in flight are kept.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, exists, select, update
+
+from models import db, Ticket, TicketCorrection, utcnow
+from classifier import LABEL_SOURCES, MODEL_PATHS, classify
+import stats
+
+
+class RateBudget:
+    """Thread-safe token bucket allowing ``rate`` calls per second."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def iter_chunks(chunk_size, after_id=0, status=None, include_corrected=False):
+    """Yield lists of lightweight ticket rows ordered by id, ``chunk_size`` at a time."""
+    while True:
+        q = (select(Ticket.id, Ticket.description, Ticket.category, Ticket.priority, Ticket.confidence,
+                    Ticket.status, Ticket.created_at)
+             .where(Ticket.id > after_id).order_by(Ticket.id).limit(chunk_size))
+        if status:
+            q = q.where(Ticket.status == status)
+        if not include_corrected:
+            q = q.where(~exists().where(TicketCorrection.ticket_id == Ticket.id))
+        rows = db.session.execute(q).all()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1].id
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path) as fh:
+            return int(json.load(fh).get('last_id', 0))
+    except (OSError, ValueError):
+        return 0
+
+
+def _save_checkpoint(path, last_id):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump({'last_id': last_id, 'saved_at': utcnow().isoformat()}, fh)
+    os.replace(tmp, path)
+
+
+# Keyed on the primary key and the labels read, so a row changed since
+# (an admin correction, the background classifier) is left alone. The SET
+# columns are the remaining parameter keys.
+_UPDATE = (update(Ticket.__table__)
+           .where(Ticket.id == bindparam('_id'),
+                  Ticket.category.is_not_distinct_from(bindparam('_category')),
+                  Ticket.priority.is_not_distinct_from(bindparam('_priority'))))
+
+
+def _write(changes, transitions):
+    """Apply one chunk's changes; returns how many rows were updated."""
+    conn = db.session.connection()
+    if conn.execute(_UPDATE, changes).rowcount == len(changes):
+        stats.record(db.session, transitions)
+        return len(changes)
+    # Some rows changed under us: redo the chunk row by row so the stats
+    # only count the rows actually updated.
+    db.session.rollback()
+    conn = db.session.connection()
+    applied = [t for c, t in zip(changes, transitions) if conn.execute(_UPDATE, c).rowcount]
+    stats.record(db.session, applied)
+    return len(applied)
+
+
+def reclassify(chunk_size=500, concurrency=8, rate=None, dry_run=False,
+               checkpoint=None, status=None, include_corrected=False, echo=print):
+    """Re-run classification over stored tickets. Returns (seen, changed)."""
+    after_id = _load_checkpoint(checkpoint) if checkpoint else 0
+    if after_id:
+        echo(f'Resuming after ticket #{after_id}')
+    budget = RateBudget(rate)
+
+    def answer(text):
+        budget.acquire()
+        # No deadline: wait for the model rather than take a heuristic
+        # stand-in that nothing would replace later.
+        return classify(text, deadline=None)
+
+    seen = changed = skipped = 0
+    # Checkpoint low-water mark: the id just before the first skipped
+    # ticket, so a resumed run classifies it again. Tickets after it that
+    # were already done cost a cache hit on the second pass.
+    retry_after_id = None
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for rows in iter_chunks(chunk_size, after_id, status, include_corrected):
+            results = pool.map(answer, [r.description for r in rows])
+            now = utcnow()
+            changes = []
+            transitions = []
+            for row, (result, path) in zip(rows, results):
+                if path not in MODEL_PATHS:
+                    skipped += 1
+                    if retry_after_id is None:
+                        retry_after_id = row.id - 1
+                    continue
+                new = (result['category'], result['priority'])
+                if new == (row.category, row.priority):
+                    continue
+                changes.append({'_id': row.id, '_category': row.category, '_priority': row.priority,
+                                'category': new[0], 'priority': new[1], 'confidence': result['confidence'],
+                                'label_source': LABEL_SOURCES[path], 'updated_at': now})
+                transitions.append((stats.key(row.created_at, row.category, row.priority, row.status),
+                                    stats.key(row.created_at, new[0], new[1], row.status)))
+                if dry_run:
+                    echo(f'#{row.id}: {row.category}/{row.priority} -> {new[0]}/{new[1]}')
+            if changes and not dry_run:
+                # Executemany UPDATE, one transaction per chunk.
+                changed += _write(changes, transitions)
+                db.session.commit()
+            else:
+                changed += len(changes)
+                db.session.rollback()
+            seen += len(rows)
+            if checkpoint and not dry_run:
+                _save_checkpoint(checkpoint, rows[-1].id if retry_after_id is None else retry_after_id)
+            echo(f'{seen} tickets processed, {changed} {"would change" if dry_run else "changed"}, '
+                 f'{skipped} skipped (no model answer)')
+    if checkpoint and not dry_run and os.path.exists(checkpoint):
+        if retry_after_id is None:
+            os.remove(checkpoint)
+        else:
+            echo(f'{skipped} tickets got no model answer; run again to retry from ticket #{retry_after_id + 1}')
+    return seen, changed
+
+
+@click.command('reclassify')
+@click.option('--chunk-size', default=500, show_default=True, help='Tickets read and written per batch.')
+@click.option('--concurrency', default=8, show_default=True, help='Concurrent classifier calls.')
+@click.option('--rate', type=float, default=None, help='Max classifier calls per second (default: unlimited).')
+@click.option('--status', default=None, help='Only tickets with this status (e.g. Open).')
+@click.option('--dry-run', is_flag=True, help='Print the changes without writing them.')
+@click.option('--checkpoint', default='reclassify.checkpoint.json', show_default=True,
+              help='Progress file used to resume an interrupted run.')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint and start from the first ticket.')
+@click.option('--include-corrected', is_flag=True, help='Also re-label tickets an admin has corrected.')
+@with_appcontext
+def reclassify_command(chunk_size, concurrency, rate, status, dry_run, checkpoint, restart, include_corrected):
+    """Re-run classification over existing tickets."""
+    if restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    seen, changed = reclassify(chunk_size=chunk_size, concurrency=concurrency, rate=rate,
+                               dry_run=dry_run, checkpoint=checkpoint, status=status,
+                               include_corrected=include_corrected, echo=click.echo)
+    verb = 'would change' if dry_run else 'changed'
+    click.echo(f'Done: {seen} tickets checked, {changed} {verb}.')
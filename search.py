@@ -0,0 +1,320 @@
+"""Ranked full-text search over tickets, corrections and fixed issues.
+
+On SQLite the text columns are indexed by FTS5 tables that use the base
+tables as external content (the text is not stored twice) and are kept in
+sync by triggers, so every write path, ORM or Core, is covered:
+
+* ``tickets_fts``: ticket title and description
+* ``ticket_corrections_fts``: correction notes (hits rank their ticket)
+* ``fixed_issues_fts``: fixed-issue title, description and notes
+* ``ticket_archive_fts``: archived tickets' title, description and
+  correction notes. The archive stores its text compressed, so this index is
+  contentless (it keeps no copy of the text) and is written by the archive
+  job rather than by triggers; matches are listed newest first.
+
+Matching is an AND of the query's words (porter-stemmed, so "sync" finds
+"syncing"). Only the newest ``SEARCH_RANK_WINDOW`` matches of each index are
+ranked: FTS5 walks its posting lists newest-first, so finding them costs
+about the same whatever the table size. Selective queries are unaffected;
+very common ones rank the recent past, which is what a helpdesk search is
+usually after. Older matches are not dropped: once the ranked ones run out,
+later pages list them unranked, newest first. Pages stop at ``MAX_PAGE``;
+a page that stops there with more matches left is marked ``truncated``.
+
+Ranking is BM25-style (term-frequency saturation, length normalization,
+titles weighted above body text) but computed here from ``highlight()``
+output rather than with FTS5's ``bm25()``. That function derives IDF by
+walking each term's entire posting list on every query, which costs tens of
+milliseconds for a word present in most of a million tickets. Since every
+candidate contains every query term, IDF would only re-weight terms against
+each other.
+
+Other databases, or SQLite builds without FTS5, fall back to an unranked,
+newest-first ``LIKE`` scan.
+"""
+import os
+import re
+
+from sqlalchemy import and_, column, func, or_, select, table, text
+
+from models import db, Ticket, TicketCorrection, FixedIssue, ArchivedTicket
+
+MAX_TERMS = 8
+RANK_WINDOW = int(os.environ.get('SEARCH_RANK_WINDOW', 500))
+# Deep pages of a LIKE fallback cost an ever larger OFFSET; refine instead.
+MAX_PAGE = 50
+
+# BM25 parameters.
+K1 = 1.2
+B = 0.75
+
+_TERM_RE = re.compile(r'(\w+)(\*?)', re.UNICODE)
+# highlight() markers; counting them gives per-column term frequencies.
+_OPEN, _CLOSE = '\x01', '\x02'
+
+# fts table -> (content table, {indexed column: rank weight})
+_FTS_TABLES = {
+    'tickets_fts': ('tickets', {'title': 3.0, 'description': 1.0}),
+    'ticket_corrections_fts': ('ticket_corrections', {'notes': 1.0}),
+    'fixed_issues_fts': ('fixed_issues', {'title': 3.0, 'description': 1.0, 'notes': 1.0}),
+}
+
+ARCHIVE_FTS = 'ticket_archive_fts'
+_ARCHIVE_COLUMNS = ('title', 'description', 'notes')
+
+# Lightweight table constructs; the column named after the table is FTS5's
+# hidden column used with MATCH and the auxiliary functions.
+_FTS = {name: table(name, column('rowid'), column(name)) for name in _FTS_TABLES}
+
+
+def _fts_ddl(name, content, columns):
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{c}' for c in columns)
+    old = ', '.join(f'old.{c}' for c in columns)
+    delete = f"INSERT INTO {name}({name}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert = f'INSERT INTO {name}(rowid, {cols}) VALUES (new.id, {new});'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5({cols}, content='{content}', "
+        f"content_rowid='id', tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')",
+        f'CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON {content} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {name}_ad AFTER DELETE ON {content} BEGIN {delete} END',
+        # Only re-index when indexed text changes, not on status/category edits.
+        f'CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF {cols} ON {content} '
+        f'BEGIN {delete} {insert} END',
+        f"INSERT INTO {name}({name}) VALUES ('rebuild')",
+    ]
+
+
+def _has_fts5(conn):
+    if conn.dialect.name != 'sqlite':
+        return False
+    # Probe inside a savepoint: SQLite builds without FTS5 reject the DDL.
+    try:
+        with conn.begin_nested():
+            conn.execute(text('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)'))
+            conn.execute(text('DROP TABLE temp.fts5_probe'))
+    except Exception:
+        return False
+    return True
+
+
+def install(conn):
+    """Create (or rebuild) the FTS tables and triggers. No-op off SQLite."""
+    if not _has_fts5(conn):
+        return False
+    for name, (content, weights) in _FTS_TABLES.items():
+        for stmt in _fts_ddl(name, content, weights):
+            conn.execute(text(stmt))
+    return True
+
+
+def install_archive(conn):
+    """Create the contentless archive index. No-op off SQLite."""
+    if not _has_fts5(conn):
+        return False
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {ARCHIVE_FTS} USING fts5({', '.join(_ARCHIVE_COLUMNS)}, "
+        "content='', tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')"))
+    return True
+
+
+def _fts_enabled(session, name='tickets_fts'):
+    return session.get_bind().dialect.name == 'sqlite' and session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {'name': name}).first() is not None
+
+
+def index_archived(session, rows):
+    """Add ``(ticket id, title, description, notes)`` rows to the archive
+    index, in the caller's transaction."""
+    if rows and _fts_enabled(session, ARCHIVE_FTS):
+        session.execute(
+            text(f"INSERT INTO {ARCHIVE_FTS}(rowid, {', '.join(_ARCHIVE_COLUMNS)}) "
+                 "VALUES (:id, :title, :description, :notes)"),
+            [dict(zip(('id',) + _ARCHIVE_COLUMNS, row)) for row in rows])
+
+
+def match_query(query):
+    """Turn free text into a safe FTS5 query (an AND of quoted terms), or
+    None if it has no terms. A trailing ``*`` on a word (``outl*``) keeps it
+    as a prefix search; prefixes are opt-in because expanding one over a
+    common word merges its whole posting list."""
+    terms = _TERM_RE.findall(query.lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{word}"{star}' for word, star in terms)
+
+
+class SearchPage:
+    """One page of ranked results. ``truncated``: more matches exist than
+    ``MAX_PAGE`` pages can show."""
+
+    def __init__(self, items, page, has_next, truncated=False):
+        self.items = items
+        self.page = page
+        self.has_next = has_next
+        self.truncated = truncated
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+
+def _ranked_hits(name, q, key=None, content=None, criteria=()):
+    """Score the newest ``RANK_WINDOW`` matches of ``q`` in FTS table ``name``.
+
+    Returns ``({key: score}, older)``; ``key`` defaults to the FTS rowid.
+    ``content`` is the mapped class to join (by id) for ``key`` or
+    ``criteria``. ``older`` selects the keys of the matches left out of the
+    window (aliased ``id``), or is None if the window held them all.
+    """
+    fts = _FTS[name]
+    weights = list(_FTS_TABLES[name][1].values())
+    match = fts.c[name].op('MATCH')(q)
+
+    def restrict(stmt):
+        if content is not None:
+            stmt = stmt.join(content, content.id == fts.c.rowid).where(*criteria)
+        return stmt
+
+    newest = (restrict(select(fts.c.rowid).select_from(fts).where(match))
+              .order_by(fts.c.rowid.desc()).limit(RANK_WINDOW).subquery())
+    floor = select(func.min(newest.c.rowid)).scalar_subquery()
+    marked = [func.highlight(fts.c[name], i, _OPEN, _CLOSE) for i in range(len(weights))]
+    rows = db.session.execute(
+        restrict(select(fts.c.rowid if key is None else key, fts.c.rowid, *marked).select_from(fts))
+        .where(match, fts.c.rowid >= floor)
+    ).all()
+    if not rows:
+        return {}, None
+    older = None
+    if len(rows) >= RANK_WINDOW:
+        oldest = min(row[1] for row in rows)
+        older = (restrict(select((fts.c.rowid if key is None else key).label('id')).select_from(fts))
+                 .where(match, fts.c.rowid < oldest))
+    rows = [(row[0], *row[2:]) for row in rows]
+
+    # Column lengths in tokens, approximated by whitespace splitting.
+    lengths = [[len(text.split()) if text else 0 for text in row[1:]] for row in rows]
+    avg = [max(1.0, sum(col) / len(rows)) for col in zip(*lengths)]
+    scores = {}
+    for row, row_lengths in zip(rows, lengths):
+        score = 0.0
+        for text, length, weight, mean in zip(row[1:], row_lengths, weights, avg):
+            tf = text.count(_OPEN) if text else 0
+            if tf:
+                score += weight * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / mean))
+        scores[row[0]] = max(score, scores.get(row[0], 0.0))
+    return scores, older
+
+
+def _rank(scores, older, page, per_page):
+    """Keys for ``page``: ``scores`` best first, newest breaking ties, then
+    the unranked ``older`` selects (see :func:`_ranked_hits`) newest first.
+    Returns ``(keys, has_next, truncated)``."""
+    ranked = sorted(scores, key=lambda k: (-scores[k], -k))
+    start = (page - 1) * per_page
+    keys = ranked[start:start + per_page + 1]
+    older = [s for s in older if s is not None]
+    if len(keys) <= per_page and older:
+        rest = older[0].union(*older[1:]).subquery()
+        keys += db.session.execute(
+            select(rest.c.id).where(rest.c.id.not_in(ranked)).order_by(rest.c.id.desc())
+            .limit(per_page + 1 - len(keys)).offset(max(0, start - len(ranked)))
+        ).scalars().all()
+    more = len(keys) > per_page
+    return keys[:per_page], more and page < MAX_PAGE, more and page >= MAX_PAGE
+
+
+def _like_all(terms, *columns):
+    """Fallback criterion: every term occurs in at least one of ``columns``."""
+    return and_(*[or_(*[c.icontains(t, autoescape=True) for c in columns]) for t in terms])
+
+
+def _like_page(query, order, page, per_page):
+    rows = query.order_by(*order).limit(per_page + 1).offset((page - 1) * per_page).all()
+    return rows[:per_page], len(rows) > per_page and page < MAX_PAGE
+
+
+def _words(query):
+    return [word for word, _ in _TERM_RE.findall(query.lower())[:MAX_TERMS]]
+
+
+def search_tickets(query, page=1, per_page=15):
+    """Tickets matching ``query`` in their text or any correction note."""
+    page = max(1, min(page, MAX_PAGE))
+    q = match_query(query)
+    if q is None:
+        return SearchPage([], page, False)
+    truncated = False
+    if _fts_enabled(db.session):
+        scores, older = _ranked_hits('tickets_fts', q)
+        notes, older_notes = _ranked_hits('ticket_corrections_fts', q, key=TicketCorrection.ticket_id,
+                                          content=TicketCorrection)
+        for ticket_id, score in notes.items():
+            scores[ticket_id] = max(score, scores.get(ticket_id, 0.0))
+        ids, has_next, truncated = _rank(scores, [older, older_notes], page, per_page)
+        by_id = {t.id: t for t in Ticket.query.filter(Ticket.id.in_(ids))}
+        items = [by_id[i] for i in ids if i in by_id]
+    else:
+        items, has_next = _like_page(
+            Ticket.query.filter(_like_all(_words(query), Ticket.title, Ticket.description)),
+            (Ticket.created_at.desc(), Ticket.id.desc()), page, per_page)
+    return SearchPage(items, page, has_next, truncated)
+
+
+def search_fixed_issues(query, criteria=(), page=1, per_page=15):
+    """Fixed issues matching ``query``, narrowed by extra SQL ``criteria``."""
+    page = max(1, min(page, MAX_PAGE))
+    q = match_query(query)
+    if q is None:
+        return SearchPage([], page, False)
+    truncated = False
+    if _fts_enabled(db.session):
+        # Criteria are applied before the window, so filters never hide
+        # older matches behind newer, filtered-out ones.
+        scores, older = _ranked_hits('fixed_issues_fts', q, content=FixedIssue, criteria=list(criteria))
+        ids, has_next, truncated = _rank(scores, [older], page, per_page)
+        by_id = {f.id: f for f in FixedIssue.query.filter(FixedIssue.id.in_(ids))}
+        items = [by_id[i] for i in ids if i in by_id]
+    else:
+        items, has_next = _like_page(
+            FixedIssue.query.filter(
+                _like_all(_words(query), FixedIssue.title, FixedIssue.description, FixedIssue.notes),
+                *criteria),
+            (FixedIssue.fixed_at.desc(), FixedIssue.id.desc()), page, per_page)
+    return SearchPage(items, page, has_next, truncated)
+
+
+def search_archive(query, page=1, per_page=15):
+    """Archived tickets matching ``query``, newest first.
+
+    Without FTS5 only titles are searched: archived descriptions are
+    compressed and cannot be matched in SQL.
+    """
+    page = max(1, min(page, MAX_PAGE))
+    q = match_query(query)
+    if q is None:
+        return SearchPage([], page, False)
+    if _fts_enabled(db.session, ARCHIVE_FTS):
+        fts = table(ARCHIVE_FTS, column('rowid'), column(ARCHIVE_FTS))
+        ids = db.session.execute(
+            select(fts.c.rowid).where(fts.c[ARCHIVE_FTS].op('MATCH')(q))
+            .order_by(fts.c.rowid.desc()).limit(per_page + 1).offset((page - 1) * per_page)
+        ).scalars().all()
+        has_next = len(ids) > per_page
+        by_id = {a.id: a for a in ArchivedTicket.query.filter(ArchivedTicket.id.in_(ids[:per_page]))}
+        items = [by_id[i] for i in ids[:per_page] if i in by_id]
+    else:
+        items, has_next = _like_page(
+            ArchivedTicket.query.filter(_like_all(_words(query), ArchivedTicket.title)),
+            (ArchivedTicket.id.desc(),), page, per_page)
+    # Descriptions kept only on the fixed issue: one query for the page.
+    shared = {a.id: a for a in items if a.description_z is None}
+    if shared:
+        for ticket_id, description in db.session.execute(
+            select(FixedIssue.ticket_id, FixedIssue.description)
+            .where(FixedIssue.ticket_id.in_(shared)).order_by(FixedIssue.id)
+        ):
+            shared[ticket_id].fixed_description = description
+    return SearchPage(items, page, has_next)
@@ -17,6 +17,75 @@
       applyTheme(next);
     });
   }
+  // "Select page" checkboxes toggle every checkbox with the named field.
+  document.querySelectorAll('[data-select-all]').forEach(box => {
+    box.addEventListener('change', ()=>{
+      const form = box.form || document;
+      form.querySelectorAll(`input[name="${box.dataset.selectAll}"]`).forEach(c => { c.checked = box.checked; });
+    });
+  });
+  // Admin dashboard: apply ticket deltas from /admin/events instead of reloading.
+  const live = document.getElementById('admin-live');
+  if(live && live.dataset.liveUrl && window.EventSource){
+    const queue = document.getElementById('ticket-queue');
+    const skeleton = document.getElementById('ticket-row-template');
+    const badgeClass = {Critical: 'badge-danger', High: 'badge-warning', Medium: 'badge-info'};
+    function badge(cls, text, icon){
+      const b = document.createElement('span');
+      b.className = 'badge ' + cls;
+      if(icon){ const i = document.createElement('i'); i.className = 'fas ' + icon; b.append(i, ' '); }
+      b.append(text);
+      return b;
+    }
+    function fillLabels(row, t){
+      const labels = row.querySelector('[data-labels]');
+      const parts = t.category === null
+        ? [badge('badge-neutral', 'Classifying…', 'fa-hourglass-half')]
+        : [badge('priority-badge ' + (badgeClass[t.priority] || 'badge-success'), t.priority || ''),
+           badge('badge-neutral', t.category)];
+      if(t.duplicate_of) parts.push(badge('badge-neutral', '#' + t.duplicate_of, 'fa-layer-group'));
+      if(t.status === 'Fixed') parts.push(badge('badge-success', 'Fixed', 'fa-circle-check'));
+      const when = document.createElement('small');
+      when.innerHTML = '<i class="fas fa-calendar"></i> ';
+      when.append(t.created_at);
+      labels.replaceChildren(...parts, when);
+      row.dataset.priority = t.priority || '';
+      row.classList.toggle('is-fixed', t.status === 'Fixed');
+      const markFixed = row.querySelector('[data-mark-fixed]');
+      if(markFixed) markFixed.hidden = t.status === 'Fixed';
+    }
+    function addRow(t){
+      const row = skeleton.content.firstElementChild.cloneNode(true);
+      row.dataset.ticketId = t.id;
+      row.querySelector('input[name="ticket_ids"]').value = t.id;
+      row.querySelector('[data-field="title"]').textContent = t.title;
+      row.querySelector('[data-field="description"]').textContent = t.description;
+      row.querySelectorAll('[data-href]').forEach(a => { a.href = a.dataset.href.replace('{id}', t.id); });
+      fillLabels(row, t);
+      queue.prepend(row);
+      const limit = Number(live.dataset.liveLimit);
+      if(limit && queue.children.length > limit) queue.lastElementChild.remove();
+    }
+    function bump(stat){
+      const el = live.querySelector(`[data-stat="${stat}"] h3`);
+      if(el) el.textContent = Number(el.textContent) + 1;
+    }
+    const source = new EventSource(live.dataset.liveUrl);
+    source.onmessage = (e)=>{
+      const t = JSON.parse(e.data);
+      if(!t.title) return;  // archived since
+      const row = queue && queue.querySelector(`[data-ticket-id="${t.id}"]`);
+      if(t.kind === 'new'){
+        bump('total'); bump('today');
+        if(!queue) location.reload();
+        else if(!row && live.dataset.livePrepend === '1') addRow(t);
+      }else if(row){
+        fillLabels(row, t);
+      }
+    };
+    // The server lost track of this page (it fell too far behind).
+    source.addEventListener('reload', ()=>{ source.close(); location.reload(); });
+  }
   // Move server-rendered alerts into the toast container and auto-dismiss
   function initToasts(){
     const container = document.getElementById('toast-container');
@@ -0,0 +1,210 @@
+"""Incrementally maintained ticket statistics.
+
+The dashboard used to count tickets per request. Instead, ``ticket_stats``
+holds one row per ``(created day, category, priority, status)`` with a
+count, and every ticket insert, edit, completion or delete adjusts the
+affected rows in the same transaction. Archived tickets (see
+:mod:`archive`) keep counting; each row also says how many of its tickets
+are ``archived``, for the ticket lists, which no longer show them.
+Dashboard reads then aggregate a few hundred rollup rows rather than
+scanning ``tickets``.
+
+ORM changes are tracked automatically by a ``before_flush`` hook. Code that
+changes tickets with Core ``UPDATE`` statements (the classification queue,
+bulk reclassify) bypasses the ORM and must call :func:`record` itself.
+Should the rollup ever drift (manual SQL, restored backups), recompute it
+with::
+
+    flask --app app:create_app rebuild-stats
+"""
+from collections import Counter
+from datetime import timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, delete, event, func, insert, inspect, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Ticket, ArchivedTicket, TicketStat, utcnow
+
+_TRACKED = ('created_at', 'category', 'priority', 'status')
+_UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def key(created_at, category, priority, status):
+    """Rollup row key for a ticket with these values."""
+    return ((created_at or utcnow()).date(), category or '', priority or '', status or 'Open')
+
+
+def record(session, transitions):
+    """Apply ``(old_key, new_key)`` transitions to the rollup.
+
+    ``old_key`` is None for an inserted ticket and ``new_key`` is None for a
+    deleted one. Runs on ``session``'s connection, so it commits or rolls
+    back together with the ticket change.
+    """
+    deltas = Counter()
+    for old, new in transitions:
+        if old == new:
+            continue
+        if old is not None:
+            deltas[old] -= 1
+        if new is not None:
+            deltas[new] += 1
+    rows = [dict(day=k[0], category=k[1], priority=k[2], status=k[3], count=n)
+            for k, n in deltas.items() if n]
+    if not rows:
+        return
+    conn = session.connection()
+    upsert = _UPSERT_DIALECTS.get(conn.dialect.name)
+    if upsert is not None:
+        stmt = upsert(TicketStat)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=['day', 'category', 'priority', 'status'],
+            set_={'count': TicketStat.count + stmt.excluded['count']},
+        ), rows)
+        return
+    for row in rows:
+        result = conn.execute(
+            update(TicketStat)
+            .where(TicketStat.day == row['day'], TicketStat.category == row['category'],
+                   TicketStat.priority == row['priority'], TicketStat.status == row['status'])
+            .values(count=TicketStat.count + row['count'])
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(TicketStat).values(**row))
+
+
+def record_archived(session, keys):
+    """Mark one archived ticket per rollup ``key`` (repeat a key for
+    several). The tickets keep counting in ``count``."""
+    counts = Counter(keys)
+    if not counts:
+        return
+    session.connection().execute(
+        update(TicketStat)
+        .where(TicketStat.day == bindparam('_day'), TicketStat.category == bindparam('_category'),
+               TicketStat.priority == bindparam('_priority'), TicketStat.status == bindparam('_status'))
+        .values(archived=TicketStat.archived + bindparam('_n')),
+        [dict(_day=k[0], _category=k[1], _priority=k[2], _status=k[3], _n=n) for k, n in counts.items()])
+
+
+def _old_key(ticket):
+    state = inspect(ticket)
+    values = []
+    for name in _TRACKED:
+        history = state.attrs[name].history
+        if history.deleted:
+            values.append(history.deleted[0])
+        elif history.unchanged:
+            values.append(history.unchanged[0])
+        else:
+            values.append(getattr(ticket, name))
+    return key(*values)
+
+
+def _new_key(ticket):
+    return key(*(getattr(ticket, name) for name in _TRACKED))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _track_ticket_changes(session, flush_context, instances):
+    transitions = []
+    for obj in session.new:
+        if isinstance(obj, Ticket):
+            # Pin the column defaults now so the rollup day matches the row.
+            if obj.created_at is None:
+                obj.created_at = utcnow()
+            if obj.status is None:
+                obj.status = 'Open'
+            transitions.append((None, _new_key(obj)))
+    for obj in session.dirty:
+        if isinstance(obj, Ticket) and session.is_modified(obj):
+            transitions.append((_old_key(obj), _new_key(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Ticket):
+            transitions.append((_old_key(obj), None))
+    record(session, transitions)
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Load the previous value when a tracked attribute is overwritten on an
+# expired instance, so _old_key never has to guess.
+for _name in _TRACKED:
+    event.listen(getattr(Ticket, _name), 'set', _keep_old_value, active_history=True, retval=True)
+
+
+def rebuild(session):
+    """Recompute the whole rollup from ``tickets`` and the ticket archive
+    (one grouped scan)."""
+    columns = ('created_at', 'category', 'priority', 'status')
+    rows = union_all(*(select(*(getattr(model, c) for c in columns), literal(flag).label('archived'))
+                       for model, flag in ((Ticket, 0), (ArchivedTicket, 1)))).subquery()
+    day = func.date(rows.c.created_at)
+    category = func.coalesce(rows.c.category, '')
+    priority = func.coalesce(rows.c.priority, '')
+    session.execute(delete(TicketStat))
+    session.execute(insert(TicketStat).from_select(
+        ['day', 'category', 'priority', 'status', 'count', 'archived'],
+        select(day, category, priority, rows.c.status, func.count(), func.sum(rows.c.archived))
+        .group_by(day, category, priority, rows.c.status),
+    ))
+
+
+def summary(days=14, today=None):
+    """Dashboard figures, read from the rollup only."""
+    today = today or utcnow().date()
+    first = today - timedelta(days=days - 1)
+    by_status, archived = {}, 0
+    for status, count, status_archived in db.session.execute(
+        select(TicketStat.status, func.sum(TicketStat.count), func.sum(TicketStat.archived))
+        .group_by(TicketStat.status)
+    ):
+        by_status[status] = count
+        archived += status_archived or 0
+    open_by_priority = dict(db.session.execute(
+        select(TicketStat.priority, func.sum(TicketStat.count))
+        .where(TicketStat.status == 'Open').group_by(TicketStat.priority)
+    ).all())
+    by_category = dict(db.session.execute(
+        select(TicketStat.category, func.sum(TicketStat.count)).group_by(TicketStat.category)
+    ).all())
+    per_day = dict(db.session.execute(
+        select(TicketStat.day, func.sum(TicketStat.count))
+        .where(TicketStat.day >= first).group_by(TicketStat.day)
+    ).all())
+    return {
+        # All tickets ever, archived included; ``live`` is what the ticket
+        # lists can still show.
+        'total': sum(by_status.values()),
+        'live': sum(by_status.values()) - archived,
+        'today': per_day.get(today, 0),
+        'by_status': {k: v for k, v in by_status.items() if v},
+        'open_by_priority': {k or 'unclassified': v for k, v in open_by_priority.items() if v},
+        'by_category': {k or 'unclassified': v for k, v in by_category.items() if v},
+        'daily': [{'day': (first + timedelta(days=i)).isoformat(),
+                   'count': per_day.get(first + timedelta(days=i), 0)} for i in range(days)],
+    }
+
+
+def total():
+    """Number of tickets, archived ones included, from the rollup."""
+    return db.session.execute(select(func.coalesce(func.sum(TicketStat.count), 0))).scalar()
+
+
+def live_total():
+    """Number of tickets not archived (the ticket lists' row count)."""
+    return db.session.execute(
+        select(func.coalesce(func.sum(TicketStat.count - TicketStat.archived), 0))).scalar()
+
+
+@click.command('rebuild-stats')
+@with_appcontext
+def rebuild_command():
+    """Recompute the ticket statistics rollup from the tickets table."""
+    rebuild(db.session)
+    db.session.commit()
+    click.echo(f'Rebuilt ticket statistics for {total()} tickets.')
@@ -102,3 +102,24 @@ def test_csv_export_requires_login(client):
     resp = client.get('/admin/fixed-issues/export.csv')
     assert resp.status_code == 302
     assert '/admin/login' in resp.headers['Location']
+
+
+def test_csv_export_filters_and_gzip(app, client):
+    import gzip
+    networking = _make_ticket(app, title='VPN outage', category='networking')
+    hardware = _make_ticket(app, title='Dead mouse', category='hardware')
+    _login(client)
+    for tid in (networking, hardware):
+        client.post(f'/admin/ticket/{tid}/complete', data={'fixed_by': 'tester'})
+
+    body = client.get('/admin/fixed-issues/export.csv?category=networking').get_data(as_text=True)
+    assert 'VPN outage' in body and 'Dead mouse' not in body
+
+    resp = client.get('/admin/fixed-issues/export.csv?gzip=1&since=2000-01-01')
+    assert resp.headers['Content-Type'] == 'application/gzip'
+    text = gzip.decompress(resp.get_data()).decode()
+    assert text.splitlines()[0].startswith('id,ticket_id')
+    assert 'VPN outage' in text and 'Dead mouse' in text
+
+    body = client.get('/admin/fixed-issues/export.csv?until=2000-01-01').get_data(as_text=True)
+    assert body.strip().count('\n') == 0  # header only
@@ -0,0 +1,152 @@
+"""Tests for the token-authenticated JSON API and NDJSON bulk ingestion."""
+import json
+
+import pytest
+
+import api
+import jobs
+from app import create_app
+from models import db, Ticket, ClassificationJob
+
+TOKEN = 'test-token'
+AUTH = {'Authorization': f'Bearer {TOKEN}'}
+OUTAGE = ('Since this morning Outlook will not connect to the mail server and keeps asking '
+          'for my password, nobody on the {} floor can send or receive email')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.setenv('API_TOKENS', f'other, {TOKEN}')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.setenv('LOCAL_MODEL_PATH', '')
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _ndjson(*objs):
+    return '\n'.join(o if isinstance(o, str) else json.dumps(o) for o in objs) + '\n'
+
+
+def test_requires_a_valid_token(client, monkeypatch):
+    assert client.get('/api/tickets').status_code == 401
+    assert client.get('/api/tickets', headers={'Authorization': 'Bearer nope'}).status_code == 401
+    assert client.get('/api/tickets', headers=AUTH).status_code == 200
+    monkeypatch.setenv('API_TOKENS', '')
+    assert client.get('/api/tickets', headers=AUTH).status_code == 401
+
+
+def test_rate_limit_key_trusts_only_valid_tokens(app):
+    for header, key in (('Bearer test-token', 'api:token:test-token'),
+                        ('Bearer made-up-1', 'api:addr:10.0.0.9'),
+                        ('Bearer made-up-2', 'api:addr:10.0.0.9'),
+                        ('', 'api:addr:10.0.0.9')):
+        with app.test_request_context('/api/tickets', headers={'Authorization': header},
+                                      environ_base={'REMOTE_ADDR': '10.0.0.9'}):
+            assert api.rate_limit_key() == key
+
+
+def test_create_get_and_list(client):
+    resp = client.post('/api/tickets', json={'title': 'VPN', 'description': 'VPN drops every hour'}, headers=AUTH)
+    assert resp.status_code == 201
+    created = resp.get_json()
+    assert created['pending_classification'] and resp.headers['Location'] == f'/api/tickets/{created["id"]}'
+
+    assert client.get(resp.headers['Location'], headers=AUTH).get_json()['title'] == 'VPN'
+    assert client.get('/api/tickets/999', headers=AUTH).status_code == 404
+
+    client.post('/api/tickets', json={'description': 'Printer jammed'}, headers=AUTH)
+    page = client.get('/api/tickets?limit=1', headers=AUTH).get_json()
+    assert [t['title'] for t in page['items']] == ['Printer jammed...']
+    rest = client.get(f'/api/tickets?limit=1&after={page["next_cursor"]}', headers=AUTH).get_json()
+    assert [t['id'] for t in rest['items']] == [created['id']]
+
+
+def test_create_validates_like_the_form(client):
+    for body in ({'title': 'x'}, {'description': '   '}, {'description': 'x' * 5001},
+                 {'description': 7}, ['not', 'an', 'object']):
+        resp = client.post('/api/tickets', json=body, headers=AUTH)
+        assert resp.status_code == 400 and resp.get_json()['error']
+
+
+def test_bulk_ingest_batches_and_reports_bad_lines(client, app, monkeypatch):
+    monkeypatch.setattr(api, 'BULK_BATCH', 2)
+    body = _ndjson({'title': 'Disk', 'description': 'Disk full on build agent'},
+                   '{not json',
+                   {'title': 'Printer', 'description': ''},
+                   '',
+                   {'description': 'Monitor flickers in room 4'},
+                   {'description': 'Cannot log in to the wiki'})
+    resp = client.post('/api/tickets/bulk', data=body, headers=AUTH, content_type='application/x-ndjson')
+    result = resp.get_json()
+    assert resp.status_code == 200 and result['created'] == 3 and len(result['ids']) == 3
+    assert [e['line'] for e in result['errors']] == [2, 3]
+    with app.app_context():
+        assert Ticket.query.count() == 3
+        assert ClassificationJob.query.count() == 3
+
+
+def test_bulk_duplicates_share_one_classification(client, app, monkeypatch):
+    calls = []
+    real = jobs.classify
+    monkeypatch.setattr(jobs, 'classify', lambda text, **kw: calls.append(text) or real(text, **kw))
+    floors = ['first', 'second', 'third', 'fourth', 'fifth']
+    body = _ndjson(*[{'description': OUTAGE.format(f)} for f in floors],
+                   {'description': 'The large printer next to the kitchen is showing a paper jam error '
+                                   'even though every tray is empty'})
+    result = client.post('/api/tickets/bulk', data=body, headers=AUTH).get_json()
+    assert result['created'] == 6 and result['grouped'] == 4
+    with app.app_context():
+        root_id = result['ids'][0]
+        assert ClassificationJob.query.count() == 2
+        assert jobs.run_pending() == 2
+        tickets = Ticket.query.filter(Ticket.id.in_(result['ids'][:5])).all()
+        assert all(t.category == tickets[0].category and not t.pending_classification for t in tickets)
+        assert {t.duplicate_of for t in tickets} == {None, root_id}
+    assert len(calls) == 2
+
+    # A later batch joins the now-classified incident without any job.
+    more = client.post('/api/tickets/bulk', data=_ndjson({'description': OUTAGE.format('sixth')}),
+                       headers=AUTH).get_json()
+    with app.app_context():
+        ticket = db.session.get(Ticket, more['ids'][0])
+        assert ticket.duplicate_of == root_id and not ticket.pending_classification
+        assert ClassificationJob.query.count() == 2
+
+
+def test_duplicates_get_own_jobs_when_the_root_job_fails(client, app, monkeypatch):
+    monkeypatch.setattr(jobs, 'MAX_ATTEMPTS', 1)
+    monkeypatch.setattr(jobs, 'classify', lambda text, **kw: 1 / 0)
+    body = _ndjson(*[{'description': OUTAGE.format(f)} for f in ('first', 'second', 'third')])
+    ids = client.post('/api/tickets/bulk', data=body, headers=AUTH).get_json()['ids']
+    with app.app_context():
+        assert jobs.run_pending(limit=1) == 1
+        queued = ClassificationJob.query.filter_by(status='queued').all()
+        assert sorted(j.ticket_id for j in queued) == ids[1:]
+
+
+def test_new_duplicates_of_a_failed_root_get_their_own_jobs(client, app, monkeypatch):
+    monkeypatch.setattr(jobs, 'MAX_ATTEMPTS', 1)
+    monkeypatch.setattr(jobs, 'classify', lambda text, **kw: 1 / 0)
+    root = client.post('/api/tickets', json={'description': OUTAGE.format('first')},
+                       headers=AUTH).get_json()['id']
+    with app.app_context():
+        assert jobs.run_pending() == 1
+        assert db.session.get(Ticket, root).pending_classification
+
+    # The root stays unclassified with no live job; nothing would hand labels down.
+    one = client.post('/api/tickets', json={'description': OUTAGE.format('second')},
+                      headers=AUTH).get_json()['id']
+    body = _ndjson(*[{'description': OUTAGE.format(f)} for f in ('third', 'fourth')])
+    batch = client.post('/api/tickets/bulk', data=body, headers=AUTH).get_json()['ids']
+    with app.app_context():
+        assert {t.duplicate_of for t in Ticket.query.filter(Ticket.id.in_([one, *batch]))} == {root}
+        queued = ClassificationJob.query.filter_by(status='queued').all()
+        assert sorted(j.ticket_id for j in queued) == [one, *batch]
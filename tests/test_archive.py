@@ -0,0 +1,106 @@
+"""Tests for archiving old fixed tickets."""
+from datetime import timedelta
+
+import pytest
+
+import archive
+import bulk
+import stats
+from app import create_app
+from models import db, Ticket, TicketCorrection, FixedIssue, ArchivedTicket, utcnow
+
+LONG = 'The shared drive mapping fails after every reboot on the finance laptops. ' * 20
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+def _fixed_ticket(description, days_ago, notes=None):
+    """A completed ticket with one correction, last changed ``days_ago``."""
+    ticket = Ticket(title='Drive mapping', description=description, category='software',
+                    priority='Medium', confidence=0.8, status='Open')
+    db.session.add(ticket)
+    db.session.commit()
+    db.session.add(TicketCorrection(ticket_id=ticket.id, old_category='software', new_category='networking',
+                                    old_priority='Medium', new_priority='High', corrected_by='sam', notes=notes))
+    ticket.category, ticket.priority = 'networking', 'High'
+    db.session.commit()
+    bulk.complete([ticket.id], notes='remapped drives')
+    ticket = db.session.get(Ticket, ticket.id)
+    ticket.updated_at = utcnow() - timedelta(days=days_ago)
+    db.session.commit()
+    return ticket.id
+
+
+def test_archives_old_fixed_tickets_with_history(app, monkeypatch):
+    with app.app_context():
+        old = _fixed_ticket(LONG, 100, notes='GPO drive map was stale')
+        recent = _fixed_ticket('Recent fix', 5)
+        db.session.add(Ticket(title='Open', description='Still broken', status='Open',
+                              updated_at=utcnow() - timedelta(days=200)))
+        db.session.commit()
+        before = stats.summary()
+
+        assert archive.archive_fixed(days=90, dry_run=True, echo=lambda _: None) == 1
+        assert db.session.get(Ticket, old) is not None
+        assert archive.archive_fixed(days=90, echo=lambda _: None) == 1
+
+        assert db.session.get(Ticket, old) is None and db.session.get(Ticket, recent) is not None
+        assert TicketCorrection.query.filter_by(ticket_id=old).count() == 0
+        archived = db.session.get(ArchivedTicket, old)
+        # The fixed issue already holds the description, so it is not stored again.
+        assert archived.description_z is None and archived.description == LONG
+        assert [(c.corrected_by, c.new_priority, c.notes) for c in archived.corrections] == [
+            ('sam', 'High', 'GPO drive map was stale')]
+        # The dashboard keeps counting it; the ticket lists no longer do.
+        after = dict(before, live=before['live'] - 1)
+        assert stats.summary() == after and stats.live_total() == stats.total() - 1
+        stats.rebuild(db.session)
+        assert stats.summary() == after
+
+    # One ticket per page so the pager (and its total) is shown.
+    monkeypatch.setenv('TICKETS_PER_PAGE', '1')
+    monkeypatch.setenv('ADMIN_TICKETS_PER_PAGE', '1')
+    client = app.test_client()
+    assert '2 total' in client.get('/tickets').get_data(as_text=True)
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+    page = client.get('/admin').get_data(as_text=True)
+    assert '2 total' in page and '<h3>3</h3>' in page
+
+
+def test_without_dedup_the_description_is_compressed(app):
+    with app.app_context():
+        tid = _fixed_ticket(LONG, 100)
+        archive.archive_fixed(days=90, dedup=False, echo=lambda _: None)
+        archived = db.session.get(ArchivedTicket, tid)
+        assert len(archived.description_z) < len(LONG) / 10
+        assert archived.description == LONG
+        assert FixedIssue.query.filter_by(ticket_id=tid).count() == 1
+
+
+def test_archived_tickets_are_viewable_and_searchable(app):
+    with app.app_context():
+        tid = _fixed_ticket(LONG, 100, notes='stale group policy')
+        archive.archive_fixed(days=90, echo=lambda _: None)
+    client = app.test_client()
+    resp = client.get(f'/ticket/{tid}')
+    assert resp.status_code == 200 and b'Archived' in resp.data and b'finance laptops' in resp.data
+    assert b'stale group policy' not in resp.data
+    assert client.get('/ticket/999').status_code == 404
+
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+    assert b'stale group policy' in client.get(f'/ticket/{tid}').data
+    for q in ('finance laptops', 'policy'):
+        resp = client.get('/admin/search', query_string={'q': q, 'scope': 'archive'})
+        assert f'/ticket/{tid}"'.encode() in resp.data
+    resp = client.get('/admin/search', query_string={'q': 'finance', 'scope': 'tickets'})
+    assert f'/ticket/{tid}"'.encode() not in resp.data
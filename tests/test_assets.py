@@ -0,0 +1,71 @@
+"""Tests for fingerprinted, precompressed static assets."""
+import gzip
+import os
+import re
+
+import pytest
+from flask import Flask
+
+import assets
+from app import create_app
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+def _css_url(client):
+    body = client.get('/submit').get_data(as_text=True)
+    return re.search(r'href="(/assets/style\.[0-9a-f]+\.css)"', body).group(1)
+
+
+def test_pages_link_fingerprinted_assets(app):
+    client = app.test_client()
+    url = _css_url(client)
+    with open(os.path.join(app.static_folder, 'style.css'), 'rb') as fh:
+        css = fh.read()
+
+    plain = client.get(url)
+    assert plain.data == css and 'Content-Encoding' not in plain.headers
+    assert plain.headers['Cache-Control'] == assets.IMMUTABLE
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    packed = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(packed.data) == css and len(packed.data) < len(css)
+    assert client.get(url, headers={'If-None-Match': packed.headers['ETag'],
+                                    'Accept-Encoding': 'gzip'}).status_code == 304
+
+    assert client.get('/assets/style.0000000000.css').status_code == 404
+
+
+def test_brotli_preferred_when_available(app):
+    pytest.importorskip('brotli')
+    client = app.test_client()
+    resp = client.get(_css_url(client), headers={'Accept-Encoding': 'gzip, br'})
+    assert resp.headers['Content-Encoding'] == 'br'
+
+
+def test_reload_rehashes_edited_files(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'site.css').write_text('body { color: red; }')
+    app = Flask(__name__, static_folder=str(static))
+    manifest = assets.init_app(app, reload=True)
+    with app.test_request_context():
+        first = manifest.url('site.css')
+        assert re.fullmatch(r'/assets/site\.[0-9a-f]+\.css', first)
+        (static / 'site.css').write_text('body { color: blue; }')
+        os.utime(static / 'site.css', (0, 0))
+        second = manifest.url('site.css')
+        assert second != first
+        assert manifest.url('missing.js') == '/static/missing.js'
+    client = app.test_client()
+    assert client.get(second).data == b'body { color: blue; }'
+    assert client.get(first).status_code == 404
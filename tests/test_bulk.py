@@ -0,0 +1,119 @@
+"""Tests for the set-based bulk admin actions."""
+import pytest
+
+import bulk
+import dedup
+import stats
+from app import create_app
+from models import db, Ticket, TicketCorrection, FixedIssue
+
+OUTAGE = 'The VPN gateway in the Berlin office rejects every login since the firmware update this morning'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as c:
+        with c.session_transaction() as sess:
+            sess['admin_logged_in'] = True
+        yield c
+
+
+def _tickets(app, n, **kwargs):
+    defaults = dict(title='T', description='desc', category='software', priority='Medium',
+                    confidence=0.5, status='Open')
+    defaults.update(kwargs)
+    with app.app_context():
+        tickets = [Ticket(**defaults) for _ in range(n)]
+        db.session.add_all(tickets)
+        db.session.commit()
+        return [t.id for t in tickets]
+
+
+def _assert_stats_consistent():
+    incremental = stats.summary()
+    stats.rebuild(db.session)
+    assert stats.summary() == incremental
+    db.session.rollback()
+
+
+def test_complete_archives_in_one_transaction(app, monkeypatch):
+    monkeypatch.setattr(bulk, 'CHUNK', 3)
+    ids = _tickets(app, 7)
+    already = _tickets(app, 1, status='Fixed')
+    with app.app_context():
+        assert bulk.complete(ids + already, fixed_by='ops', notes='outage over') == 7
+        assert Ticket.query.filter_by(status='Fixed').count() == 8
+        fixed = FixedIssue.query.order_by(FixedIssue.ticket_id).all()
+        assert [f.ticket_id for f in fixed] == ids
+        assert {(f.fixed_by, f.notes, f.category, f.status) for f in fixed} == {('ops', 'outage over', 'software', 'Fixed')}
+        assert stats.summary()['by_status'] == {'Fixed': 8}
+        _assert_stats_consistent()
+
+
+def test_completed_incident_becomes_a_known_fix(app):
+    with app.app_context():
+        root = Ticket(title='VPN', description=OUTAGE, status='Open',
+                      simhash=dedup.to_db(dedup.simhash(OUTAGE)))
+        db.session.add(root)
+        db.session.commit()
+        dedup.index.add_tickets([(root.id, root.simhash)])
+        fingerprint = dedup.simhash(OUTAGE + ' again')
+        assert dedup.index.find_incident(fingerprint).id == root.id
+
+        bulk.complete([root.id])
+        assert dedup.index.find_incident(fingerprint) is None
+        assert dedup.index.find_fix(fingerprint).ticket_id == root.id
+
+
+def test_recategorize_logs_only_real_changes(app, monkeypatch):
+    monkeypatch.setattr(bulk, 'CHUNK', 2)
+    ids = _tickets(app, 4, category='software', priority='Medium')
+    same = _tickets(app, 2, category='networking', priority='Medium')
+    pending = _tickets(app, 1, category=None, priority=None, confidence=None)
+    with app.app_context():
+        assert bulk.recategorize(ids + same + pending, category='networking', corrected_by='kim') == 5
+        corrections = TicketCorrection.query.order_by(TicketCorrection.ticket_id).all()
+        assert [c.ticket_id for c in corrections] == ids + pending
+        assert corrections[0].old_category == 'software' and corrections[0].new_category == 'networking'
+        assert corrections[0].old_priority == corrections[0].new_priority == 'Medium'
+        assert corrections[-1].old_category is None and corrections[-1].corrected_by == 'kim'
+        assert db.session.get(Ticket, pending[0]).priority is None
+
+        assert bulk.recategorize(ids, priority='High') == 4
+        assert {t.priority for t in Ticket.query.filter(Ticket.id.in_(ids))} == {'High'}
+        assert bulk.recategorize(ids) == 0
+        _assert_stats_consistent()
+
+
+def test_bulk_route_with_duplicates(app, client):
+    root = _tickets(app, 1)[0]
+    dups = _tickets(app, 3, duplicate_of=root)
+    other = _tickets(app, 1)[0]
+    assert f'name="ticket_ids" value="{root}"'.encode() in client.get('/admin').data
+    resp = client.post('/admin/tickets/bulk', data={'ticket_ids': [root, other], 'action': 'update',
+                                                    'priority': 'Critical', 'include_duplicates': '1'})
+    assert resp.status_code == 302
+    with app.app_context():
+        assert Ticket.query.filter_by(priority='Critical').count() == 5
+
+    client.post('/admin/tickets/bulk', data={'ticket_ids': [root], 'action': 'complete',
+                                             'next': '/admin?after=x'})
+    with app.app_context():
+        assert [f.ticket_id for f in FixedIssue.query] == [root]
+        assert db.session.get(Ticket, dups[0]).status == 'Open'
+
+    resp = client.post('/admin/tickets/bulk', data={'ticket_ids': [other], 'action': 'update',
+                                                    'priority': 'Urgent'}, follow_redirects=True)
+    assert b'Unknown priority' in resp.data
+    resp = client.post('/admin/tickets/bulk', data={'action': 'complete'}, follow_redirects=True)
+    assert b'Select at least one ticket' in resp.data
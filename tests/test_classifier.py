@@ -11,6 +11,8 @@ from classifier import classify_text, CATEGORIES, PRIORITY_LEVELS
 @pytest.fixture(autouse=True)
 def no_openai(monkeypatch):
     monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    # Keep results independent of any locally trained model artifact.
+    monkeypatch.setenv('LOCAL_MODEL_PATH', '')
 
 
 def test_empty_text_returns_other_low():
@@ -32,3 +34,218 @@ def test_heuristic_classification(text, expected_category, expected_priority):
     assert result['category'] in CATEGORIES
     assert result['priority'] in PRIORITY_LEVELS
     assert 0.0 <= result['confidence'] <= 1.0
+
+
+class _FakeOpenAI:
+    """Stand-in for the OpenAI client that counts completions."""
+    calls = 0
+
+    def __init__(self, **kwargs):
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        type(self).calls += 1
+        message = type('M', (), {'content': '{"category": "networking", "priority": "High", "confidence": 0.9}'})
+        return type('R', (), {'choices': [type('C', (), {'message': message})]})
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    import classifier
+    _FakeOpenAI.calls = 0
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    monkeypatch.setattr(classifier, 'OpenAI', _FakeOpenAI)
+    monkeypatch.setattr(classifier, 'cache', classifier.ClassificationCache(max_entries=16))
+    monkeypatch.setattr(classifier, 'breaker', classifier.CircuitBreaker(failures=3, cooldown=30))
+    return _FakeOpenAI
+
+
+def test_cache_serves_repeated_text_without_model_call(fake_openai):
+    import classifier
+    first = classify_text('VPN is down')
+    second = classify_text('  vpn   IS down ')
+    assert first == second == {'category': 'networking', 'priority': 'High', 'confidence': 0.9}
+    assert fake_openai.calls == 1
+    assert classifier.cache.stats()['hits'] == 1
+
+
+def test_model_input_redactions_are_counted(fake_openai):
+    import metrics
+    before = (metrics.CLASSIFY_REDACTIONS._values.get(('emails',), 0), metrics.CLASSIFY_TRUNCATED._values.get((), 0))
+    classify_text('Outlook rejects bob@example.com and amy@example.com ' + 'again ' * 1000)
+    after = (metrics.CLASSIFY_REDACTIONS._values.get(('emails',), 0), metrics.CLASSIFY_TRUNCATED._values.get((), 0))
+    assert after == (before[0] + 2, before[1] + 1)
+
+
+def test_deadline_answers_with_heuristic_and_hands_on_the_late_answer(fake_openai, monkeypatch):
+    import threading
+    import classifier
+    release, arrived, late = threading.Event(), threading.Event(), []
+    create = fake_openai.create
+
+    def slow_create(self, **kwargs):
+        release.wait(5)
+        return create(self, **kwargs)
+    monkeypatch.setattr(fake_openai, 'create', slow_create)
+
+    result = classify_text('The printer is jammed again', deadline=0.05,
+                           on_late=lambda *args: late.append(args) or arrived.set())
+    assert result == classifier._heuristic('The printer is jammed again')
+    assert classifier.breaker._streak == 1
+    release.set()
+    assert arrived.wait(5)
+    answer = {'category': 'networking', 'priority': 'High', 'confidence': 0.9}
+    assert late == [(answer, result)]
+    # The late answer was cached, so the next identical ticket gets it at once.
+    assert classify_text('The printer is jammed again', deadline=0.05) == answer
+
+
+def test_circuit_breaker_skips_a_failing_model_and_probes_to_recover(fake_openai, monkeypatch):
+    import classifier
+    now = [0.0]
+    monkeypatch.setattr(classifier, 'breaker', classifier.CircuitBreaker(failures=2, cooldown=30,
+                                                                         clock=lambda: now[0]))
+    create, failed = fake_openai.create, []
+    monkeypatch.setattr(fake_openai, 'create', lambda self, **kwargs: failed.append(1) or 1 / 0)
+    for i in range(4):
+        classify_text(f'VPN is down #{i}')
+    # Two failures opened the circuit; the next tickets skipped the model.
+    assert classifier.breaker.state == 'open' and len(failed) == 2
+    monkeypatch.setattr(fake_openai, 'create', create)
+    now[0] = 29
+    # Still cooling down: the model is not asked.
+    assert classify_text('VPN is down #5')['confidence'] != 0.9
+    assert fake_openai.calls == 0
+    now[0] = 31
+    assert classifier.breaker.allow() and not classifier.breaker.allow()
+    classifier.breaker.cancel()
+    assert classify_text('VPN is down #6')['confidence'] == 0.9
+    assert classifier.breaker.state == 'closed'
+
+
+def test_half_open_probe_failure_reopens_the_circuit():
+    import classifier
+    now = [0.0]
+    breaker = classifier.CircuitBreaker(failures=1, cooldown=10, clock=lambda: now[0])
+    breaker.record(False)
+    assert breaker.state == 'open' and not breaker.allow()
+    now[0] = 4
+    assert breaker.retry_after() == 6
+    now[0] = 10
+    assert breaker.allow()
+    assert breaker.state == 'half-open' and breaker.retry_after() == 10
+    breaker.record(False)
+    assert breaker.state == 'open' and not breaker.allow()
+    now[0] = 19
+    assert not breaker.allow() and breaker.retry_after() == 1
+    assert classifier.CircuitBreaker(failures=0).allow()
+
+
+def test_client_manager_is_usable_after_fork_and_queues_briefly(monkeypatch):
+    import threading
+    import time
+    import classifier
+    monkeypatch.setenv('OPENAI_MAX_CONCURRENCY', '1')
+    monkeypatch.delenv('OPENAI_QUEUE_TIMEOUT', raising=False)
+    manager = classifier._ClientManager()
+    # Another thread held the lock when the process forked.
+    manager._lock.acquire()
+    manager._reset()
+    assert manager._lock.acquire(timeout=1)
+    manager._lock.release()
+
+    held = manager.slot()
+    start = time.monotonic()
+    assert manager.slot() is None
+    assert time.monotonic() - start < 2
+    # Bulk callers (no deadline) queue until a slot frees up.
+    threading.Timer(0.7, held.release).start()
+    assert manager.slot(wait=True) is held
+    held.release()
+
+
+def test_cache_key_depends_on_model_and_taxonomy(monkeypatch):
+    import classifier
+    key = classifier.cache_key('vpn down', 'gpt-4o-mini')
+    assert key != classifier.cache_key('vpn down', 'gpt-4o')
+    monkeypatch.setattr(classifier, 'TAXONOMY_VERSION', 'next')
+    assert key != classifier.cache_key('vpn down', 'gpt-4o-mini')
+
+
+def test_cache_lru_and_ttl_eviction(monkeypatch):
+    import classifier
+    c = classifier.ClassificationCache(max_entries=2, ttl=60)
+    result = {'category': 'other', 'priority': 'Low', 'confidence': 0.1}
+    for key in ('a', 'b', 'c'):
+        c.put(key, 'm', result)
+    assert c.get('a') is None
+    assert c.get('c') == result
+    assert c.stats()['evictions'] == 1
+    now = classifier.time.monotonic()
+    monkeypatch.setattr(classifier.time, 'monotonic', lambda: now + 61)
+    assert c.get('c') is None
+
+
+def test_cache_shared_store(tmp_path):
+    import classifier
+    from sqlalchemy import create_engine
+    from models import ClassificationCacheEntry
+    engine = create_engine(f'sqlite:///{tmp_path / "cache.db"}')
+    ClassificationCacheEntry.__table__.create(engine)
+    result = {'category': 'hardware', 'priority': 'Medium', 'confidence': 0.7}
+    writer = classifier.ClassificationCache(store=classifier.SQLCacheStore(engine, ClassificationCacheEntry.__table__))
+    writer.put('k', 'm', result)
+    # A second process (fresh in-memory LRU) is served from the shared table.
+    reader = classifier.ClassificationCache(store=classifier.SQLCacheStore(engine, ClassificationCacheEntry.__table__))
+    assert reader.get('k') == result
+    assert reader.stats()['store_hits'] == 1
+
+
+def test_rules_score_all_categories_in_one_pass():
+    from heuristic_rules import RuleEngine
+    engine = RuleEngine({
+        'default': {'category': 'other', 'priority': 'Low', 'confidence': 0.1},
+        'categories': {
+            'microsoft 365': {'priority': 'High', 'confidence': 0.5, 'keywords': {'password': 1.0}},
+            'security': {'priority': 'Critical', 'confidence': 0.6, 'keywords': {'phish': 1.5}},
+        },
+        'priority_keywords': {'High': ['urgent']},
+    }, CATEGORIES, PRIORITY_LEVELS)
+    # The heavier security rule wins even though the password rule is listed first.
+    assert engine.classify('Phishing mail asked for my password')['category'] == 'security'
+    assert engine.classify('nothing relevant') == {'category': 'other', 'priority': 'Low', 'confidence': 0.1}
+    assert engine.classify('urgent: nothing relevant')['priority'] == 'High'
+
+
+def test_rules_count_overlapping_phrases():
+    from heuristic_rules import RuleEngine
+    engine = RuleEngine({
+        'default': {'category': 'other', 'priority': 'Low', 'confidence': 0.1},
+        'categories': {
+            'software': {'priority': 'Low', 'confidence': 0.3, 'keywords': {'internet': 1.0}},
+            'networking': {'priority': 'Medium', 'confidence': 0.4, 'keywords': {'network': 0.8, 'net': 0.8}},
+        },
+    }, CATEGORIES, PRIORITY_LEVELS)
+    # "network" overlaps "internet", and "net" starts where "network" does;
+    # substring checks find all three, so networking outscores software.
+    result = engine.classify('internetwork routing is down')
+    assert result['category'] == 'networking' and result['confidence'] == pytest.approx(0.45)
+
+
+def test_rules_reject_unknown_category():
+    from heuristic_rules import RuleEngine
+    with pytest.raises(ValueError):
+        RuleEngine({'default': {'category': 'other', 'priority': 'Low', 'confidence': 0.1},
+                    'categories': {'plumbing': {'priority': 'Low', 'confidence': 0.1, 'keywords': {}}}},
+                   CATEGORIES, PRIORITY_LEVELS)
+
+
+def test_trie_regex_matches_longest_first_alternation():
+    import re
+    from heuristic_rules import _trie_regex
+    phrases = ['ph', 'phish', 'phone', 'vpn', 'hard drive', 'hard', 'wi-fi']
+    flat = re.compile('|'.join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)))
+    trie = re.compile(_trie_regex(phrases))
+    text = 'phishing call on my phone about the hard drive, vpn and wi-fi; ph'
+    assert trie.findall(text) == flat.findall(text)
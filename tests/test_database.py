@@ -0,0 +1,66 @@
+"""Tests for SQLite connection settings and read/write routing."""
+import pytest
+from flask import g
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+import database
+from app import create_app
+from models import db, Ticket
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.delenv('DATABASE_READ_URL', raising=False)
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+def test_connections_get_wal_and_pragmas(app):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+            assert conn.execute(text('PRAGMA busy_timeout')).scalar() == database.PRAGMAS['busy_timeout']
+            assert conn.execute(text('PRAGMA query_only')).scalar() == 0
+        with db.engines[database.READ_BIND].connect() as conn:
+            assert conn.execute(text('PRAGMA query_only')).scalar() == 1
+
+
+def test_read_only_views_use_the_read_pool(app):
+    with app.app_context():
+        db.session.add(Ticket(title='Printer', description='jammed'))
+        db.session.commit()
+        ticket_id = Ticket.query.one().id
+        read_engine = db.engines[database.READ_BIND]
+    statements = []
+    event.listen(read_engine, 'before_cursor_execute',
+                 lambda conn, cursor, stmt, *args: statements.append(stmt))
+    client = app.test_client()
+    assert b'Printer' in client.get('/tickets').data
+    assert client.get(f'/ticket/{ticket_id}').status_code == 200
+    assert any('FROM tickets' in s for s in statements)
+
+    statements.clear()
+    client.post('/submit', data={'title': 'VPN', 'description': 'VPN drops'})
+    assert not any(s.lstrip().upper().startswith('INSERT') for s in statements)
+
+
+def test_writes_fail_inside_read_only_context(app):
+    with app.test_request_context():
+        g.db_read_only = True
+        db.session.add(Ticket(title='x', description='y'))
+        with pytest.raises(OperationalError, match='readonly'):
+            db.session.commit()
+        db.session.rollback()
+
+
+def test_is_sqlite_file():
+    assert database.is_sqlite_file('sqlite:///tickets.db')
+    assert not database.is_sqlite_file('sqlite://')
+    assert not database.is_sqlite_file('sqlite:///:memory:')
+    assert not database.is_sqlite_file('postgresql://u@h/db')
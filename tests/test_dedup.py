@@ -0,0 +1,122 @@
+"""Tests for SimHash near-duplicate detection and incident grouping."""
+import random
+import sqlite3
+
+import pytest
+
+import dedup
+import jobs
+from app import create_app
+from models import db, Ticket, ClassificationJob
+from tests.test_migrations import LEGACY_SCHEMA
+
+OUTAGE = ('Since this morning Outlook will not connect to the mail server and keeps asking '
+          'for my password, nobody on the third floor can send or receive email')
+OUTAGE_AGAIN = ('Since this morning Outlook will not connect to the mail server and keeps asking '
+                'for my password, nobody on the second floor can send or receive email')
+PRINTER = ('The large printer next to the kitchen is showing a paper jam error even though '
+           'every tray is empty and the rollers look clean')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.setenv('LOCAL_MODEL_PATH', '')
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+def _submit(client, description):
+    return client.post('/submit', data={'title': description[:30], 'description': description},
+                       follow_redirects=True)
+
+
+def test_simhash_distances():
+    a, b, c = dedup.simhash(OUTAGE), dedup.simhash(OUTAGE_AGAIN), dedup.simhash(PRINTER)
+    assert (a ^ b).bit_count() <= dedup.MAX_DISTANCE
+    assert (a ^ c).bit_count() > dedup.MAX_DISTANCE
+    assert dedup.simhash('printer broken') is None
+    assert dedup.from_db(dedup.to_db(a)) == a and -2**63 <= dedup.to_db(a) < 2**63
+
+
+def test_index_finds_only_fingerprints_within_radius():
+    rnd = random.Random(3)
+    index = dedup.SimHashIndex(max_distance=3)
+    base = rnd.getrandbits(64)
+    for key in range(1, 2000):
+        index.add(key, rnd.getrandbits(64))
+    index.add(5000, base ^ 0b111)              # distance 3
+    index.add(5001, base ^ (1 << 63) ^ 1)      # distance 2
+    index.add(5002, base ^ 0b1111)             # distance 4
+    assert index.near(base) == [(2, 5001), (3, 5000)]
+    index.remove(5001)
+    assert index.near(base) == [(3, 5000)]
+
+
+def test_near_duplicate_joins_classified_incident(app):
+    client = app.test_client()
+    _submit(client, OUTAGE)
+    with app.app_context():
+        jobs.run_pending()
+        root = Ticket.query.one()
+    body = _submit(client, OUTAGE_AGAIN).get_data(as_text=True)
+    assert f'ongoing incident #{root.id}' in body
+    with app.app_context():
+        dup = Ticket.query.filter(Ticket.id != root.id).one()
+        assert dup.duplicate_of == root.id
+        assert (dup.category, dup.priority) == (root.category, root.priority)
+        # Classified at submit time: nothing was queued for it.
+        assert ClassificationJob.query.filter_by(ticket_id=dup.id).count() == 0
+    _submit(client, PRINTER)
+    with app.app_context():
+        assert Ticket.query.filter_by(duplicate_of=None).count() == 2
+
+
+def test_duplicate_of_pending_incident_reuses_its_result(app, monkeypatch):
+    client = app.test_client()
+    _submit(client, OUTAGE)
+    _submit(client, OUTAGE_AGAIN)
+    calls = []
+    real = jobs.classify
+    monkeypatch.setattr(jobs, 'classify', lambda text, **kw: calls.append(text) or real(text, **kw))
+    with app.app_context():
+        # The duplicate waits on its incident's job rather than having its own.
+        assert jobs.run_pending() == 1
+        root, dup = Ticket.query.order_by(Ticket.id).all()
+        assert dup.duplicate_of == root.id and dup.category == root.category
+    assert calls == [OUTAGE]
+
+
+def test_known_fix_is_surfaced(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+    _submit(client, OUTAGE)
+    with app.app_context():
+        jobs.run_pending()
+        first = Ticket.query.one()
+    client.post(f'/admin/ticket/{first.id}/complete', data={'fixed_by': 'ana', 'notes': 'restarted exchange'})
+    body = _submit(client, OUTAGE_AGAIN).get_data(as_text=True)
+    assert 'A similar issue was fixed before' in body
+    with app.app_context():
+        second = Ticket.query.filter(Ticket.id != first.id).one()
+        assert second.duplicate_of is None
+        assert second.category == first.category
+    detail = client.get(f'/ticket/{second.id}').get_data(as_text=True)
+    assert 'Similar issue fixed before' in detail and 'restarted exchange' in detail
+
+
+def test_migration_backfills_fingerprints(tmp_path, monkeypatch):
+    path = tmp_path / 'legacy.db'
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+        conn.execute('INSERT INTO tickets VALUES (1, ?, ?, NULL, NULL, NULL, ?, ?, ?)',
+                     ('t', OUTAGE, 'Open', '2024-01-01 00:00:00', '2024-01-01 00:00:00'))
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{path}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    app = create_app()
+    with app.app_context():
+        assert dedup.from_db(db.session.get(Ticket, 1).simhash) == dedup.simhash(OUTAGE)
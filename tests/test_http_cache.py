@@ -0,0 +1,80 @@
+"""Tests for ETag/Last-Modified validation on the public ticket pages."""
+import pytest
+from sqlalchemy import event, update
+
+import database
+from app import create_app
+from models import db, Ticket
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    application = create_app()
+    application.config['TESTING'] = True
+    with application.app_context():
+        db.session.add(Ticket(title='Printer jam', description='Tray 2 jams', category='hardware', priority='Low'))
+        db.session.commit()
+    return application
+
+
+def test_unchanged_list_is_not_modified_without_queries(app):
+    client = app.test_client()
+    first = client.get('/tickets')
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'public, no-cache'
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified']
+
+    with app.app_context():
+        read_engine = db.engines[database.READ_BIND]
+    statements = []
+    event.listen(read_engine, 'before_cursor_execute',
+                 lambda conn, cursor, stmt, *args: statements.append(stmt))
+    again = client.get('/tickets', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    assert len(statements) == 1 and 'data_version' in statements[0]
+
+    # A different page is a different resource.
+    assert client.get('/tickets?after=x', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_writes_through_orm_and_core_change_the_etag(app):
+    client = app.test_client()
+    etag = client.get('/ticket/1').headers['ETag']
+    with app.app_context():
+        db.session.execute(update(Ticket).where(Ticket.id == 1).values(priority='High'))
+        db.session.commit()
+    resp = client.get('/ticket/1', headers={'If-None-Match': etag})
+    assert resp.status_code == 200 and b'High' in resp.data
+    etag = resp.headers['ETag']
+    with app.app_context():
+        db.session.get(Ticket, 1).title = 'Printer on fire'
+        db.session.commit()
+    assert client.get('/ticket/1', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_admin_pages_are_never_shared_or_validated(app):
+    client = app.test_client()
+    etag = client.get('/ticket/1').headers['ETag']
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+    resp = client.get('/ticket/1', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.headers['Cache-Control'] == 'private, no-store' and 'ETag' not in resp.headers
+
+
+def test_pending_flash_is_rendered(app):
+    client = app.test_client()
+    etag = client.get('/tickets').headers['ETag']
+    with client.session_transaction() as sess:
+        sess['_flashes'] = [('success', 'Ticket #1 submitted')]
+    resp = client.get('/tickets', headers={'If-None-Match': etag})
+    assert resp.status_code == 200 and b'Ticket #1 submitted' in resp.data
+    assert client.get('/tickets', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_missing_ticket_is_not_cached(app):
+    resp = app.test_client().get('/ticket/999')
+    assert resp.status_code == 404 and 'ETag' not in resp.headers
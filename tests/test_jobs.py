@@ -0,0 +1,180 @@
+"""Tests for the database-backed background classification queue."""
+from datetime import timedelta
+
+import pytest
+
+import jobs
+import stats
+from app import create_app
+from models import db, Ticket, ClassificationJob, utcnow
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    db_file = tmp_path / 'test.db'
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{db_file}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.setenv('LOCAL_MODEL_PATH', '')
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+def test_submit_queues_without_classifying(app):
+    with app.test_client() as client:
+        resp = client.post('/submit', data={'title': 'VPN', 'description': 'VPN is down'})
+        assert resp.status_code == 302
+    with app.app_context():
+        ticket = Ticket.query.one()
+        assert ticket.pending_classification
+        job = ClassificationJob.query.one()
+        assert job.ticket_id == ticket.id
+        assert job.status == 'queued'
+
+
+def test_run_pending_classifies_ticket(app):
+    with app.test_client() as client:
+        client.post('/submit', data={'title': 'VPN', 'description': 'VPN is down'})
+    with app.app_context():
+        assert jobs.run_pending() == 1
+        ticket = Ticket.query.one()
+        assert ticket.category == 'networking'
+        assert ticket.priority == 'High'
+        assert ClassificationJob.query.one().status == 'done'
+        assert jobs.pending_count() == 0
+
+
+def test_expired_lease_is_reclaimed(app):
+    with app.app_context():
+        ticket = Ticket(title='t', description='printer jammed')
+        db.session.add(ticket)
+        db.session.flush()
+        db.session.add(ClassificationJob(ticket_id=ticket.id, status='running', attempts=1,
+                                         locked_by='dead-worker',
+                                         locked_until=utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        job = jobs.claim_next('w2')
+        assert job is not None
+        assert job.locked_by == 'w2'
+        assert job.attempts == 2
+
+
+def test_failure_is_retried_with_backoff(app, monkeypatch):
+    def boom(text, **kwargs):
+        raise RuntimeError('model exploded')
+    monkeypatch.setattr(jobs, 'classify', boom)
+    with app.app_context():
+        ticket = Ticket(title='t', description='printer jammed')
+        db.session.add(ticket)
+        db.session.flush()
+        jobs.enqueue(ticket)
+        db.session.commit()
+        assert jobs.run_pending() == 1
+        job = ClassificationJob.query.one()
+        assert job.status == 'queued'
+        assert job.run_after > utcnow()
+        assert 'model exploded' in job.last_error
+        # Backed off, so nothing is runnable right now.
+        assert jobs.claim_next() is None
+
+
+def test_model_outage_keeps_provisional_labels_and_retries(app, monkeypatch):
+    answers = [({'category': 'networking', 'priority': 'High', 'confidence': 0.5}, 'fallback'),
+               ({'category': 'security', 'priority': 'Critical', 'confidence': 0.9}, 'openai')]
+    monkeypatch.setattr(jobs, 'classify', lambda text, **kw: answers.pop(0))
+    with app.app_context():
+        root = Ticket(title='t', description='VPN is down')
+        db.session.add(root)
+        db.session.flush()
+        dup = Ticket(title='t', description='VPN is down', duplicate_of=root.id)
+        db.session.add(dup)
+        jobs.enqueue(root)
+        db.session.commit()
+        assert jobs.run_pending() == 1
+        job = ClassificationJob.query.one()
+        assert job.status == 'queued' and job.run_after > utcnow() and 'provisional' in job.last_error
+        labels = [(t.category, t.label_source) for t in (db.session.get(Ticket, i) for i in (root.id, dup.id))]
+        assert labels == [('networking', 'heuristic')] * 2
+
+        job.run_after = utcnow()
+        db.session.commit()
+        assert jobs.run_pending() == 1
+        assert ClassificationJob.query.one().status == 'done'
+        db.session.expire_all()
+        labels = [(t.category, t.label_source) for t in (db.session.get(Ticket, i) for i in (root.id, dup.id))]
+        assert labels == [('security', 'model')] * 2
+        assert stats.summary()['by_category'] == {'security': 2}
+
+
+def test_open_circuit_retries_after_the_cooldown(app, monkeypatch):
+    import classifier
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    monkeypatch.setattr(classifier, 'breaker', classifier.CircuitBreaker(failures=1, cooldown=600))
+    classifier.breaker.record(False)
+    with app.app_context():
+        ticket = Ticket(title='t', description='printer jammed')
+        db.session.add(ticket)
+        db.session.flush()
+        jobs.enqueue(ticket)
+        db.session.commit()
+        assert jobs.run_pending() == 1
+        job = ClassificationJob.query.one()
+        assert job.status == 'queued' and job.run_after > utcnow() + timedelta(seconds=590)
+        assert db.session.get(Ticket, ticket.id).label_source == 'heuristic'
+
+
+def test_admin_correction_is_not_overwritten(app):
+    with app.app_context():
+        ticket = Ticket(title='t', description='printer jammed')
+        db.session.add(ticket)
+        db.session.flush()
+        jobs.enqueue(ticket)
+        ticket.category = 'security'
+        ticket.priority = 'Low'
+        db.session.commit()
+        jobs.run_pending()
+        assert db.session.get(Ticket, ticket.id).category == 'security'
+
+
+def test_late_model_answer_replaces_provisional_labels(app):
+    provisional = {'category': 'networking', 'priority': 'High', 'confidence': 0.5}
+    with app.app_context():
+        root = Ticket(title='VPN', description='VPN is down', status='Open', **provisional)
+        db.session.add(root)
+        db.session.flush()
+        dup = Ticket(title='VPN', description='VPN is down', status='Open', duplicate_of=root.id, **provisional)
+        # Corrected by an admin before the model answered.
+        corrected = Ticket(title='VPN', description='VPN is down', status='Open', duplicate_of=root.id,
+                           **dict(provisional, category='security'))
+        db.session.add_all([dup, corrected])
+        db.session.commit()
+        ids = root.id, dup.id, corrected.id
+
+    late = {'category': 'software', 'priority': 'Low', 'confidence': 0.95}
+    jobs._late_answer(app, ids[0])(late, provisional)
+    with app.app_context():
+        labels = [(t.category, t.priority, t.confidence) for t in (db.session.get(Ticket, i) for i in ids)]
+        assert labels == [('software', 'Low', 0.95), ('software', 'Low', 0.95), ('security', 'High', 0.5)]
+        assert stats.summary()['by_category'] == {'software': 2, 'security': 1}
+
+
+def test_workers_start_only_when_serving(tmp_path, monkeypatch):
+    import importlib.util
+    import os
+    import threading
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.setenv('CLASSIFY_WORKERS', '2')
+    started = []
+    monkeypatch.setattr(jobs, 'start_workers', lambda app, count: started.append(count))
+    # Every flask CLI command builds the app; that must not start workers.
+    app = create_app()
+    assert started == [] and not [t for t in threading.enumerate() if t.name.startswith('classify-worker')]
+
+    spec = importlib.util.spec_from_file_location(
+        'gunicorn_conf', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py'))
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    conf.post_worker_init(type('Worker', (), {'wsgi': app})())
+    assert started == [2]
@@ -0,0 +1,112 @@
+"""Tests for the ticket change feed and the /admin/events stream."""
+import json
+import re
+import threading
+import time
+
+import pytest
+
+import live
+from app import create_app
+from models import db, Ticket
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.setattr(live, 'POLL_SECONDS', 0.02)
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+@pytest.fixture
+def admin(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+    return client
+
+
+def _add(app, **fields):
+    with app.app_context():
+        ticket = Ticket(title='VPN down', description='x' * 200, **fields)
+        db.session.add(ticket)
+        db.session.commit()
+        return ticket.id
+
+
+def _update(app, ticket_id, **fields):
+    with app.app_context():
+        db.session.query(Ticket).filter_by(id=ticket_id).update(fields)
+        db.session.commit()
+
+
+def _messages(body):
+    """``[(event id, event name, data)]`` parsed from an SSE body."""
+    out = []
+    for block in body.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'data' in fields:
+            out.append((fields.get('id'), fields.get('event', 'message'), json.loads(fields['data'])))
+    return out
+
+
+def test_triggers_record_new_reclassified_and_fixed(app, admin, monkeypatch):
+    monkeypatch.setattr(live, 'POLL_SECONDS', 0)  # no coalescing of back-to-back polls
+    page = admin.get('/admin').get_data(as_text=True)
+    url = re.search(r'data-live-url="([^"]+)"', page).group(1).replace('&amp;', '&')
+    ticket_id = _add(app)
+    _update(app, ticket_id, title='Edited')  # not a tracked change
+    _update(app, ticket_id, category='networking', priority='High')
+    _update(app, ticket_id, status='Fixed')
+    _update(app, ticket_id, status='Fixed', priority='High')
+
+    resp = admin.get(url)
+    assert resp.mimetype == 'text/event-stream' and resp.headers['Cache-Control'] == 'no-cache'
+    # The test client is not threaded: pending events come back at once.
+    assert resp.get_data(as_text=True).startswith('retry: 5000\n\n')
+    messages = _messages(resp.get_data(as_text=True))
+    assert [m[2]['kind'] for m in messages] == ['new', 'reclassified', 'fixed']
+    last = messages[-1][2]
+    assert last['title'] == 'Edited' and last['status'] == 'Fixed' and last['priority'] == 'High'
+    assert last['description'] == 'x' * 150 + '…'
+
+    # Reconnects resume after Last-Event-ID.
+    _update(app, ticket_id, category='security')
+    again = _messages(admin.get(url, headers={'Last-Event-ID': messages[-1][0]}).get_data(as_text=True))
+    assert [(m[2]['kind'], m[2]['category']) for m in again] == [('reclassified', 'security')]
+    assert app.test_client().get('/admin/events').status_code == 302
+
+
+def test_stream_wakes_clients_from_one_poller(app):
+    feed = app.extensions['live']
+    with app.app_context():
+        since = live.latest_id()
+    streams = [feed.stream(since, seconds=1) for _ in range(3)]
+    assert [next(s) for s in streams] == ['retry: 1000\n\n'] * 3
+    assert feed.streams == 3
+    threading.Timer(0.1, _add, (app,)).start()
+    start = time.monotonic()
+    frames = [next(s) for s in streams]
+    assert time.monotonic() - start < 0.9
+    assert len({frame for frame in frames}) == 1 and _messages(frames[0])[0][2]['kind'] == 'new'
+    for s in streams:
+        s.close()
+    assert feed.streams == 0
+
+
+def test_held_stream_ends_and_slow_clients_reload(app, admin, monkeypatch):
+    monkeypatch.setattr(live, 'STREAM_SECONDS', 0.2)
+    monkeypatch.setattr(live, 'HEARTBEAT_SECONDS', 0.05)
+    body = admin.get('/admin/events', environ_overrides={'wsgi.multithread': True}).get_data(as_text=True)
+    assert body.startswith('retry: 1000\n\n') and ': keep-alive' in body
+
+    feed = live.Feed(app.extensions['live'].engine, backlog=2)
+    for _ in range(3):
+        _add(app)
+    feed.refresh()
+    assert _messages(feed.poll(since=0)) == [(None, 'reload', {})]
+    assert len(_messages(feed.poll(since=1))) == 2
@@ -0,0 +1,67 @@
+"""Tests for the benchmark seeder, the OpenAI stub and the load driver."""
+import pytest
+
+import classifier
+import stats
+from app import create_app
+from benchmarks import loadtest, seed
+from benchmarks.openai_stub import StubServer
+from models import db, Ticket, TicketCorrection, FixedIssue
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = StubServer(seed=1).start()
+    monkeypatch.setenv('OPENAI_API_KEY', 'stub')
+    monkeypatch.setenv('OPENAI_BASE_URL', server.base_url)
+    monkeypatch.setenv('OPENAI_MAX_RETRIES', '0')
+    monkeypatch.setenv('LOCAL_MODEL_PATH', '')
+    monkeypatch.setattr(classifier, 'cache', classifier.ClassificationCache(max_entries=0))
+    monkeypatch.setattr(classifier, 'breaker', classifier.CircuitBreaker())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_seed_is_reproducible_and_consistent(app):
+    first = list(seed.generate(200, 0.3, 0.2, 30, seed=7))
+    assert first == list(seed.generate(200, 0.3, 0.2, 30, seed=7))
+    assert first != list(seed.generate(200, 0.3, 0.2, 30, seed=8))
+
+    with app.app_context():
+        counts = seed.seed(500, fixed_share=0.3, corrections_share=0.2, days=30, echo=lambda *a: None)
+        assert counts['tickets'] == Ticket.query.count() == stats.total() == 500
+        assert counts['fixed_issues'] == FixedIssue.query.count() == Ticket.query.filter_by(status='Fixed').count()
+        assert counts['ticket_corrections'] == TicketCorrection.query.count() > 0
+        assert Ticket.query.filter(Ticket.status == 'Open', Ticket.simhash.is_(None)).count() == 0
+        with pytest.raises(SystemExit):
+            seed.seed(10, echo=lambda *a: None)
+
+
+def test_stub_answers_classify_text_and_injects_errors(stub):
+    assert classifier._classify('The printer on floor 2 jams')[1] == 'openai'
+    assert classifier.classify_text('Outlook keeps asking for my password')['category'] == 'microsoft 365'
+    stub.error_rate = 1.0
+    result, path = classifier._classify('VPN disconnects every few minutes')
+    assert path == 'fallback' and result['category'] == 'networking'
+    assert (stub.calls, stub.errors) == (3, 1)
+
+
+def test_summaries_report_nearest_rank_percentiles():
+    samples = [(ms / 1000, ms != 100) for ms in range(1, 101)]
+    summary = loadtest.summarize(samples, seconds=10)
+    assert summary['requests'] == 100 and summary['errors'] == 1 and summary['rps'] == 10
+    assert (summary['p50_ms'], summary['p95_ms'], summary['p99_ms'], summary['max_ms']) == (50, 95, 99, 100)
+    assert loadtest.parse_mix('list_tickets=3,export') == {'list_tickets': 3.0, 'export': 1.0}
+    with pytest.raises(SystemExit):
+        loadtest.parse_mix('nope=1')
@@ -0,0 +1,76 @@
+"""Tests for the locally trained classification tier."""
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import classifier
+import local_model
+from app import create_app
+from models import db, Ticket, TicketCorrection, FixedIssue
+
+EXAMPLES = [
+    ('vpn tunnel drops every few minutes', 'networking', 'High'),
+    ('cannot reach the vpn from home', 'networking', 'High'),
+    ('wifi in meeting room keeps dropping', 'networking', 'High'),
+    ('printer toner is empty on floor two', 'hardware', 'Low'),
+    ('printer shows paper jam error', 'hardware', 'Low'),
+    ('laptop keyboard keys are stuck', 'hardware', 'Low'),
+]
+
+
+def _examples():
+    return [(text, cat, pri, 1.0) for text, cat, pri in EXAMPLES]
+
+
+def test_train_predict_and_roundtrip(tmp_path):
+    model = local_model.train(_examples, min_df=1)
+    result = model.predict('the vpn keeps dropping')
+    assert result['category'] == 'networking'
+    assert result['priority'] == 'High'
+    assert model.predict('zzz qqq') is None
+
+    path = str(tmp_path / 'model.npz')
+    model.save(path)
+    loaded = local_model.LocalModel.load(path)
+    assert loaded.predict('printer jam again') == model.predict('printer jam again')
+
+
+def test_confident_local_answer_skips_fallback(tmp_path, monkeypatch):
+    path = str(tmp_path / 'model.npz')
+    local_model.train(_examples, min_df=1).save(path)
+    monkeypatch.setenv('LOCAL_MODEL_PATH', path)
+    monkeypatch.setenv('LOCAL_MODEL_MIN_CONFIDENCE', '0.5')
+    monkeypatch.setattr(local_model, 'loader', local_model._Loader())
+    # The keyword heuristic would call this "hardware"/"Medium".
+    assert classifier.classify_text('printer toner empty')['priority'] == 'Low'
+
+
+def test_training_examples_prefer_corrections(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    app = create_app()
+    with app.app_context():
+        corrected = Ticket(title='a', description='outlook calendar sync', category='microsoft 365',
+                           priority='Low', confidence=0.2)
+        guessed = Ticket(title='b', description='random guess', category='software',
+                         priority='Medium', confidence=0.25)
+        labelled = Ticket(title='d', description='sharepoint site is slow', category='microsoft 365',
+                          priority='Medium', confidence=0.9, label_source='model')
+        # Confident, but not the model's own answer.
+        heuristic = Ticket(title='e', description='vpn is down', category='networking',
+                           priority='High', confidence=0.7, label_source='heuristic')
+        local = Ticket(title='f', description='printer jam', category='hardware',
+                       priority='Low', confidence=0.95, label_source='local')
+        db.session.add_all([corrected, guessed, labelled, heuristic, local])
+        db.session.flush()
+        db.session.add(TicketCorrection(ticket_id=corrected.id, old_category='software',
+                                        new_category='microsoft 365'))
+        db.session.add(FixedIssue(title='c', description='monitor flickers', category='hardware',
+                                  priority='Low'))
+        db.session.commit()
+        rows = list(local_model.training_examples()())
+    assert rows == [
+        ('outlook calendar sync', 'microsoft 365', 'Low', local_model.WEIGHT_CORRECTED),
+        ('sharepoint site is slow', 'microsoft 365', 'Medium', local_model.WEIGHT_TICKET),
+        ('monitor flickers', 'hardware', 'Low', local_model.WEIGHT_FIXED),
+    ]
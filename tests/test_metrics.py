@@ -0,0 +1,116 @@
+"""Tests for the Prometheus /metrics endpoint and its instrumentation."""
+import json
+import re
+
+import pytest
+
+import api
+import classifier
+import metrics
+from app import create_app
+from models import db, Ticket, ClassificationJob
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.delenv('METRICS_DIR', raising=False)
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    application = create_app()
+    application.config['TESTING'] = True
+    yield application
+    metrics.registry.configure(None)
+
+
+def _value(text, series):
+    """The sample value of ``series`` (name plus labels) in ``text``, or 0."""
+    match = re.search(rf'^{re.escape(series)} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_requests_are_timed_with_their_queries(app):
+    client = app.test_client()
+    before = client.get('/metrics').text
+    client.get('/tickets')
+    client.get('/no/such/page')
+    text = client.get('/metrics').text
+    assert 'text/plain; version=0.0.4' in client.get('/metrics').content_type
+
+    series = 'http_requests_total{method="GET",endpoint="list_tickets",status="200"}'
+    assert _value(text, series) == _value(before, series) + 1
+    series = 'http_requests_total{method="GET",endpoint="unmatched",status="404"}'
+    assert _value(text, series) == _value(before, series) + 1
+    count = 'http_request_duration_seconds_count{method="GET",endpoint="list_tickets"}'
+    inf = 'http_request_duration_seconds_bucket{method="GET",endpoint="list_tickets",le="+Inf"}'
+    assert _value(text, count) == _value(text, inf) == _value(before, count) + 1
+    queries = 'http_request_db_queries_sum{endpoint="list_tickets"}'
+    assert _value(text, queries) > _value(before, queries)
+    assert '# TYPE http_request_db_seconds histogram' in text
+
+
+def test_classifier_paths_and_queue_depth(app):
+    client = app.test_client()
+    before = client.get('/metrics').text
+    classifier.classify_text('My laptop will not turn on')
+    with app.app_context():
+        ticket = Ticket(title='T', description='d', status='Open')
+        db.session.add(ticket)
+        db.session.flush()
+        db.session.add(ClassificationJob(ticket_id=ticket.id, status='queued'))
+        db.session.commit()
+    text = client.get('/metrics').text
+    for series in ('classify_duration_seconds_count{path="heuristic"}',
+                   'classify_fallbacks_total{reason="unconfigured"}'):
+        assert _value(text, series) == _value(before, series) + 1
+    assert _value(text, 'classify_queue_jobs{status="queued"}') == 1
+    assert 'classify_queue_jobs{status="failed"} 0' in text
+
+
+def test_rate_limit_rejections_are_counted(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'development')
+    monkeypatch.setenv('CLASSIFY_WORKERS', '0')
+    monkeypatch.setenv('API_TOKENS', 't')
+    monkeypatch.delenv('METRICS_DIR', raising=False)
+    monkeypatch.setattr(api, 'RATE_LIMIT', '1 per minute')
+    client = create_app().test_client()
+    series = 'rate_limit_rejections_total{endpoint="api.list_tickets"}'
+    before_text = client.get('/metrics').text
+    before = _value(before_text, series)
+    statuses = [client.get('/api/tickets', headers={'Authorization': 'Bearer t'}).status_code for _ in range(2)]
+    assert statuses == [200, 429]
+    text = client.get('/metrics').text
+    assert _value(text, series) == before + 1
+    rejected = 'http_requests_total{method="GET",endpoint="api.list_tickets",status="429"}'
+    assert _value(text, rejected) == _value(before_text, rejected) + 1
+
+
+def test_snapshots_of_all_processes_are_summed(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'FLUSH_SECONDS', 0)
+    metrics.registry.configure(str(tmp_path / 'metrics'))
+    client = app.test_client()
+    client.get('/tickets')
+    own = client.get('/metrics').text
+    series = 'http_requests_total{method="GET",endpoint="list_tickets",status="200"}'
+    # Another worker's snapshot, including a series this process never saw.
+    other = {'http_requests_total': [[['GET', 'list_tickets', '200'], 5], [['GET', 'index', '302'], 2]],
+             'classify_duration_seconds': [[['openai'], [0] * 8 + [1] + [0] * 5 + [0.3]]]}
+    (tmp_path / 'metrics' / '999-abcd.json').write_text(json.dumps(other))
+    text = client.get('/metrics').text
+    assert _value(text, series) == _value(own, series) + 5
+    index = 'http_requests_total{method="GET",endpoint="index",status="302"}'
+    assert _value(text, index) == _value(own, index) + 2
+    for series, added in (('classify_duration_seconds_bucket{path="openai",le="0.25"}', 0),
+                          ('classify_duration_seconds_bucket{path="openai",le="0.5"}', 1),
+                          ('classify_duration_seconds_sum{path="openai"}', 0.3)):
+        assert _value(text, series) == pytest.approx(_value(own, series) + added)
+    assert len(list((tmp_path / 'metrics').glob('*.json'))) == 2
+
+
+def test_token_protects_the_endpoint(app, monkeypatch):
+    monkeypatch.setenv('METRICS_TOKEN', 'scrape')
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape'}).status_code == 200
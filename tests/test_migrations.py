@@ -0,0 +1,50 @@
+"""Tests for the versioned schema migrations."""
+import sqlite3
+
+import migrations
+from app import create_app
+from models import db
+
+# Schema as created by releases before migrations existed (no secondary indexes).
+LEGACY_SCHEMA = """
+CREATE TABLE tickets (id INTEGER PRIMARY KEY, title VARCHAR(255) NOT NULL, description TEXT NOT NULL,
+    category VARCHAR(100), priority VARCHAR(50), confidence FLOAT, status VARCHAR(50) NOT NULL,
+    created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL);
+CREATE TABLE ticket_corrections (id INTEGER PRIMARY KEY, ticket_id INTEGER NOT NULL REFERENCES tickets (id),
+    old_category VARCHAR(100), new_category VARCHAR(100), old_priority VARCHAR(50), new_priority VARCHAR(50),
+    corrected_by VARCHAR(100), corrected_at DATETIME NOT NULL, notes TEXT);
+CREATE TABLE fixed_issues (id INTEGER PRIMARY KEY, ticket_id INTEGER REFERENCES tickets (id),
+    title VARCHAR(255) NOT NULL, description TEXT NOT NULL, category VARCHAR(100), priority VARCHAR(50),
+    confidence FLOAT, status VARCHAR(50) NOT NULL, fixed_by VARCHAR(100), fixed_at DATETIME NOT NULL, notes TEXT);
+"""
+
+
+def _indexes(path):
+    with sqlite3.connect(path) as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_upgrades_legacy_database(tmp_path, monkeypatch):
+    path = tmp_path / 'legacy.db'
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{path}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    app = create_app()
+    assert {'ix_tickets_created_at_id', 'ix_fixed_issues_category_fixed_at',
+            'ix_ticket_corrections_ticket_id_corrected_at'} <= _indexes(path)
+    with app.app_context():
+        assert migrations.current_version(db.engine) == migrations.MIGRATIONS[-1][0]
+        # Re-running is a no-op.
+        assert migrations.upgrade(db.engine) == []
+
+
+def test_today_count_uses_index(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "t.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    create_app()
+    with sqlite3.connect(tmp_path / 't.db') as conn:
+        plan = ' '.join(row[-1] for row in conn.execute(
+            'EXPLAIN QUERY PLAN SELECT count(*) FROM tickets WHERE created_at >= ? AND created_at < ?',
+            ('2024-01-01', '2024-01-02')))
+    assert 'ix_tickets_created_at_id' in plan
@@ -0,0 +1,53 @@
+"""Tests for keyset (cursor) pagination."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from models import db, Ticket
+from pagination import decode_cursor, encode_cursor, keyset_paginate
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.setenv('TICKETS_PER_PAGE', '4')
+    application = create_app()
+    base = datetime(2024, 1, 1)
+    with application.app_context():
+        for i in range(10):
+            # Pairs of tickets share a timestamp to exercise the id tie-breaker.
+            db.session.add(Ticket(title=f't{i}', description='d', category='other', priority='Low',
+                                  created_at=base + timedelta(minutes=i // 2)))
+        db.session.commit()
+    return application
+
+
+def _page(after=None, before=None):
+    return keyset_paginate(Ticket.query, Ticket.created_at, Ticket.id, 4, after=after, before=before)
+
+
+def test_walk_forward_and_back(app):
+    with app.app_context():
+        expected = [t.id for t in Ticket.query.order_by(Ticket.created_at.desc(), Ticket.id.desc())]
+        pages = [_page()]
+        while pages[-1].has_next:
+            pages.append(_page(after=pages[-1].next_cursor))
+        assert [t.id for p in pages for t in p.items] == expected
+        assert not pages[0].has_prev and pages[1].has_prev
+        back = _page(before=pages[2].prev_cursor)
+        assert [t.id for t in back.items] == [t.id for t in pages[1].items]
+
+
+def test_cursor_roundtrip_and_garbage():
+    ts = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    assert decode_cursor(encode_cursor(ts, 42)) == (ts, 42)
+    assert decode_cursor('not-a-cursor') is None
+
+
+def test_list_page_links(app):
+    with app.test_client() as client:
+        body = client.get('/tickets').get_data(as_text=True)
+        assert 'after=' in body and '10 total' in body
+        assert client.get('/tickets?after=garbage').status_code == 200
@@ -0,0 +1,80 @@
+"""Tests for the opt-in SQL profiling middleware."""
+import logging
+import re
+
+import pytest
+
+import profiling
+from app import create_app
+from models import db, Ticket
+
+
+def _make_app(tmp_path, monkeypatch, enabled=True):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.setattr(profiling, 'ENABLED', enabled)
+    application = create_app()
+    application.config['TESTING'] = True
+
+    @application.route('/_per_row')
+    def per_row():
+        # A list view loading something per row: the classic N+1.
+        for i in range(6):
+            Ticket.query.filter_by(id=i).first()
+        return 'ok'
+
+    return application
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    return _make_app(tmp_path, monkeypatch)
+
+
+def test_shape_collapses_parameters_and_in_lists():
+    assert profiling.shape('SELECT *\n  FROM t WHERE id IN (?, ?,?) AND x = ?') == \
+        'SELECT * FROM t WHERE id IN (?...) AND x = ?'
+    assert profiling.shape('SELECT 1 WHERE a IN (?)') == 'SELECT 1 WHERE a IN (?)'
+
+
+def test_disabled_installs_nothing(tmp_path, monkeypatch, caplog):
+    app = _make_app(tmp_path, monkeypatch, enabled=False)
+    with caplog.at_level(logging.INFO):
+        resp = app.test_client().get('/_per_row')
+    assert 'Server-Timing' not in resp.headers
+    assert not [r for r in caplog.records if r.module == 'profiling']
+
+
+def test_request_summary_and_server_timing(app, caplog):
+    with app.app_context():
+        db.session.add(Ticket(title='T', description='d', status='Open'))
+        db.session.commit()
+    with caplog.at_level(logging.INFO):
+        resp = app.test_client().get('/tickets')
+    assert resp.headers['Server-Timing'].startswith('db;dur=')
+    line = next(r.getMessage() for r in caplog.records if r.module == 'profiling')
+    assert re.match(r'GET list_tickets 200: \d+ queries, [\d.]+ ms DB, [\d.]+ ms total; slowest: ', line)
+
+
+def test_repeated_statements_are_flagged(app, caplog):
+    with caplog.at_level(logging.INFO):
+        app.test_client().get('/_per_row')
+    warnings = [r.getMessage() for r in caplog.records if r.levelno == logging.WARNING]
+    assert any(w.startswith('Possible N+1 in per_row: 6 x') for w in warnings)
+
+
+def test_slow_queries_are_logged(app, caplog, monkeypatch):
+    monkeypatch.setattr(profiling, 'SLOW_MS', 0)
+    with caplog.at_level(logging.WARNING):
+        app.test_client().get('/tickets')
+    assert any(r.getMessage().startswith('Slow query') and 'in list_tickets' in r.getMessage()
+               for r in caplog.records)
+
+
+def test_sampled_requests_dump_cprofile_stats(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'SAMPLE_RATE', 1.0)
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path / 'profiles'))
+    app = _make_app(tmp_path, monkeypatch)
+    app.test_client().get('/tickets')
+    assert [p.name.split('-')[0] for p in (tmp_path / 'profiles').iterdir()] == ['list_tickets']
@@ -0,0 +1,92 @@
+"""Tests for the SQLite-backed rate-limit storage shared between workers."""
+import multiprocessing
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+import api
+import rate_limits
+from app import create_app, limiter
+
+
+@pytest.fixture
+def uri(tmp_path):
+    return f'sqlite:///{tmp_path / "limits.db"}'
+
+
+def _hit(uri, key, hits, results):
+    strategy = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    results.put(sum(strategy.hit(parse('10 per minute'), key) for _ in range(hits)))
+
+
+def test_counters_expire_and_windows_slide(uri, monkeypatch):
+    storage = storage_from_string(uri)
+    assert isinstance(storage, rate_limits.SQLiteStorage)
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limits.time, 'time', lambda: clock[0])
+
+    assert [storage.incr('k', 10) for _ in range(3)] == [1, 2, 3]
+    assert storage.get('k') == 3 and storage.get_expiry('k') == 1010.0
+    clock[0] = 1010.0
+    assert storage.get('k') == 0 and storage.incr('k', 10) == 1
+
+    # 10 per 60 s: fill the window, then halfway through the next one half
+    # of the previous window still counts.
+    assert [storage.acquire_sliding_window_entry('s', 10, 60) for _ in range(11)] == [True] * 10 + [False]
+    clock[0] = 1050.0
+    previous, _, current, _ = storage.get_sliding_window('s', 60)
+    assert (previous, current) == (10, 0)
+    assert [storage.acquire_sliding_window_entry('s', 10, 60) for _ in range(6)] == [True] * 5 + [False]
+    storage.clear_sliding_window('s', 60)
+    assert storage.get_sliding_window('s', 60)[2] == 0
+
+
+def test_sweep_drops_expired_and_excess_keys(tmp_path, monkeypatch):
+    storage = rate_limits.SQLiteStorage(f'sqlite:///{tmp_path / "limits.db"}', max_keys=3, sweep_seconds=3600)
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limits.time, 'time', lambda: clock[0])
+    for i in range(6):
+        storage.incr(f'k{i}', 10 + i)
+    clock[0] = 1011.0
+    # k0 (expired) goes first, then the two closest to expiry.
+    assert storage.sweep() == 3
+    assert [storage.get(f'k{i}') for i in range(6)] == [0, 0, 0, 1, 1, 1]
+
+
+def test_processes_share_counters(uri):
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_hit, args=(uri, 'client', 4, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert sum(results.get(timeout=5) for _ in workers) == 10
+
+
+def test_app_instances_on_one_database_share_limits(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'development')
+    monkeypatch.setenv('CLASSIFY_WORKERS', '0')
+    monkeypatch.setenv('API_TOKENS', 't')
+    monkeypatch.delenv('RATELIMIT_STORAGE_URI', raising=False)
+    monkeypatch.setattr(api, 'RATE_LIMIT', '1 per minute')
+    first = create_app()
+    assert first.config['RATELIMIT_STORAGE_URI'] == f'sqlite:///{tmp_path / "test-ratelimit.db"}'
+    assert isinstance(limiter.storage, rate_limits.SQLiteStorage)
+    headers = {'Authorization': 'Bearer t'}
+    assert first.test_client().get('/api/tickets', headers=headers).status_code == 200
+    # A second "worker" sees the hit the first one recorded.
+    second = create_app()
+    assert second.test_client().get('/api/tickets', headers=headers).status_code == 429
+
+
+def test_default_uri_needs_a_sqlite_file():
+    from sqlalchemy.engine import make_url
+    assert rate_limits.default_uri(make_url('sqlite:////srv/app/tickets.db')) == 'sqlite:////srv/app/tickets-ratelimit.db'
+    assert rate_limits.default_uri(make_url('sqlite://')) is None
+    assert rate_limits.default_uri(make_url('postgresql://db/tickets')) is None
+    with pytest.raises(ValueError):
+        rate_limits.SQLiteStorage('sqlite://')
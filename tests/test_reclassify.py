@@ -0,0 +1,117 @@
+"""Tests for the bulk re-classification command."""
+import pytest
+
+import classifier
+import reclassify
+from app import create_app
+from models import db, Ticket, TicketCorrection
+
+
+def _model(text, **kwargs):
+    """Stands in for the model: the keyword rules, reported as OpenAI's answer."""
+    return classifier._heuristic(text), 'openai'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.setattr(reclassify, 'classify', _model)
+    application = create_app()
+    with application.app_context():
+        db.session.add_all([
+            Ticket(title='a', description='VPN is down', category='other', priority='Low'),
+            Ticket(title='b', description='printer jammed', category='hardware', priority='Medium'),
+            Ticket(title='c', description='ransomware on my laptop', category='software', priority='Low'),
+        ])
+        db.session.commit()
+    return application
+
+
+def _categories(app):
+    with app.app_context():
+        return [t.category for t in Ticket.query.order_by(Ticket.id)]
+
+
+def test_dry_run_reports_without_writing(app):
+    lines = []
+    with app.app_context():
+        seen, changed = reclassify.reclassify(chunk_size=2, dry_run=True, echo=lines.append)
+    assert (seen, changed) == (3, 2)
+    assert any(line.startswith('#1: other/Low -> networking/High') for line in lines)
+    assert _categories(app) == ['other', 'hardware', 'software']
+
+
+def test_reclassify_writes_changes(app, tmp_path):
+    checkpoint = str(tmp_path / 'ckpt.json')
+    with app.app_context():
+        seen, changed = reclassify.reclassify(chunk_size=2, concurrency=2,
+                                              checkpoint=checkpoint, echo=lambda _: None)
+    assert (seen, changed) == (3, 2)
+    assert _categories(app) == ['networking', 'hardware', 'security']
+    with app.app_context():
+        assert db.session.get(Ticket, 1).label_source == 'model'
+
+
+def test_heuristic_answers_are_not_written(app, monkeypatch):
+    monkeypatch.setattr(reclassify, 'classify', lambda text, **kw: (classifier._heuristic(text), 'fallback'))
+    lines = []
+    with app.app_context():
+        assert reclassify.reclassify(echo=lines.append) == (3, 0)
+    assert '3 skipped' in lines[-1]
+    assert _categories(app) == ['other', 'hardware', 'software']
+
+
+def test_skipped_tickets_are_retried_on_resume(app, tmp_path, monkeypatch):
+    checkpoint = tmp_path / 'ckpt.json'
+    # The model is out for ticket 2 only.
+    monkeypatch.setattr(reclassify, 'classify', lambda text, **kw: (
+        (classifier._heuristic(text), 'fallback') if text == 'printer jammed' else _model(text)))
+    with app.app_context():
+        assert reclassify.reclassify(chunk_size=1, checkpoint=str(checkpoint), echo=lambda _: None) == (3, 2)
+    assert '"last_id": 1' in checkpoint.read_text()
+
+    monkeypatch.setattr(reclassify, 'classify', _model)
+    with app.app_context():
+        db.session.execute(Ticket.__table__.update().where(Ticket.id == 2).values(category='other'))
+        db.session.commit()
+        assert reclassify.reclassify(checkpoint=str(checkpoint), echo=lambda _: None) == (2, 1)
+    assert _categories(app) == ['networking', 'hardware', 'security']
+    assert not checkpoint.exists()
+
+
+def test_corrected_tickets_are_left_alone(app):
+    with app.app_context():
+        db.session.add(TicketCorrection(ticket_id=1, old_category='networking', new_category='other',
+                                        old_priority='High', new_priority='Low', corrected_by='admin'))
+        db.session.commit()
+        assert reclassify.reclassify(echo=lambda _: None) == (2, 1)
+    assert _categories(app) == ['other', 'hardware', 'security']
+    with app.app_context():
+        assert reclassify.reclassify(include_corrected=True, echo=lambda _: None) == (3, 1)
+    assert _categories(app) == ['networking', 'hardware', 'security']
+
+
+def test_rows_changed_during_the_run_are_kept(app, monkeypatch):
+    def model(text, **kwargs):
+        if text == 'VPN is down':
+            # An admin edits ticket 1 while the model is answering.
+            with engine.begin() as conn:
+                conn.execute(Ticket.__table__.update().where(Ticket.id == 1).values(category='security'))
+        return _model(text)
+    monkeypatch.setattr(reclassify, 'classify', model)
+    with app.app_context():
+        engine = db.engine
+        assert reclassify.reclassify(concurrency=1, echo=lambda _: None) == (3, 1)
+    assert _categories(app) == ['security', 'hardware', 'security']
+
+
+def test_resumes_from_checkpoint(app, tmp_path):
+    checkpoint = tmp_path / 'ckpt.json'
+    checkpoint.write_text('{"last_id": 2}')
+    with app.app_context():
+        seen, changed = reclassify.reclassify(checkpoint=str(checkpoint), echo=lambda _: None)
+    assert (seen, changed) == (1, 1)
+    assert _categories(app) == ['other', 'hardware', 'security']
+    assert not checkpoint.exists()
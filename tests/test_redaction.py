@@ -0,0 +1,84 @@
+"""Property tests: redaction output vs the original sequential passes."""
+import random
+import re
+import string
+
+import classifier
+from classifier import MAX_MODEL_CHARS, REDACTION_PLACEHOLDER
+
+# The original implementation: one re.sub per pattern, truncating at the end.
+LEGACY_PATTERNS = [
+    re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}'),
+    re.compile(r'\bsk-[A-Za-z0-9_-]{8,}\b'),
+    re.compile(r'(?i)\bBearer\s+[A-Za-z0-9._~+/=-]{8,}'),
+    re.compile(r'\b[A-Za-z0-9+/_=-]{20,}\b'),
+]
+
+
+def legacy_sanitize(text):
+    for pattern in LEGACY_PATTERNS:
+        text = pattern.sub(REDACTION_PLACEHOLDER, text)
+    return text[:MAX_MODEL_CHARS]
+
+
+WORDS = ('my printer vpn is down please help cannot login to outlook error code '
+         'since yesterday after the update laptop screen flickers').split()
+TOKEN = string.ascii_letters + string.digits
+SEPARATORS = [' ', ' ', '\n', ', ', '. ', ': ', ' (', ') ']
+
+
+def _corpus(seed, count):
+    rnd = random.Random(seed)
+
+    def rs(n, alphabet=TOKEN):
+        return ''.join(rnd.choice(alphabet) for _ in range(n))
+
+    for _ in range(count):
+        parts = []
+        for _ in range(rnd.randint(1, 400)):
+            k = rnd.random()
+            if k < 0.65:
+                parts.append(rnd.choice(WORDS))
+            elif k < 0.72:
+                parts.append(f'{rs(rnd.randint(1, 12))}.{rs(3)}@{rs(5)}.example.com')
+            elif k < 0.79:
+                parts.append('sk-' + rs(rnd.randint(4, 40), TOKEN + '_-'))
+            elif k < 0.86:
+                header = rnd.choice(['Bearer ', 'bearer  ', 'Authorization: Bearer '])
+                parts.append(header + rnd.choice([rs(rnd.randint(4, 40), TOKEN + '._'), 'sk-' + rs(30)]))
+            elif k < 0.94:
+                parts.append(rs(rnd.randint(15, 60), TOKEN + '+/='))
+            else:
+                parts.append(rs(rnd.randint(1, 5), '.,;:()!?"\''))
+        # Now and then glue tokens together with no separator at all
+        # (bob@corp.com-alice@corp.com, ...sk-keyBearer...).
+        glue = rnd.random() < 0.3
+        yield ''.join(p + ('' if glue and rnd.random() < 0.5 else rnd.choice(SEPARATORS)) for p in parts)
+
+
+def test_matches_legacy_on_corpus():
+    for text in _corpus(seed=7, count=600):
+        assert classifier.redact_for_model(text)[0] == legacy_sanitize(text)
+
+
+def test_glued_tokens_match_legacy():
+    for text in ('cc bob@corp.com-alice@corp.com', 'bob@corp.com+alice@corp.com',
+                 'x@y.io_jane.doe@corp.com', '%a@b.comsk-abcdefghijBearera@b.com',
+                 'Authorization: Bearer /sk-BAsk0JC8Hy=', 'AAAAAAAAAAAAAAAAAAAAAA-bob@corp.com'):
+        assert classifier.redact_for_model(text)[0] == legacy_sanitize(text)
+    assert classifier.redact_for_model('cc bob@corp.com-alice@corp.com')[0] == 'cc [REDACTED][REDACTED]'
+
+
+def test_early_stop_matches_legacy_past_the_cap():
+    text = ('token ' + 'A' * 30 + ' ') * 400 + 'tail@example.com ' * 300
+    assert len(text) > MAX_MODEL_CHARS
+    safe, stats = classifier.redact_for_model(text)
+    assert safe == legacy_sanitize(text)
+    assert stats['truncated']
+
+
+def test_redaction_stats():
+    safe, stats = classifier.redact_for_model(
+        'mail bob@example.com, key sk-abcdefghijkl, Authorization: Bearer abc.def.ghi.jkl')
+    assert REDACTION_PLACEHOLDER in safe
+    assert stats == {'emails': 1, 'keys': 1, 'bearer_tokens': 1, 'blobs': 0, 'truncated': False}
@@ -0,0 +1,137 @@
+"""Tests for full-text search over tickets, corrections and fixed issues."""
+import sqlite3
+
+import pytest
+
+import search
+from app import create_app
+from models import db, Ticket, TicketCorrection, FixedIssue
+from tests.test_migrations import LEGACY_SCHEMA
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as c:
+        with c.session_transaction() as sess:
+            sess['admin_logged_in'] = True
+        yield c
+
+
+def _ticket(title, description, **kwargs):
+    ticket = Ticket(title=title, description=description, category='software', priority='Low', **kwargs)
+    db.session.add(ticket)
+    db.session.commit()
+    return ticket
+
+
+def test_match_query_is_safe():
+    assert search.match_query('Outlook "sync" OR NEAR(') == '"outlook" "sync" "or" "near"'
+    assert search.match_query('outl* sync') == '"outl"* "sync"'
+    assert search.match_query('  -- * ') is None
+
+
+def test_ranked_ticket_search(app):
+    with app.app_context():
+        body = _ticket('Printer offline', 'The outlook client mentions nothing useful here at all')
+        title = _ticket('Outlook sync broken', 'Mail stopped syncing this morning')
+        _ticket('VPN down', 'Cannot connect')
+        # Title matches outrank body-only matches; stemming matches "syncing".
+        assert [t.id for t in search.search_tickets('outlook').items] == [title.id, body.id]
+        assert [t.id for t in search.search_tickets('outlook synced').items] == [title.id]
+        # Prefixes are explicit.
+        assert search.search_tickets('outl').items == []
+        assert [t.id for t in search.search_tickets('outl*').items] == [title.id, body.id]
+
+
+def test_index_follows_updates_and_correction_notes(app):
+    with app.app_context():
+        ticket = _ticket('Laptop', 'Screen flickers')
+        ticket.description = 'Keyboard missing keys'
+        db.session.commit()
+        assert search.search_tickets('flickers').items == []
+        assert [t.id for t in search.search_tickets('keyboard').items] == [ticket.id]
+
+        db.session.add(TicketCorrection(ticket_id=ticket.id, new_category='hardware', notes='docking station firmware'))
+        db.session.commit()
+        assert [t.id for t in search.search_tickets('firmware').items] == [ticket.id]
+
+
+def test_search_pagination(app):
+    with app.app_context():
+        for i in range(5):
+            _ticket(f'Teams crash {i}', 'teams keeps crashing')
+        first = search.search_tickets('teams', page=1, per_page=2)
+        last = search.search_tickets('teams', page=3, per_page=2)
+        assert len(first.items) == 2 and first.has_next and not first.has_prev
+        assert len(last.items) == 1 and not last.has_next and last.has_prev
+
+
+def test_fixed_issue_search_with_filters(app, client):
+    with app.app_context():
+        db.session.add_all([
+            FixedIssue(title='Outlook profile', description='d', category='microsoft 365', fixed_by='ana',
+                       notes='rebuilt the OST cache'),
+            FixedIssue(title='Outlook add-in', description='d', category='software', fixed_by='ben',
+                       notes='removed the OST add-in'),
+        ])
+        db.session.commit()
+    body = client.get('/admin/search?scope=fixed&q=ost&fixed_by=ana').get_data(as_text=True)
+    assert 'Outlook profile' in body and 'Outlook add-in' not in body
+
+    resp = client.get('/admin/fixed-issues?q=ost&category=software')
+    assert resp.status_code == 302 and 'scope=fixed' in resp.headers['Location']
+
+
+def test_admin_search_page(client, app):
+    with app.app_context():
+        _ticket('Outlook sync broken', 'Mail stopped')
+    body = client.get('/admin/search?q=outlook').get_data(as_text=True)
+    assert 'Outlook sync broken' in body
+    assert 'Nothing matches' in client.get('/admin/search?q=zebra').get_data(as_text=True)
+
+
+def test_migration_indexes_existing_rows(tmp_path, monkeypatch):
+    path = tmp_path / 'legacy.db'
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+        conn.execute("INSERT INTO tickets VALUES (1, 'Outlook sync', 'd', 'software', 'Low', 0.5, 'Open', "
+                     "'2024-01-01 00:00:00', '2024-01-01 00:00:00')")
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{path}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    app = create_app()
+    with app.app_context():
+        assert [t.id for t in search.search_tickets('outlook').items] == [1]
+
+
+def test_common_terms_rank_newest_matches_then_page_through_older(app, client, monkeypatch):
+    monkeypatch.setattr(search, 'RANK_WINDOW', 3)
+    with app.app_context():
+        ids = [_ticket(f'Teams {i}', 'teams').id for i in range(6)]
+        printer = _ticket('Printer', 'the teams room printer').id
+        db.session.add(TicketCorrection(ticket_id=ids[0], new_category='hardware', notes='teams again'))
+        db.session.commit()
+        # The newest three tickets and the note's ticket are ranked; the
+        # rest follow unranked, newest first.
+        found = [t.id for t in search.search_tickets('teams', per_page=10).items]
+        assert found[:2] == [ids[5], ids[4]] and set(found[2:4]) == {printer, ids[0]}
+        assert found[4:] == [ids[3], ids[2], ids[1]]
+        pages = [search.search_tickets('teams', page=p, per_page=2) for p in (1, 2, 3, 4)]
+        assert [t.id for p in pages for t in p.items] == found
+        assert [p.has_next for p in pages] == [True, True, True, False]
+
+        monkeypatch.setattr(search, 'MAX_PAGE', 2)
+        last = search.search_tickets('teams', page=2, per_page=2)
+        assert last.truncated and not last.has_next
+    monkeypatch.setenv('SEARCH_PER_PAGE', '2')
+    assert 'data-search-truncated' in client.get('/admin/search?q=teams&page=2').get_data(as_text=True)
+    assert 'data-search-truncated' not in client.get('/admin/search?q=teams').get_data(as_text=True)
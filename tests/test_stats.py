@@ -0,0 +1,89 @@
+"""Tests for the incrementally maintained ticket statistics rollup."""
+import pytest
+
+import jobs
+import reclassify
+import stats
+from app import create_app
+from models import db, Ticket, TicketStat
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setenv('FLASK_ENV', 'testing')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    monkeypatch.setenv('LOCAL_MODEL_PATH', '')
+    application = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+def _rollup():
+    return {(r.day, r.category, r.priority, r.status): r.count
+            for r in TicketStat.query.all() if r.count}
+
+
+def _assert_matches_rebuild():
+    incremental = _rollup()
+    stats.rebuild(db.session)
+    assert _rollup() == incremental
+    db.session.rollback()
+
+
+def test_rollup_follows_ticket_lifecycle(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+    for text in ('VPN is down', 'printer jammed', 'outlook password reset'):
+        client.post('/submit', data={'title': text, 'description': text})
+    with app.app_context():
+        assert stats.summary()['open_by_priority'] == {'unclassified': 3}
+        _assert_matches_rebuild()
+        jobs.run_pending()
+        _assert_matches_rebuild()
+        ids = [t.id for t in Ticket.query.order_by(Ticket.id)]
+
+    client.post(f'/admin/ticket/{ids[0]}/edit', data={'category': 'hardware', 'priority': 'Critical'})
+    client.post(f'/admin/ticket/{ids[1]}/complete', data={'fixed_by': 'tester'})
+    with app.app_context():
+        _assert_matches_rebuild()
+        summary = stats.summary()
+        assert summary['total'] == 3 and summary['today'] == 3
+        assert summary['by_status'] == {'Open': 2, 'Fixed': 1}
+        assert summary['open_by_priority']['Critical'] == 1
+        assert summary['daily'][-1]['count'] == 3
+
+        db.session.delete(db.session.get(Ticket, ids[2]))
+        db.session.commit()
+        assert stats.total() == 2
+        _assert_matches_rebuild()
+
+
+def test_reclassify_updates_rollup(app, monkeypatch):
+    import classifier
+    monkeypatch.setattr(reclassify, 'classify', lambda text, **kw: (classifier._heuristic(text), 'openai'))
+    with app.app_context():
+        db.session.add(Ticket(title='t', description='VPN is down', category='other', priority='Low'))
+        db.session.commit()
+        reclassify.reclassify(checkpoint=None, echo=lambda *_: None)
+        assert stats.summary()['by_category'] == {'networking': 1}
+        _assert_matches_rebuild()
+
+
+def test_stats_endpoint_and_dashboard_total(app, monkeypatch):
+    monkeypatch.setenv('ADMIN_TICKETS_PER_PAGE', '2')
+    with app.app_context():
+        for i in range(5):
+            db.session.add(Ticket(title=f't{i}', description='d', category='software', priority='Low'))
+        db.session.commit()
+    client = app.test_client()
+    assert client.get('/admin/stats.json').status_code == 302
+    with client.session_transaction() as sess:
+        sess['admin_logged_in'] = True
+    data = client.get('/admin/stats.json?days=7').get_json()
+    assert data['total'] == 5
+    assert len(data['daily']) == 7
+    assert data['open_by_priority'] == {'Low': 5}
+    # The card shows the real total, not the page size.
+    assert '<h3>5</h3>' in client.get('/admin').get_data(as_text=True)